@@ -18,6 +18,7 @@ hidden_imports = [
     'librosa.sequence',
     'librosa.display',
     'soundfile',
+    'soxr',
     'resampy',
     'numba',
     'numba.core',
@@ -79,6 +80,11 @@ hidden_imports = [
     'functools',
     'warnings',
     'decimal',
+    'sqlite3',
+    'hashlib',
+    'multiprocessing',
+    'cProfile',
+    'pstats',
 ]
 
 a = Analysis(
@@ -0,0 +1,432 @@
+import sys
+from pathlib import Path
+from audio_probe import probe_duration
+from instrumentation import add_bytes, stage
+from key_detection import CHROMA_HOP, detect_key, key_chroma, key_method, summarize_chroma
+from similarity import summarize_timbre, timbre_embedding, timbre_frames
+
+# Versão do algoritmo de análise (BPM/nota/volume/timbre). Incrementar ao mudar a
+# lógica de analyze_audio para invalidar o cache salvo nas pastas.
+ANALYSIS_VERSION = 5
+
+# Parâmetros do pipeline: o trecho analisado é decodificado uma única vez em
+# 11.025 Hz (suficiente para BPM, chroma e RMS) com um resampler rápido, e o
+# mesmo STFT alimenta BPM, volume e timbre (similarity). A nota usa um chroma CQT próprio
+# (key_detection), com quadros de CHROMA_HOP amostras.
+ANALYSIS_SR = 11025
+ANALYSIS_WINDOW = 60  # segundos
+RESAMPLE_TYPE = 'soxr_qq'
+N_FFT = 1024
+HOP_LENGTH = 256
+
+# Modo completo: a música inteira é lida em blocos (memória constante, qualquer
+# duração) e o BPM/nota também são estimados por segmento
+ANALYSIS_MODES = ('window', 'full')
+STREAM_BLOCK_SECONDS = 10
+SEGMENT_SECONDS = 30
+
+
+def failed_analysis(file_path, error):
+    """Informações básicas de uma música cuja análise falhou"""
+    return {
+        'path': file_path,
+        'name': Path(file_path).name,
+        'bpm': 120,
+        'key': "N/A",
+        'key_confidence': None,
+        'loudness_db': None,
+        'duration_seconds': None,
+        'beat_grid': None,
+        'timbre': None,
+        'error': str(error) or type(error).__name__
+    }
+
+
+def decode_window(file_path, offset=0.0, duration=ANALYSIS_WINDOW):
+    """Decodifica uma única vez o trecho analisado, já em mono e na taxa de análise"""
+    import librosa
+
+    # Mesmo caminho do librosa.load(sr=ANALYSIS_SR), em duas etapas para medir cada uma
+    with stage('decode'):
+        y, native_sr = librosa.load(file_path, sr=None, mono=True, offset=offset, duration=duration)
+    add_bytes(y.nbytes)
+    if native_sr != ANALYSIS_SR:
+        with stage('resample'):
+            y = librosa.resample(y, orig_sr=native_sr, target_sr=ANALYSIS_SR, res_type=RESAMPLE_TYPE)
+    return y, ANALYSIS_SR
+
+
+def features_from_spectrogram(S, sr, chroma=None):
+    """BPM, volume e timbre a partir de um único espectrograma de magnitude (compartilhado), e nota a partir do chroma"""
+    import librosa
+    import numpy as np
+
+    power = S ** 2
+    features = {'timbre': None}
+    mel_db = None
+
+    # Calcular BPM (envelope de onsets a partir do mel do mesmo STFT)
+    try:
+        with stage('onset'):
+            mel = librosa.feature.melspectrogram(S=power, sr=sr, n_fft=N_FFT)
+            mel_db = librosa.power_to_db(mel)
+            onset_env = librosa.onset.onset_strength(S=mel_db, sr=sr)
+        with stage('beat_track'):
+            tempo, beats = librosa.beat.beat_track(onset_envelope=onset_env, sr=sr, hop_length=HOP_LENGTH)
+        # Garantir que extraímos um escalar do array
+        features['bpm'] = int(np.asarray(tempo).item())
+    except:
+        features['bpm'] = 120  # BPM padrão se não conseguir detectar
+        beats = []
+
+    # Grade de batidas (primeira batida, período em segundos) para marcar a forma de onda
+    try:
+        features['beat_grid'] = beat_grid(librosa.frames_to_time(beats, sr=sr, hop_length=HOP_LENGTH))
+    except:
+        features['beat_grid'] = None
+
+    # Estimar nota (correlação do chroma médio com os perfis de tonalidade)
+    features.update(key_features(None if chroma is None else chroma.mean(axis=1)))
+
+    # Calcular volume (RMS - Root Mean Square)
+    try:
+        with stage('rms'):
+            rms = librosa.feature.rms(S=S, frame_length=N_FFT)[0]
+            features['loudness_db'] = loudness_db(np.mean(rms))
+    except:
+        features['loudness_db'] = None
+
+    # Timbre (MFCC e contraste espectral) do mesmo mel em dB, para a semelhança de som
+    if mel_db is not None:
+        try:
+            with stage('timbre'):
+                features['timbre'] = summarize_timbre(timbre_frames(mel_db, S, sr, N_FFT))
+        except Exception:
+            pass
+
+    return features
+
+
+def key_features(chroma_mean):
+    """Nota, confiança, método e chroma médio (guardado para recalcular a nota sem reanalisar)"""
+    features = {'key': "N/A", 'key_confidence': None, 'key_method': key_method(), 'chroma': None}
+    if chroma_mean is None or not chroma_mean.any():
+        return features
+    features['key'], features['key_confidence'] = detect_key(chroma_mean)
+    features['chroma'] = summarize_chroma(chroma_mean)
+    return features
+
+
+def loudness_db(avg_rms):
+    """Loudness em dB a partir do RMS médio (a escala "NN%" é aplicada só na exibição)"""
+    import numpy as np
+
+    return round(float(20 * np.log10(avg_rms + 1e-6)), 2)  # +1e-6 para evitar log(0)
+
+
+def beat_grid(beat_times):
+    """Ajusta uma grade de tempo constante às batidas detectadas: [primeira batida, período]"""
+    import numpy as np
+
+    beat_times = np.asarray(beat_times, dtype=np.float64)
+    if len(beat_times) < 4:
+        return None
+    # Numerar as batidas pelo intervalo mediano (tolera batidas perdidas) e ajustar uma reta
+    period = np.median(np.diff(beat_times))
+    if period <= 0:
+        return None
+    numbers = np.round((beat_times - beat_times[0]) / period)
+    period, first = np.polyfit(numbers, beat_times, 1)
+    if period <= 0:
+        return None
+    return [round(float(first % period), 4), round(float(period), 5)]
+
+
+def analyze_signal(y, sr):
+    """Features de um sinal já decodificado: um único STFT alimenta BPM e volume, o chroma CQT a nota"""
+    import librosa
+    import numpy as np
+
+    with stage('stft'):
+        S = np.abs(librosa.stft(y, n_fft=N_FFT, hop_length=HOP_LENGTH))
+    try:
+        with stage('chroma'):
+            chroma = key_chroma(y, sr)
+    except Exception:
+        chroma = None  # Se não conseguir detectar a nota
+    return features_from_spectrogram(S, sr, chroma)
+
+
+def warm_up():
+    """Importa a pilha de DSP e compila (numba) as funções da análise usando um sinal curto"""
+    import numpy as np
+
+    y = np.random.default_rng(0).standard_normal(ANALYSIS_SR * 5).astype(np.float32) * 0.1
+    analyze_signal(y, ANALYSIS_SR)
+
+
+def stream_blocks(file_path, block_seconds=STREAM_BLOCK_SECONDS):
+    """Lê a música inteira em blocos mono na taxa de análise, sem manter o sinal completo na memória"""
+    import numpy as np
+    import soundfile as sf
+    import soxr
+
+    def native_blocks():
+        try:
+            f = sf.SoundFile(file_path)
+        except Exception:
+            f = None
+        if f is not None:
+            with f:
+                yield f.samplerate
+                for block in f.blocks(blocksize=int(f.samplerate * block_seconds),
+                                      dtype='float32', always_2d=True):
+                    mono = block.mean(axis=1)
+                    add_bytes(mono.nbytes)
+                    yield mono
+            return
+        # Formatos que o libsndfile não lê: decodificador do sistema, também em blocos
+        import audioread
+        with audioread.audio_open(file_path) as source:
+            yield source.samplerate
+            for buffer in source:
+                samples = np.frombuffer(buffer, dtype='<i2').astype(np.float32) / 32768
+                mono = samples.reshape(-1, source.channels).mean(axis=1)
+                add_bytes(mono.nbytes)
+                yield mono
+
+    blocks = native_blocks()
+    with stage('decode'):
+        native_sr = next(blocks)
+    # Reamostragem contínua entre blocos (sem emendas nas bordas)
+    resampler = None
+    if native_sr != ANALYSIS_SR:
+        resampler = soxr.ResampleStream(native_sr, ANALYSIS_SR, 1, dtype='float32', quality='QQ')
+    while True:
+        with stage('decode'):
+            block = next(blocks, None)
+        if block is None:
+            break
+        if resampler is not None:
+            with stage('resample'):
+                block = resampler.resample_chunk(block)
+        yield block
+    if resampler is not None:
+        with stage('resample'):
+            block = resampler.resample_chunk(np.zeros(0, dtype=np.float32), last=True)
+        yield block
+
+
+class StreamingAnalyzer:
+    """
+    Acumula as features da música inteira, bloco a bloco.
+
+    Guarda só o bloco em processamento e o envelope de onsets do segmento
+    atual; cada segmento de SEGMENT_SECONDS recebe seu próprio BPM e nota.
+    """
+
+    def __init__(self, sr=ANALYSIS_SR):
+        import numpy as np
+
+        self.sr = sr
+        self.segment_frames = int(SEGMENT_SECONDS * sr / HOP_LENGTH)
+        self.pending = np.zeros(0, dtype=np.float32)  # amostras que ainda não formam um quadro
+        self.samples = 0
+        self.frames = 0
+        self.last_db = None            # último quadro do mel em dB (continuidade dos onsets)
+        self.chroma_sum = np.zeros(12)
+        self.rms_sum = 0.0
+        self.timbre_sum = 0.0          # somas dos quadros de timbre_frames (e dos quadrados)
+        self.timbre_squares = 0.0
+        self.timbre_frames = 0
+        self.segments = []             # (início, BPM, chroma, peso)
+        self.beat_times = []
+        self._reset_segment()
+
+    def _reset_segment(self):
+        import numpy as np
+
+        self.segment_start = self.frames
+        self.segment_onsets = []
+        self.segment_chroma = np.zeros(12)
+        self.segment_count = 0
+
+    def feed(self, y):
+        """Processa as amostras recebidas (quadros incompletos esperam o próximo bloco)"""
+        import librosa
+        import numpy as np
+
+        self.samples += len(y)
+        buffer = np.concatenate((self.pending, y))
+        if len(buffer) < N_FFT:
+            self.pending = buffer
+            return
+        count = 1 + (len(buffer) - N_FFT) // HOP_LENGTH
+        used = (count - 1) * HOP_LENGTH + N_FFT
+        with stage('stft'):
+            S = np.abs(librosa.stft(buffer[:used], n_fft=N_FFT, hop_length=HOP_LENGTH, center=False))
+        self.pending = buffer[count * HOP_LENGTH:]
+
+        power = S ** 2
+        # Chroma CQT do bloco: cada quadro cobre CHROMA_HOP amostras, ou seja,
+        # ratio quadros do STFT
+        ratio = CHROMA_HOP // HOP_LENGTH
+        try:
+            with stage('chroma'):
+                chroma = key_chroma(buffer[:count * HOP_LENGTH], self.sr)
+        except Exception:
+            chroma = np.zeros((12, 1))
+        with stage('rms'):
+            rms = librosa.feature.rms(S=S, frame_length=N_FFT)[0]
+        with stage('onset'):
+            db = librosa.power_to_db(librosa.feature.melspectrogram(S=power, sr=self.sr, n_fft=N_FFT))
+            previous = db[:, :1] if self.last_db is None else self.last_db
+            onsets = np.maximum(0, np.diff(np.hstack((previous, db)), axis=1)).mean(axis=0)
+        self.last_db = db[:, -1:]
+        self.rms_sum += float(rms.sum())
+        try:
+            with stage('timbre'):
+                frames = timbre_frames(db, S, self.sr, N_FFT).astype(np.float64)
+            self.timbre_sum = self.timbre_sum + frames.sum(axis=1)
+            self.timbre_squares = self.timbre_squares + (frames ** 2).sum(axis=1)
+            self.timbre_frames += frames.shape[1]
+        except Exception:
+            pass
+
+        # Distribuir os quadros entre os segmentos
+        start = 0
+        while start < count:
+            take = min(count - start, self.segment_frames - self.segment_count)
+            self.segment_onsets.append(onsets[start:start + take])
+            end = chroma.shape[1] if start + take == count else (start + take) // ratio
+            self.segment_chroma += chroma[:, start // ratio:end].sum(axis=1)
+            self.segment_count += take
+            self.frames += take
+            start += take
+            if self.segment_count >= self.segment_frames:
+                self._close_segment()
+
+    def _close_segment(self):
+        import librosa
+        import numpy as np
+
+        if not self.segment_count:
+            return
+        envelope = np.concatenate(self.segment_onsets)
+        offset = self.segment_start * HOP_LENGTH / self.sr
+        try:
+            with stage('beat_track'):
+                tempo, beats = librosa.beat.beat_track(onset_envelope=envelope, sr=self.sr,
+                                                       hop_length=HOP_LENGTH)
+            bpm = int(np.asarray(tempo).item())
+            self.beat_times.extend(offset + librosa.frames_to_time(beats, sr=self.sr, hop_length=HOP_LENGTH))
+        except Exception:
+            bpm = None
+        # Peso do segmento na estimativa global: trechos sem percussão (intros) pesam pouco
+        weight = float(envelope.mean()) * self.segment_count
+        self.segments.append((offset, bpm, self.segment_chroma.copy(), weight))
+        self.chroma_sum += self.segment_chroma
+        self._reset_segment()
+
+    def finish(self):
+        """Features da música inteira, no mesmo formato de features_from_spectrogram, mais os segmentos"""
+        import numpy as np
+
+        self._close_segment()
+        features = {'bpm': 120, 'loudness_db': None, 'beat_grid': None}
+        rated = [(bpm, weight) for _, bpm, _, weight in self.segments if bpm]
+        if rated:
+            features['bpm'] = _weighted_median(*zip(*rated))
+        features.update(key_features(self.chroma_sum / max(self.frames, 1)))
+        if self.frames:
+            features['loudness_db'] = loudness_db(self.rms_sum / self.frames)
+        features['timbre'] = timbre_embedding(self.timbre_sum, self.timbre_squares, self.timbre_frames)
+        try:
+            features['beat_grid'] = beat_grid(np.asarray(self.beat_times))
+        except Exception:
+            pass
+        features['segments'] = []
+        for start, bpm, chroma, _ in self.segments:
+            segment = key_features(chroma)
+            features['segments'].append({'start': round(start, 2), 'bpm': bpm, 'key': segment['key'],
+                                         'chroma': segment['chroma']})
+        features['duration'] = self.samples / self.sr
+        return features
+
+
+def _weighted_median(values, weights):
+    import numpy as np
+
+    values, weights = np.asarray(values, dtype=np.float64), np.asarray(weights, dtype=np.float64)
+    if not weights.sum() > 0:
+        weights = np.ones_like(values)
+    order = np.argsort(values)
+    cumulative = np.cumsum(weights[order])
+    return int(values[order][np.searchsorted(cumulative, cumulative[-1] / 2)])
+
+
+def analyze_stream(file_path):
+    """Análise da música inteira em blocos (modo 'full')"""
+    analyzer = StreamingAnalyzer()
+    for block in stream_blocks(file_path):
+        analyzer.feed(block)
+    return analyzer.finish()
+
+
+def file_duration(file_path):
+    """Duração do arquivo completo, lida do cabeçalho sem decodificar (None se desconhecida)"""
+    import librosa
+
+    with stage('duration_probe'):
+        duration = probe_duration(file_path)
+        if duration is None:
+            try:
+                duration = librosa.get_duration(path=file_path)
+            except:
+                duration = None
+    return duration
+
+
+def analysis_result(file_path, features, duration, mode='window'):
+    """Resultado da análise (o dict salvo no cache) a partir das features"""
+    info = {
+        'path': file_path,
+        'name': Path(file_path).name,
+        'bpm': features['bpm'],
+        'key': features['key'],
+        'key_confidence': features['key_confidence'],
+        'key_method': features['key_method'],
+        'chroma': features['chroma'],
+        'loudness_db': features['loudness_db'],
+        'duration_seconds': None if duration is None else round(float(duration), 3),
+        'beat_grid': features['beat_grid'],
+        'timbre': features['timbre']
+    }
+    if mode == 'full':
+        info['analysis_mode'] = 'full'
+        info['segments'] = features['segments']
+    return info
+
+
+def analyze_audio(file_path, mode='window'):
+    """
+    Analisa BPM, nota, volume, timbre e duração da música.
+
+    mode='window' usa só o primeiro minuto; mode='full' percorre a música
+    inteira em blocos e inclui BPM/nota por segmento (chave 'segments').
+    """
+    try:
+        if mode == 'full':
+            features = analyze_stream(file_path)
+            duration = features['duration']
+        else:
+            # Decodificar uma vez e calcular um único STFT para todas as features
+            y, sr = decode_window(file_path)
+            features = analyze_signal(y, sr)
+            duration = file_duration(file_path)
+        return analysis_result(file_path, features, duration, mode)
+
+    except Exception as e:
+        print(f"Erro ao analisar {file_path}: {e}", file=sys.stderr)
+        # Retornar informações básicas mesmo se a análise falhar
+        return failed_analysis(file_path, e)
@@ -0,0 +1,144 @@
+import os
+import json
+import mmap
+import sqlite3
+import hashlib
+from pathlib import Path
+
+# Nome do arquivo de cache gravado na raiz da pasta de músicas
+CACHE_FILENAME = ".djset_cache.sqlite"
+
+# Versão do esquema das tabelas (diferente da versão do algoritmo de análise)
+SCHEMA_VERSION = 1
+
+# Quantidade de bytes lidos do início e do fim do arquivo para o hash rápido
+HASH_CHUNK = 64 * 1024
+
+
+def quick_hash(file_path, size=None):
+    """Hash rápido do conteúdo (tamanho + primeiros e últimos 64 KB)"""
+    if size is None:
+        size = os.path.getsize(file_path)
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(str(size).encode())
+    with open(file_path, 'rb') as f:
+        try:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # arquivo vazio
+            return digest.hexdigest()
+        # mmap: só as páginas do início e do fim são lidas do disco
+        with data:
+            digest.update(data[:HASH_CHUNK])
+            if size > HASH_CHUNK:
+                tail = max(HASH_CHUNK, size - HASH_CHUNK)
+                digest.update(data[tail:tail + HASH_CHUNK])
+    return digest.hexdigest()
+
+
+class AnalysisCache:
+    """Armazena resultados de analyze_audio em SQLite, indexados por caminho + tamanho + mtime"""
+
+    def __init__(self, db_path, version):
+        self.db_path = str(db_path)
+        self.version = version
+        self.conn = sqlite3.connect(self.db_path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self._create_tables()
+
+    @classmethod
+    def for_folder(cls, folder, version):
+        """Abre o cache da pasta (ou um cache no diretório do usuário se a pasta for somente leitura)"""
+        db_path = Path(folder) / CACHE_FILENAME
+        try:
+            return cls(db_path, version)
+        except sqlite3.Error:
+            fallback_dir = Path.home() / ".djset_cache"
+            fallback_dir.mkdir(parents=True, exist_ok=True)
+            folder_id = hashlib.blake2b(str(Path(folder).resolve()).encode(), digest_size=8).hexdigest()
+            return cls(fallback_dir / f"{folder_id}.sqlite", version)
+
+    def _create_tables(self):
+        with self.conn:
+            self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            row = self.conn.execute("SELECT value FROM meta WHERE key = 'schema'").fetchone()
+            if row is not None and int(row[0]) != SCHEMA_VERSION:
+                self.conn.execute("DROP TABLE IF EXISTS analysis")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS analysis ("
+                " path TEXT PRIMARY KEY,"
+                " size INTEGER NOT NULL,"
+                " mtime_ns INTEGER NOT NULL,"
+                " version INTEGER NOT NULL,"
+                " content_hash TEXT,"
+                " data TEXT NOT NULL)"
+            )
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('schema', ?)",
+                              (str(SCHEMA_VERSION),))
+
+    def get(self, file_path, stat=None):
+        """Retorna a análise salva ou None se o arquivo mudou ou a versão do algoritmo é outra"""
+        file_path = str(file_path)
+        row = self.conn.execute(
+            "SELECT size, mtime_ns, version, content_hash, data FROM analysis WHERE path = ?",
+            (file_path,)
+        ).fetchone()
+        if row is None:
+            return None
+
+        size, mtime_ns, version, content_hash, data = row
+        if version != self.version:
+            return None
+
+        try:
+            stat = stat or os.stat(file_path)
+        except OSError:
+            return None
+
+        if stat.st_size != size:
+            return None
+
+        if stat.st_mtime_ns != mtime_ns:
+            # mtime mudou (cópia, "touch"): conferir pelo conteúdo antes de reanalisar
+            try:
+                if content_hash is None or quick_hash(file_path, stat.st_size) != content_hash:
+                    return None
+            except OSError:
+                return None
+            with self.conn:
+                self.conn.execute("UPDATE analysis SET mtime_ns = ? WHERE path = ?",
+                                  (stat.st_mtime_ns, file_path))
+
+        return json.loads(data)
+
+    def put(self, file_path, info, stat=None):
+        """Salva a análise de um arquivo (análises com erro não são salvas)"""
+        if info.get('error'):
+            return
+        file_path = str(file_path)
+        try:
+            stat = stat or os.stat(file_path)
+            content_hash = quick_hash(file_path, stat.st_size)
+        except OSError:
+            return
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO analysis (path, size, mtime_ns, version, content_hash, data) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (file_path, stat.st_size, stat.st_mtime_ns, self.version, content_hash, json.dumps(info))
+            )
+
+    def prune(self, existing_paths):
+        """Remove entradas de arquivos que não existem mais (ou de versões antigas do algoritmo)"""
+        existing = {str(p) for p in existing_paths}
+        stale = [
+            (path,) for path, version in self.conn.execute("SELECT path, version FROM analysis")
+            if path not in existing or version != self.version
+        ]
+        if stale:
+            with self.conn:
+                self.conn.executemany("DELETE FROM analysis WHERE path = ?", stale)
+        return len(stale)
+
+    def close(self):
+        self.conn.close()
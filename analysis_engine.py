@@ -0,0 +1,337 @@
+import os
+import sys
+import time
+import threading
+import multiprocessing as mp
+from contextlib import nullcontext
+from multiprocessing.connection import wait
+
+from pathlib import Path
+from analysis import analyze_audio, failed_analysis, warm_up
+from instrumentation import Profiler, record_file, stage
+
+# Cache em disco das funções compiladas pelo numba (evita recompilar a cada execução)
+NUMBA_CACHE_DIR = Path.home() / ".djset_cache" / "numba"
+
+
+def default_workers():
+    """Número padrão de processos de análise (deixa um núcleo livre para a interface)"""
+    return max(1, (os.cpu_count() or 2) - 1)
+
+
+def _extract_peaks(file_path):
+    """Etapa opcional: picos da forma de onda (falhas não afetam a análise)"""
+    try:
+        from waveform import extract_peaks
+        extract_peaks(file_path)
+    except Exception as e:
+        print(f"Erro ao gerar a forma de onda de {file_path}: {e}", file=sys.stderr)
+
+
+def _analyze_file(file_path, mode, peaks, profiler=None):
+    """Analisa um arquivo medindo as etapas; retorna (resultado, métricas)"""
+    with record_file(file_path) as metrics:
+        with profiler.active() if profiler else nullcontext():
+            try:
+                result = analyze_audio(file_path, mode)
+            except Exception as e:
+                result = failed_analysis(file_path, e)
+            if peaks and not result.get('error'):
+                with stage('peaks'):
+                    _extract_peaks(file_path)
+    metrics.error = result.get('error')
+    if profiler:
+        profiler.save()
+    return result, metrics.to_dict()
+
+
+def _analyze_batch(file_paths, peaks, profiler=None):
+    """Analisa um lote (batch_analysis); retorna [(resultado, métricas)] na ordem dos arquivos"""
+    from batch_analysis import analyze_batch
+
+    with profiler.active() if profiler else nullcontext():
+        try:
+            entries = analyze_batch(file_paths)
+        except Exception as e:
+            print(f"Erro na análise em lote, analisando individualmente: {e}", file=sys.stderr)
+            return [_analyze_file(file_path, 'window', peaks) for file_path in file_paths]
+        output = []
+        for result, metrics in entries:
+            if peaks and not result.get('error'):
+                with record_file(result['path']) as extra:
+                    with stage('peaks'):
+                        _extract_peaks(result['path'])
+                metrics.add_share(extra)
+            metrics.error = result.get('error')
+            output.append((result, metrics.to_dict()))
+    if profiler:
+        profiler.save()
+    return output
+
+
+def _analyze_task(file_paths, mode, peaks, profiler=None):
+    """Uma tarefa do engine: um arquivo, ou um lote de arquivos no modo 'window'"""
+    if len(file_paths) > 1 and mode == 'window':
+        return _analyze_batch(file_paths, peaks, profiler)
+    return [_analyze_file(file_path, mode, peaks, profiler) for file_path in file_paths]
+
+
+def _worker_main(conn, peaks=False):
+    """
+    Loop do processo de análise: recebe (índices, caminhos, modo, (pasta, prefixo)
+    dos perfis ou None) e devolve [(índice, resultado, métricas)]
+    """
+    os.environ.setdefault("NUMBA_CACHE_DIR", str(NUMBA_CACHE_DIR))
+    try:
+        # Importar librosa e compilar o pipeline antes da primeira tarefa
+        warm_up()
+    except Exception as e:
+        print(f"Falha ao preparar o processo de análise: {e}", file=sys.stderr)
+
+    profilers = {}  # (pasta, prefixo) -> Profiler (um perfil por processo e por execução)
+    while True:
+        try:
+            task = conn.recv()
+        except (EOFError, OSError):
+            break
+        if task is None:
+            break
+        indices, file_paths, mode, profile = task
+        profiler = None
+        if profile:
+            profile = tuple(profile)
+            profiler = profilers.get(profile) or profilers.setdefault(profile, Profiler(*profile))
+        entries = _analyze_task(file_paths, mode, peaks, profiler)
+        try:
+            conn.send([(index, result, metrics) for index, (result, metrics) in zip(indices, entries)])
+        except (BrokenPipeError, OSError):
+            break
+
+
+class _Worker:
+    """Processo de análise com um pipe exclusivo e a tarefa que está executando"""
+
+    def __init__(self, ctx, peaks=False):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main, args=(child_conn, peaks), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.task = None       # (índices, caminhos) em execução
+        self.deadline = None   # time.monotonic() limite para a tarefa atual
+
+    def assign(self, indices, file_paths, timeout, mode, profile=None):
+        self.task = (indices, file_paths)
+        # O limite é por arquivo: um lote tem o tempo somado dos seus arquivos
+        self.deadline = time.monotonic() + timeout * len(file_paths) if timeout else None
+        self.conn.send((indices, file_paths, mode, profile))
+
+    def stop(self, force=False):
+        try:
+            if force:
+                self.process.terminate()
+            else:
+                self.conn.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        self.process.join(timeout=1 if not force else None)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+
+class AnalysisEngine:
+    """Distribui analyze_audio em um pool de processos e entrega os resultados em lotes, na ordem de entrada"""
+
+    def __init__(self, workers=None, timeout=120.0, batch_size=16, batch_interval=0.25, peaks=False,
+                 mode='window', batch_files=1):
+        self.workers = default_workers() if workers is None else workers
+        self.mode = mode                      # 'window' (primeiro minuto) ou 'full' (música inteira)
+        # Arquivos por tarefa: acima de 1, o modo 'window' analisa em lote (batch_analysis)
+        self.batch_files = batch_files
+        self.peaks = peaks                    # gerar também os picos da forma de onda (waveform.py)
+        self.timeout = timeout                # limite de tempo por arquivo (segundos)
+        self.batch_size = batch_size          # resultados por lote entregue
+        self.batch_interval = batch_interval  # intervalo máximo entre lotes (segundos)
+        self._cancel = threading.Event()
+        self._ctx = mp.get_context("spawn")
+        self._pool = []        # processos mantidos entre execuções (ver start())
+        self._lock = threading.Lock()
+        self.busy = False
+
+    def start(self):
+        """Cria os processos antecipadamente (importação e compilação ocorrem em segundo plano)"""
+        with self._lock:
+            while len(self._pool) < self.workers:
+                self._pool.append(_Worker(self._ctx, self.peaks))
+
+    def shutdown(self):
+        """Encerra os processos mantidos pelo engine"""
+        with self._lock:
+            for worker in self._pool:
+                worker.stop()
+            self._pool = []
+
+    def cancel(self):
+        """Pede a interrupção da análise em andamento"""
+        self._cancel.set()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def run(self, paths, on_batch=None, on_progress=None, lookup=None, store=None, report=None):
+        """
+        Analisa os arquivos e retorna a lista de resultados na mesma ordem de `paths`.
+
+        on_batch(lista)        - chamado com lotes de resultados já ordenados
+        on_progress(feitos, total)
+        lookup(caminho)        - resultado já conhecido (cache) ou None
+        store(caminho, info)   - chamado para cada análise nova
+        report                 - instrumentation.RunReport que recebe as métricas de cada arquivo
+        """
+        self._cancel.clear()
+        self.busy = True
+        try:
+            return self._run(paths, on_batch, on_progress, lookup, store, report)
+        finally:
+            self.busy = False
+
+    def _run(self, paths, on_batch, on_progress, lookup, store, report):
+        paths = [str(p) for p in paths]
+        total = len(paths)
+        results = [None] * total
+        pending = []
+        done = 0
+
+        # Resultados em cache não passam pelo pool
+        for index, file_path in enumerate(paths):
+            cached = lookup(file_path) if lookup else None
+            if cached is not None:
+                results[index] = cached
+                done += 1
+            else:
+                pending.append(index)
+        if report and done:
+            report.add_cached(done)
+
+        state = {'next_emit': 0, 'last_emit': time.monotonic()}
+
+        def emit(force=False):
+            # Entregar apenas o prefixo contíguo já resolvido (ordem determinística)
+            start = state['next_emit']
+            end = start
+            while end < total and results[end] is not None:
+                end += 1
+            ready = end - start
+            if ready and (force or ready >= self.batch_size or
+                          time.monotonic() - state['last_emit'] >= self.batch_interval):
+                if on_batch:
+                    on_batch(results[start:end])
+                state['next_emit'] = end
+                state['last_emit'] = time.monotonic()
+
+        def finish(index, info, metrics=None):
+            nonlocal done
+            results[index] = info
+            done += 1
+            if report:
+                if metrics:
+                    report.add_file(metrics)
+                else:
+                    report.add_failure(paths[index], info.get('error'))
+            if store and not info.get('error'):
+                store(paths[index], info)
+            if on_progress:
+                on_progress(done, total)
+
+        if on_progress and done:
+            on_progress(done, total)
+
+        tasks = self._tasks(pending)
+        if self.workers <= 0:
+            # Modo sem processos (depuração): analisa na thread atual, sem limite de tempo
+            profile = report.profile() if report else None
+            profiler = Profiler(*profile) if profile else None
+            for indices in tasks:
+                if self.cancelled:
+                    break
+                entries = _analyze_task([paths[index] for index in indices], self.mode, self.peaks, profiler)
+                for index, (info, metrics) in zip(indices, entries):
+                    finish(index, info, metrics)
+                emit()
+        elif tasks:
+            self._run_pool(paths, tasks, finish, emit, report.profile() if report else None)
+
+        emit(force=True)
+        return results[:state['next_emit']] if self.cancelled else results
+
+    def _tasks(self, pending):
+        """Índices pendentes agrupados em tarefas (lotes só no modo 'window')"""
+        size = max(1, self.batch_files) if self.mode == 'window' else 1
+        # Poucos arquivos: lotes menores, para ocupar todos os processos
+        size = min(size, max(1, -(-len(pending) // max(1, self.workers))))
+        return [pending[start:start + size] for start in range(0, len(pending), size)]
+
+    def _run_pool(self, paths, tasks, finish, emit, profile=None):
+        queue = list(reversed(tasks))
+        with self._lock:
+            # Processos já iniciados por start() são reaproveitados e continuam vivos
+            persistent = bool(self._pool)
+            workers = self._pool if persistent else [
+                _Worker(self._ctx, self.peaks) for _ in range(min(self.workers, len(tasks)))
+            ]
+
+        def retry_or_fail(worker, reason):
+            # Um lote que derrubou o processo ou estourou o tempo é refeito arquivo por
+            # arquivo, para que só o arquivo problemático falhe
+            indices, file_paths = worker.task
+            if len(indices) > 1:
+                queue.extend([index] for index in reversed(indices))
+            else:
+                finish(indices[0], failed_analysis(file_paths[0], reason))
+
+        try:
+            while (queue or any(w.task for w in workers)) and not self.cancelled:
+                for worker in workers:
+                    if worker.task is None and queue:
+                        indices = queue.pop()
+                        worker.assign(indices, [paths[index] for index in indices], self.timeout, self.mode,
+                                      profile)
+
+                busy = [w for w in workers if w.task]
+                deadlines = [w.deadline for w in busy if w.deadline]
+                wait_time = 0.2
+                if deadlines:
+                    wait_time = max(0.0, min(wait_time, min(deadlines) - time.monotonic()))
+
+                ready = wait([w.conn for w in busy], timeout=wait_time)
+                for worker in busy:
+                    if worker.conn in ready:
+                        try:
+                            entries = worker.conn.recv()
+                        except (EOFError, OSError):
+                            # Processo morreu (ex.: falha no decodificador)
+                            retry_or_fail(worker, "processo de análise encerrado")
+                            workers[workers.index(worker)] = self._replace(worker)
+                        else:
+                            worker.task = None
+                            for index, info, metrics in entries:
+                                finish(index, info, metrics)
+                    elif worker.deadline and time.monotonic() >= worker.deadline:
+                        # Arquivo travou o decodificador: descartar processo e seguir
+                        print(f"Tempo limite ao analisar {', '.join(worker.task[1])}", file=sys.stderr)
+                        retry_or_fail(worker, f"tempo limite de {self.timeout:.0f}s")
+                        workers[workers.index(worker)] = self._replace(worker)
+                emit()
+        finally:
+            if self.cancelled or not persistent:
+                for worker in workers:
+                    worker.stop(force=self.cancelled)
+                if persistent:
+                    with self._lock:
+                        self._pool = []
+
+    def _replace(self, worker):
+        worker.stop(force=True)
+        return _Worker(self._ctx, self.peaks)
@@ -0,0 +1,149 @@
+import os
+import struct
+
+# Bytes lidos a partir do primeiro frame MP3 para achar o cabeçalho Xing/VBRI
+MP3_SCAN_BYTES = 64 * 1024
+
+# Tabelas de bitrate (kbps) por [versão MPEG][camada]; versão 1 = MPEG1, 2 = MPEG2/2.5
+_MP3_BITRATES = {
+    (1, 1): [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+    (1, 2): [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+    (1, 3): [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    (2, 1): [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+    (2, 2): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+    (2, 3): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+
+_MP3_SAMPLE_RATES = {
+    3: [44100, 48000, 32000],  # MPEG1
+    2: [22050, 24000, 16000],  # MPEG2
+    0: [11025, 12000, 8000],   # MPEG2.5
+}
+
+
+def probe_duration(file_path):
+    """Duração em segundos lida do cabeçalho do arquivo, sem decodificar o áudio (None se não souber)"""
+    ext = os.path.splitext(str(file_path))[1].lower()
+    try:
+        if ext == '.wav':
+            return _wav_duration(file_path)
+        if ext == '.mp3':
+            return _mp3_duration(file_path)
+    except (OSError, struct.error, ValueError):
+        pass
+    return None
+
+
+def _wav_duration(file_path):
+    file_size = os.path.getsize(file_path)
+    with open(file_path, 'rb') as f:
+        riff, _, wave = struct.unpack('<4sI4s', f.read(12))
+        if riff != b'RIFF' or wave != b'WAVE':
+            return None
+
+        byte_rate = None
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                return None
+            chunk_id, chunk_size = struct.unpack('<4sI', header)
+            if chunk_id == b'fmt ':
+                fmt = f.read(chunk_size)
+                byte_rate = struct.unpack('<I', fmt[8:12])[0]
+                f.seek(chunk_size % 2, os.SEEK_CUR)
+            elif chunk_id == b'data':
+                if not byte_rate:
+                    return None
+                # Arquivos truncados ou gravados em streaming podem ter tamanho inválido
+                data_size = min(chunk_size, file_size - f.tell())
+                return data_size / byte_rate
+            else:
+                f.seek(chunk_size + chunk_size % 2, os.SEEK_CUR)
+
+
+def _mp3_duration(file_path):
+    file_size = os.path.getsize(file_path)
+    with open(file_path, 'rb') as f:
+        # Pular tag ID3v2 (tamanho "syncsafe" de 28 bits)
+        offset = 0
+        header = f.read(10)
+        if header[:3] == b'ID3' and len(header) == 10:
+            size = (header[6] << 21) | (header[7] << 14) | (header[8] << 7) | header[9]
+            offset = 10 + size + (10 if header[5] & 0x10 else 0)
+
+        f.seek(offset)
+        data = f.read(MP3_SCAN_BYTES)
+
+        # Tag ID3v1 no final
+        f.seek(max(0, file_size - 128))
+        tail_tag = 128 if f.read(3) == b'TAG' else 0
+
+    pos = _find_mp3_frame(data)
+    if pos is None:
+        return None
+
+    frame = _parse_mp3_header(data[pos:pos + 4])
+    version_id, layer, bitrate, sample_rate, channel_mode = frame
+    samples_per_frame = 384 if layer == 1 else (1152 if layer == 2 or version_id == 3 else 576)
+
+    # Cabeçalho Xing/Info (VBR) logo após as "side info" do primeiro frame
+    if version_id == 3:
+        side_info = 17 if channel_mode == 3 else 32
+    else:
+        side_info = 9 if channel_mode == 3 else 17
+    xing = pos + 4 + side_info
+    if data[xing:xing + 4] in (b'Xing', b'Info'):
+        flags = struct.unpack('>I', data[xing + 4:xing + 8])[0]
+        if flags & 0x1:
+            frames = struct.unpack('>I', data[xing + 8:xing + 12])[0]
+            return frames * samples_per_frame / sample_rate
+
+    # Cabeçalho VBRI (Fraunhofer) em posição fixa
+    vbri = pos + 4 + 32
+    if data[vbri:vbri + 4] == b'VBRI':
+        frames = struct.unpack('>I', data[vbri + 14:vbri + 18])[0]
+        return frames * samples_per_frame / sample_rate
+
+    # Sem cabeçalho VBR: assumir bitrate constante
+    audio_bytes = file_size - offset - pos - tail_tag
+    return audio_bytes * 8 / (bitrate * 1000)
+
+
+def _find_mp3_frame(data):
+    """Posição do primeiro cabeçalho de frame válido (confirmado pelo frame seguinte quando possível)"""
+    pos = data.find(b'\xff')
+    while pos != -1 and pos + 4 <= len(data):
+        frame = _parse_mp3_header(data[pos:pos + 4])
+        if frame:
+            length = _mp3_frame_length(data[pos:pos + 4], frame)
+            following = data[pos + length:pos + length + 4]
+            if len(following) < 4 or _parse_mp3_header(following):
+                return pos
+        pos = data.find(b'\xff', pos + 1)
+    return None
+
+
+def _parse_mp3_header(header):
+    if len(header) < 4 or header[0] != 0xFF or (header[1] & 0xE0) != 0xE0:
+        return None
+    version_id = (header[1] >> 3) & 0x3
+    layer_bits = (header[1] >> 1) & 0x3
+    bitrate_index = header[2] >> 4
+    rate_index = (header[2] >> 2) & 0x3
+    if version_id == 1 or layer_bits == 0 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+    layer = 4 - layer_bits
+    bitrate = _MP3_BITRATES[(1 if version_id == 3 else 2, layer)][bitrate_index]
+    sample_rate = _MP3_SAMPLE_RATES[version_id][rate_index]
+    channel_mode = header[3] >> 6
+    return version_id, layer, bitrate, sample_rate, channel_mode
+
+
+def _mp3_frame_length(header, frame):
+    version_id, layer, bitrate, sample_rate, _ = frame
+    padding = (header[2] >> 1) & 0x1
+    if layer == 1:
+        return (12 * bitrate * 1000 // sample_rate + padding) * 4
+    if layer == 3 and version_id != 3:
+        return 72 * bitrate * 1000 // sample_rate + padding
+    return 144 * bitrate * 1000 // sample_rate + padding
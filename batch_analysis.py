@@ -0,0 +1,248 @@
+"""
+Análise em lote do modo 'window': as janelas decodificadas de várias músicas
+são empilhadas numa matriz (músicas x amostras) e passam juntas pelos mesmos
+kernels (STFT, mel, onsets, RMS e chroma CQT); o timbre usa o mesmo mel em dB.
+
+A janela do STFT e o banco de filtros mel são montados uma vez por processo
+e o buffer de enquadramento é reaproveitado entre lotes, então o custo fixo
+das chamadas do librosa (enquadramento, filtros, despacho, alocações) é pago
+uma vez por lote e o mel vira uma única multiplicação de matrizes. Só o
+rastreamento de batidas, que é sequencial, continua por música. Os
+resultados são os de analyze_audio(mode='window').
+"""
+import sys
+
+from analysis import (ANALYSIS_SR, HOP_LENGTH, N_FFT, analysis_result, analyze_audio, beat_grid,
+                      decode_window, failed_analysis, file_duration, key_features, loudness_db)
+from instrumentation import record_file, stage
+from key_detection import CHROMA_HOP, key_chroma
+from similarity import summarize_timbre, timbre_frames
+
+# Músicas por lote: lotes maiores amortizam mais, mas a memória cresce
+# (~6 MB de espectrograma por música com a janela de 60 s)
+BATCH_FILES = 8
+# Quadros do STFT enquadrados por vez (limita o buffer reaproveitado)
+FRAME_CHUNK = 512
+
+# Parâmetros implícitos de librosa.onset.onset_strength/power_to_db usados em analysis
+ONSET_DELAY = 1 + 2048 // (2 * 512)  # lag + compensação do enquadramento (n_fft/hop padrão)
+TOP_DB = 80.0
+AMIN = 1e-10
+# Parâmetros padrão de librosa.feature.tempo (estimativa usada por beat_track)
+TEMPO_AC_SIZE = 8.0
+TEMPO_START_BPM = 120.0
+TEMPO_STD_BPM = 1.0
+TEMPO_MAX_BPM = 320.0
+
+
+class BatchKernels:
+    """Janela, banco de filtros mel e buffers do STFT, montados uma vez e usados em todos os lotes"""
+
+    def __init__(self, sr=ANALYSIS_SR):
+        import librosa
+        import numpy as np
+
+        self.sr = sr
+        self.window = librosa.filters.get_window('hann', N_FFT, fftbins=True).astype(np.float32)
+        self.mel_basis = np.ascontiguousarray(librosa.filters.mel(sr=sr, n_fft=N_FFT).T, dtype=np.float32)
+        self._frames = np.empty((0, FRAME_CHUNK, N_FFT), dtype=np.float32)
+
+        # Tempograma: janela da autocorrelação, BPM de cada atraso e prior log-normal
+        self.tempo_window = int(librosa.time_to_frames(TEMPO_AC_SIZE, sr=sr, hop_length=HOP_LENGTH))
+        self.tempo_taper = librosa.filters.get_window('hann', self.tempo_window, fftbins=True).astype(np.float32)
+        self.tempo_bpms = librosa.tempo_frequencies(self.tempo_window, sr=sr, hop_length=HOP_LENGTH)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            prior = -0.5 * ((np.log2(self.tempo_bpms) - np.log2(TEMPO_START_BPM)) / TEMPO_STD_BPM) ** 2
+        prior[:int(np.argmax(self.tempo_bpms < TEMPO_MAX_BPM))] = -np.inf
+        self.tempo_prior = prior
+
+    def spectrogram(self, stack):
+        """Magnitude do STFT (músicas, quadros, bins), igual a librosa.stft(center=True)"""
+        import numpy as np
+        import scipy.fft
+
+        tracks = stack.shape[0]
+        padded = np.pad(stack, ((0, 0), (N_FFT // 2, N_FFT // 2)))
+        frames = np.lib.stride_tricks.sliding_window_view(padded, N_FFT, axis=-1)[:, ::HOP_LENGTH]
+        count = 1 + stack.shape[1] // HOP_LENGTH
+        if len(self._frames) < tracks:
+            self._frames = np.empty((tracks, FRAME_CHUNK, N_FFT), dtype=np.float32)
+        S = np.empty((tracks, count, N_FFT // 2 + 1), dtype=np.float32)
+        for start in range(0, count, FRAME_CHUNK):
+            end = min(start + FRAME_CHUNK, count)
+            buffer = self._frames[:tracks, :end - start]
+            np.multiply(frames[:, start:end], self.window, out=buffer)
+            np.abs(scipy.fft.rfft(buffer, axis=-1), out=S[:, start:end])
+        return S
+
+    def tempo(self, envelopes):
+        """
+        BPM de cada envelope de onsets, como librosa.feature.tempo: os quadros do
+        tempograma de todas as músicas formam uma única matriz contígua e a
+        autocorrelação é uma única rfft/irfft sobre ela.
+        """
+        import numpy as np
+        import scipy.fft
+
+        win = self.tempo_window
+        frames = []
+        for envelope in envelopes:
+            padded = np.pad(envelope, win // 2, mode='linear_ramp', end_values=0)
+            frames.append(np.lib.stride_tricks.sliding_window_view(padded, win)[:len(envelope)])
+        frames = np.concatenate(frames) * self.tempo_taper
+
+        size = scipy.fft.next_fast_len(2 * win - 1, real=True)
+        spectrum = scipy.fft.rfft(frames, n=size, axis=-1)
+        del frames
+        autocorr = scipy.fft.irfft(np.abs(spectrum) ** 2, n=size, axis=-1)[:, :win]
+        del spectrum
+        # Normalização de cada quadro pelo máximo (librosa.util.normalize, norm=inf)
+        peak = np.abs(autocorr).max(axis=1, keepdims=True)
+        peak[peak < np.finfo(autocorr.dtype).tiny] = 1
+        autocorr /= peak
+
+        tempos = []
+        start = 0
+        for envelope in envelopes:
+            tempogram = autocorr[start:start + len(envelope)].mean(axis=0)
+            start += len(envelope)
+            best = np.argmax(np.log1p(1e6 * tempogram) + self.tempo_prior)
+            tempos.append(float(self.tempo_bpms[best]))
+        return tempos
+
+    def features(self, stack, lengths):
+        """Features de cada música do lote (mesmo formato de features_from_spectrogram)"""
+        import librosa
+        import numpy as np
+
+        with stage('stft'):
+            power = self.spectrogram(stack)
+            np.square(power, out=power)
+
+        with stage('onset'):
+            # Mel em dB e fluxo espectral positivo, com o limite de 80 dB por música
+            db = power @ self.mel_basis
+            np.maximum(db, AMIN, out=db)
+            np.log10(db, out=db)
+            db *= 10
+            np.maximum(db, db.max(axis=(1, 2), keepdims=True) - TOP_DB, out=db)
+            flux = np.maximum(0, np.diff(db, axis=1)).mean(axis=2)
+            onsets = np.zeros((len(stack), power.shape[1]), dtype=flux.dtype)
+            onsets[:, ONSET_DELAY:] = flux[:, :power.shape[1] - ONSET_DELAY]
+
+        with stage('rms'):
+            # Mesma conta de librosa.feature.rms(S=...): DC e Nyquist contam pela metade
+            energy = 2 * power.sum(axis=2) - power[:, :, 0] - power[:, :, -1]
+            rms = np.sqrt(energy / N_FFT ** 2)
+
+        try:
+            with stage('chroma'):
+                chroma = key_chroma(stack, self.sr)
+        except Exception:
+            chroma = None
+
+        envelopes = [onsets[i, :1 + length // HOP_LENGTH] for i, length in enumerate(lengths)]
+        try:
+            with stage('tempo'):
+                tempos = self.tempo(envelopes)
+        except Exception:
+            tempos = [None] * len(envelopes)
+
+        results = []
+        for i, length in enumerate(lengths):
+            frames = len(envelopes[i])
+            features = {}
+            try:
+                with stage('beat_track'):
+                    # Com o BPM já estimado, beat_track só faz a programação dinâmica
+                    tempo, beats = librosa.beat.beat_track(onset_envelope=envelopes[i], sr=self.sr,
+                                                           hop_length=HOP_LENGTH, bpm=tempos[i])
+                features['bpm'] = int(np.asarray(tempo).item())
+            except Exception:
+                features['bpm'] = 120
+                beats = []
+            try:
+                features['beat_grid'] = beat_grid(librosa.frames_to_time(beats, sr=self.sr,
+                                                                         hop_length=HOP_LENGTH))
+            except Exception:
+                features['beat_grid'] = None
+            track_chroma = None
+            if chroma is not None:
+                track_chroma = chroma[i, :, :1 + length // CHROMA_HOP].mean(axis=1)
+            features.update(key_features(track_chroma))
+            features['loudness_db'] = loudness_db(rms[i, :frames].mean())
+            try:
+                with stage('timbre'):
+                    features['timbre'] = summarize_timbre(timbre_frames(
+                        db[i, :frames].T, np.sqrt(power[i, :frames]).T, self.sr, N_FFT))
+            except Exception:
+                features['timbre'] = None
+            results.append(features)
+        return results
+
+
+_kernels = None
+
+
+def kernels():
+    """Kernels do processo (criados no primeiro lote)"""
+    global _kernels
+    if _kernels is None:
+        _kernels = BatchKernels()
+    return _kernels
+
+
+def analyze_batch(file_paths):
+    """
+    Analisa as músicas em lote; retorna [(resultado, FileMetrics)] na ordem de file_paths.
+
+    A decodificação é medida por arquivo; as etapas do lote são divididas
+    igualmente entre as músicas que participaram dele.
+    """
+    import numpy as np
+
+    entries = []   # (resultado, métricas); None enquanto a música espera o lote
+    decoded = []   # (posição, sinal, duração)
+    for file_path in file_paths:
+        with record_file(file_path) as metrics:
+            try:
+                y, _ = decode_window(file_path)
+                duration = file_duration(file_path)
+            except Exception as e:
+                print(f"Erro ao analisar {file_path}: {e}", file=sys.stderr)
+                entries.append((failed_analysis(file_path, e), metrics))
+                continue
+        if len(y) < N_FFT:
+            # Curta demais para o lote: análise individual (que decide como falhar)
+            with record_file(file_path) as metrics:
+                entries.append((analyze_audio(file_path), metrics))
+            continue
+        decoded.append((len(entries), y, duration))
+        entries.append((None, metrics))
+
+    if decoded:
+        # Sinais mais curtos completados com zeros (só os quadros de cada música são usados)
+        lengths = [len(y) for _, y, _ in decoded]
+        stack = np.zeros((len(decoded), max(lengths)), dtype=np.float32)
+        for row, (_, y, _) in enumerate(decoded):
+            stack[row, :len(y)] = y
+
+        with record_file("lote") as shared:
+            try:
+                features = kernels().features(stack, lengths)
+            except Exception as e:
+                print(f"Erro na análise em lote, analisando individualmente: {e}", file=sys.stderr)
+                features = None
+
+        for row, (position, _, duration) in enumerate(decoded):
+            metrics = entries[position][1]
+            file_path = file_paths[position]
+            if features is None:
+                with record_file(file_path) as single:
+                    info = analyze_audio(file_path)
+                metrics.add_share(single)
+            else:
+                info = analysis_result(file_path, features[row], duration)
+                metrics.add_share(shared, 1 / len(decoded))
+            entries[position] = (info, metrics)
+    return entries
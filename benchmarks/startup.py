@@ -0,0 +1,151 @@
+"""
+Benchmark de inicialização: tempo até a primeira janela e até a primeira análise.
+
+    python benchmarks/startup.py [--runs 5] [--cold] [--output resultado.json]
+
+Cada medição roda em um processo Python novo (imports frios), contando a partir
+do lançamento do processo. --cold usa um cache do numba vazio em cada execução,
+simulando a primeira abertura do programa.
+"""
+import os
+import sys
+import json
+import math
+import time
+import wave
+import struct
+import tempfile
+import argparse
+import statistics
+import subprocess
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+CHILD_IMPORT = r'''
+import time
+t0 = time.perf_counter()
+import main
+print(f"RESULT {time.perf_counter() - t0:.6f}", flush=True)
+'''
+
+CHILD_WINDOW = r'''
+import time
+t0 = time.perf_counter()
+import tkinter as tk
+import main
+root = tk.Tk()
+app = main.DJSetOrganizer(root)
+root.update()
+print(f"RESULT {time.perf_counter() - t0:.6f}", flush=True)
+root.destroy()
+'''
+
+CHILD_ANALYSIS = r'''
+import sys
+import time
+t0 = time.perf_counter()
+import main
+from analysis_engine import AnalysisEngine
+if __name__ == "__main__":
+    engine = AnalysisEngine(workers=1)
+    result = engine.run([sys.argv[1]])
+    assert not result[0].get('error'), result[0]
+    print(f"RESULT {time.perf_counter() - t0:.6f}", flush=True)
+'''
+
+
+def write_test_track(path, seconds=10, sr=22050, bpm=124):
+    """Gera um WAV curto (seno + cliques no tempo) para a medição da análise"""
+    beat = int(sr * 60 / bpm)
+    frames = bytearray()
+    for n in range(seconds * sr):
+        value = 0.2 * math.sin(2 * math.pi * 220 * n / sr)
+        if n % beat < 300:
+            value += 0.6 * math.sin(2 * math.pi * 1000 * n / sr)
+        frames += struct.pack('<h', int(value * 32767))
+    with wave.open(str(path), 'wb') as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(sr)
+        f.writeframes(bytes(frames))
+
+
+def measure(child_code, args=(), env=None):
+    """Roda o código em um interpretador novo; retorna (tempo desde o lançamento, tempo interno) ou None"""
+    script = Path(tempfile.gettempdir()) / "djset_startup_child.py"
+    script.write_text(child_code, encoding='utf-8')
+    child_env = dict(os.environ, PYTHONPATH=str(REPO_ROOT), **(env or {}))
+    # stderr vai para um arquivo: com PIPE, um filho que escreve muito nele travaria antes do RESULT
+    with tempfile.TemporaryFile(mode='w+', encoding='utf-8') as errors:
+        start = time.perf_counter()
+        proc = subprocess.Popen([sys.executable, str(script), *args], cwd=str(REPO_ROOT), env=child_env,
+                                stdout=subprocess.PIPE, stderr=errors, text=True)
+        with proc:
+            for line in proc.stdout:
+                if line.startswith("RESULT "):
+                    # O tempo é tomado no RESULT; o resto da saída é descartado até o filho sair
+                    elapsed = time.perf_counter() - start
+                    proc.stdout.read()
+                    return elapsed, float(line.split()[1])
+        errors.seek(0)
+        return None, errors.read().strip().splitlines()[-1:] or ["sem saída"]
+
+
+def summarize(samples):
+    return {
+        'median': statistics.median(samples),
+        'min': min(samples),
+        'max': max(samples),
+        'samples': samples,
+    }
+
+
+def run_benchmark(name, child_code, runs, args=(), cold=False):
+    wall, inner = [], []
+    for _ in range(runs):
+        env = {}
+        if cold:
+            env['NUMBA_CACHE_DIR'] = tempfile.mkdtemp(prefix="djset_numba_")
+        elapsed, detail = measure(child_code, args, env)
+        if elapsed is None:
+            return {'skipped': detail[0]}
+        wall.append(elapsed)
+        inner.append(detail)
+        print(f"{name}: {elapsed:.3f}s", file=sys.stderr)
+    return {'since_launch': summarize(wall), 'in_process': summarize(inner)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--cold', action='store_true', help="cache do numba vazio em cada execução")
+    parser.add_argument('--output', '-o', help="arquivo JSON de saída (padrão: saída padrão)")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        track = Path(tmp) / "startup_track.wav"
+        write_test_track(track)
+
+        results = {
+            'benchmark': 'startup',
+            'python': sys.version.split()[0],
+            'platform': sys.platform,
+            'runs': args.runs,
+            'cold_numba_cache': args.cold,
+            'import_main': run_benchmark("import main", CHILD_IMPORT, args.runs),
+            'time_to_first_window': run_benchmark("primeira janela", CHILD_WINDOW, args.runs),
+            'time_to_first_analysis': run_benchmark("primeira análise", CHILD_ANALYSIS, args.runs,
+                                                    args=(str(track),), cold=args.cold),
+        }
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + "\n", encoding='utf-8')
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,396 @@
+"""
+Suite de benchmarks: análise, sugestões e atualização das listas.
+
+    python benchmarks/suite.py [--sizes 100,1000,10000,50000] [--tracks 24] [--workers N] [--batch 8]
+                               [--queries 50] [--skip analysis,scoring,search,ui]
+                               [--output resultado.json] [--compare anterior.json]
+
+Tudo é gerado localmente. Músicas sintéticas (acorde da tonalidade + bumbo no
+tempo) têm BPM e nota conhecidos e medem a vazão da análise e a precisão do
+BPM/nota; bibliotecas sintéticas (só metadados, nos tamanhos de --sizes)
+medem a latência das sugestões, da busca, do destaque de compatíveis e da
+atualização do set na interface. O resultado é JSON; --compare mostra a variação das
+medianas em relação a uma execução anterior.
+"""
+import os
+import sys
+import json
+import time
+import random
+import tempfile
+import argparse
+import statistics
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_ROOT))
+
+import core  # noqa: E402
+from track_store import Track  # noqa: E402
+
+DEFAULT_SIZES = (100, 1000, 10000, 50000)
+SYNTH_SR = 22050
+TRACK_SECONDS = 40
+SET_SIZE = 50
+BPM_CHOICES = (90, 100, 110, 118, 122, 124, 126, 128, 130, 134, 140, 150, 160, 174)
+NOTE_NAMES = ['C', 'C#', 'D', 'D#', 'E', 'F', 'F#', 'G', 'G#', 'A', 'A#', 'B']
+KEYS = list(core.CAMELOT_WHEEL)
+NAME_WORDS = ('deep', 'house', 'techno', 'minimal', 'acid', 'vocal', 'dub', 'disco', 'remix', 'edit',
+              'original', 'mix', 'night', 'sunrise', 'groove', 'bass', 'dream', 'club', 'tribal', 'soul')
+FOLDERS = ('House', 'Techno', 'Disco', 'Warmup', 'Peak')
+# Buscas digitadas letra a letra (cada prefixo é uma consulta)
+SEARCH_QUERIES = ("8A/9A 122-126 energia>70", "deep house", "techno bpm>128", "nota:Am 120-124 vocal")
+
+
+def summarize(samples):
+    return {
+        'median': statistics.median(samples),
+        'min': min(samples),
+        'max': max(samples),
+        'runs': len(samples),
+    }
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+
+# Músicas sintéticas (análise)
+
+def synth_track(path, bpm, key, seconds=TRACK_SECONDS, sr=SYNTH_SR):
+    """WAV com a tríade da tonalidade sustentada, bumbo em cada batida e chimbal no contratempo"""
+    import numpy as np
+    import soundfile as sf
+
+    t = np.arange(int(seconds * sr)) / sr
+    root = NOTE_NAMES.index(key.rstrip('m'))
+    third = 3 if key.endswith('m') else 4
+    y = np.zeros_like(t)
+    for octave in (3, 4):
+        for interval, gain in ((0, 1.0), (third, 0.6), (7, 0.6)):
+            # Nota MIDI da classe de altura na oitava (C4 = 60)
+            freq = 440 * 2 ** ((12 * (octave + 1) + root + interval - 69) / 12)
+            y += gain * np.sin(2 * np.pi * freq * t)
+    y *= 0.06
+
+    period = 60 / bpm
+    phase = t % period
+    y += 0.8 * np.sin(2 * np.pi * 55 * phase) * np.exp(-phase * 25)
+    offbeat = (t + period / 2) % period
+    noise = np.random.default_rng(bpm).standard_normal(len(t))
+    y += 0.15 * noise * np.exp(-offbeat * 120)
+
+    sf.write(str(path), (0.9 * y / np.abs(y).max()).astype(np.float32), sr)
+
+
+def make_tracks(folder, count):
+    """Gera as músicas de teste; retorna [(caminho, bpm, nota)]"""
+    rng = random.Random(0)
+    tracks = []
+    for i in range(count):
+        bpm = BPM_CHOICES[i % len(BPM_CHOICES)]
+        key = KEYS[i % len(KEYS)]
+        path = Path(folder) / f"{i:03d}_{bpm}_{key.replace('#', 's')}.wav"
+        synth_track(path, bpm, key)
+        tracks.append((str(path), bpm, key))
+    rng.shuffle(tracks)
+    return tracks
+
+
+def accuracy(tracks, results):
+    """Acertos de BPM (±1, e contando meio/dobro tempo) e de nota (exata e compatível na Camelot Wheel)"""
+    by_path = {r['path']: r for r in results}
+    rows = []
+    for path, bpm, key in tracks:
+        result = by_path.get(path, {})
+        detected_bpm = result.get('bpm')
+        detected_key = result.get('key', "N/A")
+        rows.append({
+            'bpm': bpm,
+            'detected_bpm': detected_bpm,
+            'key': key,
+            'detected_key': detected_key,
+            'bpm_ok': detected_bpm is not None and abs(detected_bpm - bpm) <= 1,
+            'bpm_octave_ok': detected_bpm is not None and any(
+                abs(detected_bpm * factor - bpm) <= 1 for factor in (0.5, 1, 2)),
+            'key_ok': detected_key == key,
+            'key_compatible': core.calculate_mixing_compatibility(detected_key, key) >= 90,
+        })
+    total = max(len(rows), 1)
+    errors = [abs(r['detected_bpm'] - r['bpm']) for r in rows if r['detected_bpm'] is not None]
+    return {
+        'bpm_mean_abs_error': statistics.mean(errors) if errors else None,
+        'bpm_accuracy': sum(r['bpm_ok'] for r in rows) / total,
+        'bpm_accuracy_with_octave': sum(r['bpm_octave_ok'] for r in rows) / total,
+        'key_accuracy': sum(r['key_ok'] for r in rows) / total,
+        'key_compatible_accuracy': sum(r['key_compatible'] for r in rows) / total,
+        'tracks': rows,
+    }
+
+
+def bench_analysis(count, workers, mode, batch):
+    from analysis import analyze_audio, warm_up
+    from analysis_engine import AnalysisEngine
+
+    with tempfile.TemporaryDirectory(prefix="djset_bench_") as folder:
+        print(f"gerando {count} músicas sintéticas...", file=sys.stderr)
+        tracks = make_tracks(folder, count)
+        paths = [path for path, _, _ in tracks]
+
+        # Latência por arquivo no próprio processo (depois de compilar as funções do numba)
+        warm_up()
+        latencies = []
+        for path in paths:
+            elapsed, _ = timed(analyze_audio, path, mode)
+            latencies.append(elapsed)
+        print(f"análise: {statistics.median(latencies) * 1000:.0f} ms/arquivo", file=sys.stderr)
+
+        # Vazão do engine com os processos já aquecidos (sem cache)
+        engine = AnalysisEngine(workers=workers, mode=mode)
+        try:
+            # Uma rodada curta para importar/compilar em todos os processos antes de medir
+            engine.run(paths[:engine.workers])
+            elapsed, results = timed(engine.run, paths)
+        finally:
+            engine.shutdown()
+        print(f"engine: {len(paths) / elapsed:.1f} arquivos/s com {engine.workers} processos", file=sys.stderr)
+
+        # Mesmo engine analisando `batch` músicas por tarefa (batch_analysis)
+        batch_elapsed = None
+        if mode == 'window' and batch > 1:
+            engine = AnalysisEngine(workers=workers, mode=mode, batch_files=batch)
+            try:
+                engine.run(paths[:engine.workers * 2])
+                batch_elapsed, batch_results = timed(engine.run, paths)
+            finally:
+                engine.shutdown()
+            print(f"engine em lote: {len(paths) / batch_elapsed:.1f} arquivos/s "
+                  f"({batch} por lote)", file=sys.stderr)
+
+    return {
+        'mode': mode,
+        'tracks': count,
+        'track_seconds': TRACK_SECONDS,
+        'per_file_latency': summarize(latencies),
+        'engine_workers': engine.workers,
+        'engine_seconds': elapsed,
+        'engine_files_per_second': len(paths) / elapsed,
+        'batch_files': batch if batch_elapsed else None,
+        'batch_seconds': batch_elapsed,
+        'batch_files_per_second': len(paths) / batch_elapsed if batch_elapsed else None,
+        'accuracy': accuracy(tracks, results),
+        'batch_accuracy': accuracy(tracks, batch_results) if batch_elapsed else None,
+    }
+
+
+# Bibliotecas sintéticas (sugestões e interface)
+
+def make_library(size, seed=0):
+    """Metadados de `size` músicas com BPM, nota, volume e timbre aleatórios"""
+    import numpy as np
+    from similarity import TIMBRE_SIZE
+
+    rng = random.Random(seed)
+    names = random.Random(seed + 1)  # gerador separado: BPM/nota/volume iguais aos de execuções anteriores
+    timbres = np.random.default_rng(seed + 2).standard_normal((size, TIMBRE_SIZE)).astype(np.float32)
+    library = []
+    for i in range(size):
+        key = rng.choice(KEYS)
+        name = f"{names.choice(NAME_WORDS)} {names.choice(NAME_WORDS)} {i:06d}.mp3"
+        library.append(Track(f"/bench/{names.choice(FOLDERS)}/{name}",
+                             bpm=rng.randint(85, 175),
+                             key=key,
+                             loudness_db=rng.uniform(-42, -3),
+                             duration=rng.uniform(120, 540),
+                             timbre=timbres[i]))
+    return library
+
+
+def bench_scoring(size, queries):
+    from scoring import LibraryColumns
+
+    library = make_library(size)
+    build, columns = timed(LibraryColumns, library)
+    rng = random.Random(1)
+    excluded = {music.path for music in rng.sample(library, min(SET_SIZE, size))}
+    timbre_build, _ = timed(lambda: columns.timbre)
+    latencies = []
+    similar = []
+    for _ in range(queries):
+        reference = rng.choice(library)
+        elapsed, _ = timed(core.find_harmonic_matches, reference, columns, excluded)
+        latencies.append(elapsed)
+        elapsed, _ = timed(core.find_similar_tracks, reference, columns, excluded)
+        similar.append(elapsed)
+    print(f"sugestões ({size}): {statistics.median(latencies) * 1000:.2f} ms, "
+          f"som parecido {statistics.median(similar) * 1000:.2f} ms", file=sys.stderr)
+    return {'columns_build_seconds': build, 'timbre_index_build_seconds': timbre_build,
+            'suggestion_latency': summarize(latencies), 'similar_latency': summarize(similar)}
+
+
+def bench_search(size):
+    """Índices da busca e latência de cada tecla digitada nas buscas de exemplo"""
+    from search_index import SearchIndex, parse_query
+
+    library = make_library(size)
+    for i, music in enumerate(library):
+        music.id = f"t{i}"
+    index = SearchIndex()
+    build, _ = timed(lambda: [index.add(music) for music in library])
+    prepare, _ = timed(index.prepare)
+    latencies = []
+    for text in SEARCH_QUERIES:
+        for end in range(1, len(text) + 1):
+            elapsed, _ = timed(lambda: index.search(parse_query(text[:end])))
+            latencies.append(elapsed)
+    print(f"busca ({size}): {statistics.median(latencies) * 1000:.2f} ms "
+          f"(máx. {max(latencies) * 1000:.2f} ms)", file=sys.stderr)
+    return {'index_build_seconds': build, 'prepare_seconds': prepare, 'keystroke_latency': summarize(latencies)}
+
+
+def bench_ui(sizes, queries):
+    """Inserção na lista, destaque de compatíveis e atualização do set, com o Tk desenhando"""
+    try:
+        import tkinter as tk
+        root = tk.Tk()
+    except Exception as e:
+        return {'skipped': f"interface indisponível: {e}"}
+
+    import main as app_module
+
+    results = {}
+    temp = tempfile.TemporaryDirectory(prefix="djset_bench_")
+    # A sessão salva do usuário não pode ser reaberta (nem a pasta dela monitorada) durante a medição
+    app_module.AUTOSAVE_PATH = Path(temp.name) / "sem_sessao.djset"
+    try:
+        root.withdraw()
+        app = app_module.DJSetOrganizer(root)
+        # Deixar rodar a inicialização adiada (áudio) antes de medir
+        time.sleep(0.3)
+        root.update()
+        app.stop_folder_watch()
+        app.cancel_loading()
+
+        def settle():
+            root.update_idletasks()
+            root.update()
+
+        for size in sizes:
+            app.load_generation += 1
+            app.music_files = []
+            app.library_columns = None
+            app.music_tags = {}
+            app.set_list = []
+            app.registry.clear()
+            app.music_tree.set_rows([])
+            app.set_tree.set_rows([])
+            settle()
+
+            library = make_library(size)
+            insert, _ = timed(lambda: (app.append_music_batch(app.load_generation, library), settle()))
+
+            rng = random.Random(2)
+            for music in rng.sample(library, min(SET_SIZE, size)):
+                app.add_to_set(music)
+            settle()
+
+            highlight = []
+            for _ in range(queries):
+                app.set_tree.selection_set(rng.choice(app.set_list).id)
+                elapsed, _ = timed(lambda: (app.highlight_compatible_tracks(), settle()))
+                highlight.append(elapsed)
+
+            refresh = []
+            for _ in range(queries):
+                rng.shuffle(app.set_list)
+                elapsed, _ = timed(lambda: (app.update_set_list(), settle()))
+                refresh.append(elapsed)
+
+            results[str(size)] = {
+                'library_insert_seconds': insert,
+                'highlight_latency': summarize(highlight),
+                'set_refresh_latency': summarize(refresh),
+            }
+            print(f"interface ({size}): destaque {statistics.median(highlight) * 1000:.1f} ms, "
+                  f"set {statistics.median(refresh) * 1000:.1f} ms", file=sys.stderr)
+    finally:
+        root.destroy()
+        temp.cleanup()
+    return results
+
+
+# Comparação entre execuções
+
+def medians(node, prefix=""):
+    """{caminho: mediana} de todas as medições do resultado"""
+    found = {}
+    if isinstance(node, dict):
+        if 'median' in node:
+            found[prefix] = node['median']
+        for key, value in node.items():
+            if isinstance(value, dict):
+                found.update(medians(value, f"{prefix}.{key}" if prefix else key))
+    return found
+
+
+def compare(previous, current):
+    """Variação (%) de cada mediana presente nas duas execuções"""
+    old, new = medians(previous), medians(current)
+    changes = {}
+    for path in sorted(old.keys() & new.keys()):
+        if old[path]:
+            changes[path] = (new[path] - old[path]) / old[path] * 100
+    return changes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default=",".join(map(str, DEFAULT_SIZES)),
+                        help="tamanhos das bibliotecas sintéticas, separados por vírgula")
+    parser.add_argument('--tracks', type=int, default=24, help="músicas sintéticas para a análise")
+    parser.add_argument('--workers', type=int, default=None, help="processos de análise")
+    parser.add_argument('--mode', choices=['window', 'full'], default='window', help="modo de análise")
+    parser.add_argument('--batch', type=int, default=8, help="músicas por lote na análise em lote (1 = não medir)")
+    parser.add_argument('--queries', type=int, default=50, help="consultas por tamanho de biblioteca")
+    parser.add_argument('--skip', default="", help="seções a pular: analysis, scoring, search, ui")
+    parser.add_argument('--output', '-o', help="arquivo JSON de saída (padrão: saída padrão)")
+    parser.add_argument('--compare', help="JSON de uma execução anterior para comparar")
+    args = parser.parse_args(argv)
+
+    sizes = [int(size) for size in args.sizes.split(",") if size]
+    skip = {name.strip() for name in args.skip.split(",") if name.strip()}
+
+    results = {
+        'benchmark': 'suite',
+        'python': sys.version.split()[0],
+        'platform': sys.platform,
+        'cpu_count': os.cpu_count(),
+        'sizes': sizes,
+    }
+    if 'analysis' not in skip:
+        results['analysis'] = bench_analysis(args.tracks, args.workers, args.mode, args.batch)
+    if 'scoring' not in skip:
+        results['scoring'] = {str(size): bench_scoring(size, args.queries) for size in sizes}
+    if 'search' not in skip:
+        results['search'] = {str(size): bench_search(size) for size in sizes}
+    if 'ui' not in skip:
+        results['ui'] = bench_ui(sizes, min(args.queries, 20))
+
+    if args.compare:
+        previous = json.loads(Path(args.compare).read_text(encoding='utf-8'))
+        results['compare'] = compare(previous, results)
+        for path, change in results['compare'].items():
+            print(f"{path}: {change:+.1f}%", file=sys.stderr)
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + "\n", encoding='utf-8')
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
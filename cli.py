@@ -0,0 +1,301 @@
+"""
+Modo linha de comando (sem interface gráfica) do Organizador de Set DJ.
+
+    python cli.py analyze PASTA [--format json|csv] [--output ARQUIVO]
+    python cli.py suggest PASTA_OU_JSON MUSICA [--limit 10] [--by-sound]
+    python cli.py export PASTA_OU_JSON DESTINO MUSICA [MUSICA ...]
+    python cli.py order PASTA_OU_JSON MUSICA [MUSICA ...] [--energy rising|falling|peak]
+
+PASTA_OU_JSON é uma pasta de músicas (analisada usando o cache da pasta), o
+JSON gerado por `analyze --format json` ou uma sessão salva pela interface
+(.djset ou .json); da sessão é usada a biblioteca. Músicas são indicadas pelo caminho ou
+pelo nome do arquivo.
+
+Códigos de saída:
+    0  sucesso
+    1  erro de execução (pasta/arquivo inexistente, falha ao copiar)
+    2  argumentos inválidos
+    3  análise concluída, mas alguns arquivos falharam
+    4  música não encontrada (ou nome ambíguo) na biblioteca
+"""
+import os
+import sys
+import csv
+import json
+import argparse
+import multiprocessing
+
+import core
+from track_store import Track
+
+EXIT_OK = 0
+EXIT_ERROR = 1
+EXIT_USAGE = 2
+EXIT_PARTIAL = 3
+EXIT_NOT_FOUND = 4
+
+TRACK_FIELDS = ['path', 'name', 'bpm', 'key', 'camelot', 'key_confidence', 'volume', 'duration',
+                'loudness_db', 'duration_seconds', 'error']
+SUGGESTION_FIELDS = ['path', 'name', 'bpm', 'key', 'camelot', 'bpm_diff',
+                     'harmonic_score', 'bpm_score', 'sound_score', 'total_score']
+
+
+class CliError(Exception):
+    def __init__(self, message, code=EXIT_ERROR):
+        super().__init__(message)
+        self.code = code
+
+
+def analysis_mode(args):
+    return 'full' if args.full else 'window'
+
+
+def load_source(source, workers=None, timeout=None, progress=False, mode='window', report=None, batch=None):
+    """Carrega a biblioteca de uma pasta (com análise/cache) ou de um JSON exportado"""
+    if os.path.isdir(source):
+        from analysis_engine import AnalysisEngine
+        from batch_analysis import BATCH_FILES
+
+        engine = AnalysisEngine(workers=workers, mode=mode, batch_files=BATCH_FILES if batch is None else batch)
+        if timeout:
+            engine.timeout = timeout
+
+        def on_progress(done, total):
+            print(f"\r{done}/{total} músicas analisadas", end='', file=sys.stderr, flush=True)
+
+        music_files, _, _ = core.load_library(source, engine, on_progress=on_progress if progress else None,
+                                              report=report)
+        if progress and music_files:
+            print(file=sys.stderr)
+        return music_files
+
+    if os.path.isfile(source):
+        from session import BINARY_EXTENSION, SessionError, is_session, load_session, session_from_json
+
+        try:
+            if source.lower().endswith(BINARY_EXTENSION):
+                return load_session(source).library
+            with open(source, encoding='utf-8') as f:
+                data = json.load(f)
+            if is_session(data):
+                return session_from_json(data).library
+        except SessionError as e:
+            raise CliError(str(e))
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            raise CliError(f"Não foi possível ler {source}: {e}")
+        if not isinstance(data, list):
+            raise CliError(f"{source} não é uma lista de músicas gerada por 'analyze'")
+        try:
+            return [Track.from_analysis(info) for info in data]
+        except (AttributeError, KeyError, TypeError, ValueError) as e:
+            raise CliError(f"{source} não é uma lista de músicas gerada por 'analyze': {e}")
+
+    raise CliError(f"Pasta ou arquivo não encontrado: {source}")
+
+
+def find_track(library, reference):
+    """Localiza uma música pelo caminho ou pelo nome do arquivo"""
+    absolute = os.path.abspath(reference)
+    matches = [m for m in library if m.path == reference or os.path.abspath(m.path) == absolute]
+    if not matches:
+        matches = [m for m in library if m.name == reference]
+    if not matches:
+        raise CliError(f"Música não encontrada: {reference}", EXIT_NOT_FOUND)
+    if len(matches) > 1:
+        paths = "\n  ".join(m.path for m in matches)
+        raise CliError(f"Nome ambíguo '{reference}', use o caminho:\n  {paths}", EXIT_NOT_FOUND)
+    return matches[0]
+
+
+def write_rows(rows, fields, fmt, output):
+    """Escreve as linhas em JSON ou CSV no arquivo indicado (ou na saída padrão)"""
+    stream = open(output, 'w', encoding='utf-8', newline='') if output else sys.stdout
+    try:
+        if fmt == 'csv':
+            writer = csv.DictWriter(stream, fieldnames=fields, extrasaction='ignore')
+            writer.writeheader()
+            writer.writerows(rows)
+        else:
+            json.dump(rows, stream, ensure_ascii=False, indent=2)
+            stream.write("\n")
+    finally:
+        if output:
+            stream.close()
+
+
+def cmd_analyze(args):
+    report = None
+    if args.report or args.profile or not args.quiet:
+        from instrumentation import RunReport
+        report = RunReport(label=args.folder, profile_dir=args.profile)
+    music_files = load_source(args.folder, args.workers, args.timeout, progress=not args.quiet,
+                              mode=analysis_mode(args), report=report, batch=args.batch)
+    write_rows([m.to_dict() for m in music_files], TRACK_FIELDS, args.format, args.output)
+    if report:
+        if args.report:
+            report.save(args.report)
+        print_report_summary(report, stages=bool(args.report or args.profile))
+    failed = [m for m in music_files if m.error]
+    if failed:
+        print(f"{len(failed)} de {len(music_files)} arquivos não puderam ser analisados", file=sys.stderr)
+        return EXIT_PARTIAL
+    return EXIT_OK
+
+
+def print_report_summary(report, stages=True):
+    """Resumo do relatório de desempenho na saída de erro (vazão e, opcionalmente, as etapas)"""
+    summary = report.summary()
+    rate = f" ({summary['files_per_second']:.1f} músicas/s)" if summary['files_analyzed'] else ""
+    print(f"{summary['files_analyzed']} analisadas, {summary['files_cached']} do cache, "
+          f"{summary['files_failed']} com falha em {summary['wall']:.1f}s{rate}", file=sys.stderr)
+    if not stages:
+        return
+    for name, totals in summary['analysis_stages'].items():
+        print(f"  {name:<15} {totals['wall']:8.2f}s parede {totals['cpu']:8.2f}s CPU", file=sys.stderr)
+    for failure in summary['failures']:
+        print(f"  falha: {failure['path']}: {failure['reason']}", file=sys.stderr)
+
+
+def cmd_suggest(args):
+    library = load_source(args.source, args.workers, args.timeout, mode=analysis_mode(args),
+                          batch=args.batch)
+    reference = find_track(library, args.track)
+    exclude = [find_track(library, name).path for name in args.exclude]
+    find = core.find_similar_tracks if args.by_sound else core.find_harmonic_matches
+    suggestions = find(reference, library, exclude_paths=exclude, limit=args.limit)
+    rows = []
+    for suggestion in suggestions:
+        row = suggestion['music'].to_dict()
+        row.update({key: value for key, value in suggestion.items() if key != 'music'})
+        rows.append(row)
+    write_rows(rows, SUGGESTION_FIELDS, args.format, args.output)
+    return EXIT_OK
+
+
+def read_set(args, library):
+    """Músicas do set indicadas na linha de comando e/ou em --set-file"""
+    names = list(args.tracks)
+    if args.set_file:
+        try:
+            with open(args.set_file, encoding='utf-8') as f:
+                names.extend(line.strip() for line in f if line.strip())
+        except (OSError, UnicodeDecodeError) as e:
+            raise CliError(f"Não foi possível ler {args.set_file}: {e}", EXIT_ERROR)
+    if not names:
+        raise CliError("Nenhuma música informada para o set", EXIT_USAGE)
+    return [find_track(library, name) for name in names]
+
+
+def cmd_export(args):
+    library = load_source(args.source, args.workers, args.timeout, mode=analysis_mode(args),
+                          batch=args.batch)
+    set_list = read_set(args, library)
+    try:
+        exported = core.export_set(set_list, args.dest)
+    except OSError as e:
+        raise CliError(f"Erro ao exportar set: {e}")
+    write_rows([{'path': path} for path in exported], ['path'], args.format, args.output)
+    return EXIT_OK
+
+
+def cmd_order(args):
+    # Importado aqui: o sequenciador depende do NumPy
+    import sequencer
+
+    library = load_source(args.source, args.workers, args.timeout, mode=analysis_mode(args),
+                          batch=args.batch)
+    candidates = read_set(args, library) if args.tracks or args.set_file else library
+    # Remover repetições mantendo a ordem informada
+    candidates = list({music.path: music for music in candidates}.values())
+    opener = find_track(candidates, args.opener) if args.opener else None
+    closer = find_track(candidates, args.closer) if args.closer else None
+    if opener is not None and opener is closer:
+        raise CliError("A mesma música não pode abrir e fechar o set", EXIT_USAGE)
+
+    ordered = sequencer.order_set(
+        candidates,
+        length=args.length,
+        opener=candidates.index(opener) if opener else None,
+        closer=candidates.index(closer) if closer else None,
+        energy_curve=args.energy,
+        time_limit=args.time_limit,
+    )
+    print(f"Transição média: {sequencer.sequence_score(ordered):.1f}%", file=sys.stderr)
+    write_rows([m.to_dict() for m in ordered], TRACK_FIELDS, args.format, args.output)
+    return EXIT_OK
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="cli.py",
+        description="Organizador de Set DJ - análise e exportação sem interface gráfica",
+        epilog="Códigos de saída: 0 sucesso, 1 erro, 2 argumentos inválidos, "
+               "3 falha parcial na análise, 4 música não encontrada",
+    )
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--format', choices=['json', 'csv'], default='json', help="formato de saída")
+    common.add_argument('--output', '-o', help="arquivo de saída (padrão: saída padrão)")
+    common.add_argument('--workers', type=int, default=None, help="processos de análise")
+    common.add_argument('--timeout', type=float, default=None, help="tempo limite por arquivo (s)")
+    common.add_argument('--batch', type=int, default=None, metavar='N',
+                        help="músicas analisadas juntas por processo, em matrizes empilhadas "
+                             "(modo janela; 1 = uma por vez)")
+    common.add_argument('--full', action='store_true',
+                        help="analisar a música inteira (BPM/tom por segmento), em vez do primeiro minuto")
+
+    analyze = subparsers.add_parser('analyze', parents=[common], help="analisa uma pasta de músicas")
+    analyze.add_argument('folder')
+    analyze.add_argument('--quiet', '-q', action='store_true', help="não mostrar progresso")
+    analyze.add_argument('--report', help="grava o relatório de desempenho da análise (JSON)")
+    analyze.add_argument('--profile', metavar='PASTA',
+                         help="grava um perfil do cProfile por processo de análise (resumido no relatório)")
+    analyze.set_defaults(func=cmd_analyze)
+
+    suggest = subparsers.add_parser('suggest', parents=[common], help="sugestões harmônicas para uma música")
+    suggest.add_argument('source', help="pasta de músicas ou JSON gerado por 'analyze'")
+    suggest.add_argument('track', help="caminho ou nome da música de referência")
+    suggest.add_argument('--limit', type=int, default=10)
+    suggest.add_argument('--exclude', action='append', default=[], help="música a ignorar (repetível)")
+    suggest.add_argument('--by-sound', action='store_true',
+                         help="músicas de som mais parecido (timbre), sem considerar tom e BPM")
+    suggest.set_defaults(func=cmd_suggest)
+
+    export = subparsers.add_parser('export', parents=[common], help="copia o set, numerado, para uma pasta")
+    export.add_argument('source', help="pasta de músicas ou JSON gerado por 'analyze'")
+    export.add_argument('dest', help="pasta de destino")
+    export.add_argument('tracks', nargs='*', help="músicas do set, na ordem")
+    export.add_argument('--set-file', help="arquivo com uma música por linha")
+    export.set_defaults(func=cmd_export)
+
+    order = subparsers.add_parser('order', parents=[common],
+                                  help="ordena o set pelas melhores transições (harmonia + BPM)")
+    order.add_argument('source', help="pasta de músicas ou JSON gerado por 'analyze'")
+    order.add_argument('tracks', nargs='*', help="músicas candidatas (padrão: toda a biblioteca)")
+    order.add_argument('--set-file', help="arquivo com uma música por linha")
+    order.add_argument('--length', type=int, default=None, help="tamanho do set (padrão: todas as candidatas)")
+    order.add_argument('--opener', help="música que deve abrir o set")
+    order.add_argument('--closer', help="música que deve fechar o set")
+    order.add_argument('--energy', choices=['rising', 'falling', 'peak'], default=None,
+                       help="curva de energia alvo ao longo do set")
+    order.add_argument('--time-limit', type=float, default=0.8, help="tempo máximo da ordenação (s)")
+    order.set_defaults(func=cmd_order)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        return args.func(args)
+    except CliError as e:
+        print(e, file=sys.stderr)
+        return e.code
+    except KeyboardInterrupt:
+        return EXIT_ERROR
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,277 @@
+"""
+Lógica do organizador sem interface gráfica: carregamento/análise da pasta,
+compatibilidade harmônica e exportação do set.
+
+Este módulo não importa tkinter, pygame nem a pilha de DSP (librosa/numpy),
+para que a CLI e scripts possam usá-lo com inicialização rápida.
+"""
+import sys
+from contextlib import nullcontext
+
+# Camelot Wheel mapping
+CAMELOT_WHEEL = {
+    # Menores (A)
+    'Am': '8A', 'Em': '9A', 'Bm': '10A', 'F#m': '11A', 'C#m': '12A', 'G#m': '1A',
+    'D#m': '2A', 'A#m': '3A', 'Fm': '4A', 'Cm': '5A', 'Gm': '6A', 'Dm': '7A',
+    # Maiores (B)
+    'C': '8B', 'G': '9B', 'D': '10B', 'A': '11B', 'E': '12B', 'B': '1B',
+    'F#': '2B', 'C#': '3B', 'G#': '4B', 'D#': '5B', 'A#': '6B', 'F': '7B'
+}
+
+# Score mínimo para uma música aparecer nas sugestões
+MIN_SUGGESTION_SCORE = 50
+
+
+def get_camelot_code(key):
+    """Converte uma nota musical para código Camelot"""
+    return CAMELOT_WHEEL.get(key, "N/A")
+
+
+def get_compatible_keys(camelot_code):
+    """Retorna as chaves compatíveis para mixagem harmônica"""
+    if camelot_code == "N/A":
+        return []
+
+    try:
+        # Extrair número e letra
+        number = int(camelot_code[:-1])
+        letter = camelot_code[-1]
+
+        compatible = []
+
+        # Regras do Camelot Wheel:
+        # 1. Mesma chave (perfeita)
+        compatible.append(camelot_code)
+
+        # 2. +1/-1 no círculo (mesmo modo)
+        next_num = (number % 12) + 1
+        prev_num = ((number - 2) % 12) + 1
+        compatible.append(f"{next_num}{letter}")
+        compatible.append(f"{prev_num}{letter}")
+
+        # 3. Modo relativo (mesmo número, letra oposta)
+        opposite_letter = 'B' if letter == 'A' else 'A'
+        compatible.append(f"{number}{opposite_letter}")
+
+        # 4. +1/-1 do modo relativo
+        compatible.append(f"{next_num}{opposite_letter}")
+        compatible.append(f"{prev_num}{opposite_letter}")
+
+        return compatible
+
+    except:
+        return []
+
+
+def calculate_mixing_compatibility(key1, key2):
+    """Calcula compatibilidade entre duas chaves (0-100%)"""
+    camelot1 = get_camelot_code(key1)
+    camelot2 = get_camelot_code(key2)
+
+    if camelot1 == "N/A" or camelot2 == "N/A":
+        return 0
+
+    if camelot1 == camelot2:
+        return 100  # Perfeita
+
+    compatible_keys = get_compatible_keys(camelot1)
+
+    if camelot2 in compatible_keys:
+        # Determinar tipo de compatibilidade
+        try:
+            num1 = int(camelot1[:-1])
+            letter1 = camelot1[-1]
+            num2 = int(camelot2[:-1])
+            letter2 = camelot2[-1]
+
+            if letter1 == letter2:  # Mesmo modo
+                return 90
+            elif num1 == num2:  # Modo relativo
+                return 85
+            else:  # +1/-1 do relativo
+                return 75
+        except:
+            return 50
+
+    return 25  # Compatibilidade baixa
+
+
+def bpm_compatibility(bpm_diff):
+    """Compatibilidade de BPM (diferença máxima de 6 BPM é considerada boa)"""
+    if bpm_diff <= 3:
+        return 100
+    elif bpm_diff <= 6:
+        return 80
+    elif bpm_diff <= 10:
+        return 60
+    return max(0, 60 - (bpm_diff - 10) * 2)
+
+
+def find_harmonic_matches(reference_music, library, exclude_paths=(), limit=10):
+    """
+    Encontra músicas da biblioteca compatíveis harmonicamente com a referência.
+
+    `library` é uma lista de músicas ou um scoring.LibraryColumns já montado
+    (reaproveitável entre consultas).
+    """
+    # Importado aqui: a pontuação vetorizada depende do NumPy
+    from scoring import LibraryColumns
+
+    if not isinstance(library, LibraryColumns):
+        library = LibraryColumns(library)
+    return library.top_matches(reference_music, exclude_paths, limit)
+
+
+def find_similar_tracks(reference_music, library, exclude_paths=(), limit=10):
+    """
+    Encontra as músicas da biblioteca de som mais parecido com a referência
+    (timbre, sem considerar tom ou BPM), no formato de find_harmonic_matches.
+    """
+    from scoring import LibraryColumns
+
+    if not isinstance(library, LibraryColumns):
+        library = LibraryColumns(library)
+    return library.similar_tracks(reference_music, exclude_paths, limit)
+
+
+def load_library(folder, engine=None, on_batch=None, on_progress=None, report=None):
+    """
+    Varre a pasta e analisa as músicas (usando o cache da pasta).
+
+    Retorna (músicas, snapshot, duplicadas), onde as músicas são track_store.Track,
+    snapshot é {caminho: (tamanho, mtime_ns)} e duplicadas são os
+    duplicates.DuplicateGroup de cópias idênticas; on_batch recebe os mesmos Track.
+    Cada grupo de cópias é analisado uma vez (as cópias vêm logo depois do
+    arquivo analisado, com o mesmo resultado).
+    `report` (instrumentation.RunReport) recebe os tempos de cada etapa e arquivo.
+    """
+    # Importados aqui: o pool de análise só é necessário quando há pasta para analisar
+    from analysis import ANALYSIS_VERSION
+    from analysis_cache import AnalysisCache
+    from analysis_engine import AnalysisEngine
+    from duplicates import identical_groups, with_path
+    from folder_watch import scan_music_files
+    from track_store import Track
+
+    engine = engine or AnalysisEngine()
+    measure = report.stage if report else (lambda name: nullcontext())
+    music_files = []
+    cache = None
+
+    def add_batch(batch):
+        # Resultados da análise (dicts, como no cache) viram Track uma única vez
+        tracks = []
+        for info in batch:
+            tracks.append(Track.from_analysis(info))
+            for path in copies.get(info['path'], ()):
+                copy = with_path(info, path)
+                tracks.append(Track.from_analysis(copy))
+                if cache and cache.get(path) is None:
+                    cache.put(path, copy)
+        music_files.extend(tracks)
+        if on_batch:
+            on_batch(tracks)
+
+    # Encontrar arquivos de música (uma única varredura da árvore), em ordem estável
+    with measure('scan'):
+        snapshot = scan_music_files(folder)
+        files = sorted(snapshot)
+
+    # Cópias idênticas (mesmo conteúdo em outra subpasta) reaproveitam a análise do primeiro arquivo
+    with measure('duplicates'):
+        duplicates = identical_groups(snapshot)
+    copies = {group.representative: group.copies for group in duplicates}
+    skipped = {path for group in duplicates for path in group.copies}
+
+    # Cache persistente: arquivos sem alteração não são reanalisados
+    try:
+        with measure('cache_open'):
+            cache = AnalysisCache.for_folder(folder, ANALYSIS_VERSION)
+    except Exception as e:
+        print(f"Cache de análise indisponível: {e}", file=sys.stderr)
+        cache = None
+
+    # O grupo usa o resultado em cache de qualquer uma das cópias
+    lookup = duplicate_lookup(cache_lookup(cache, engine.mode), duplicates) if cache else None
+
+    try:
+        with measure('analysis'):
+            engine.run([path for path in files if path not in skipped],
+                       on_batch=add_batch,
+                       on_progress=on_progress,
+                       lookup=lookup,
+                       store=cache.put if cache else None,
+                       report=report)
+    finally:
+        if cache:
+            with measure('cache_prune'):
+                if not engine.cancelled:
+                    # Remover do cache arquivos que foram apagados da pasta
+                    cache.prune(files)
+                cache.close()
+        if report:
+            report.finish()
+
+    return music_files, snapshot, duplicates
+
+
+def duplicate_lookup(lookup, groups):
+    """
+    Envolve um lookup para que um arquivo de um grupo de cópias idênticas
+    (duplicates.DuplicateGroup) use o resultado de qualquer cópia do grupo.
+    """
+    from duplicates import with_path
+
+    members = {path: group.paths for group in groups for path in group.paths}
+
+    def find(file_path):
+        others = [path for path in members.get(file_path, ()) if path != file_path]
+        for path in (file_path, *others):
+            info = lookup(path)
+            if info is not None:
+                return info if path == file_path else with_path(info, file_path)
+        return None
+
+    return find
+
+
+def cache_lookup(cache, mode):
+    """
+    Busca no cache compatível com o modo de análise (resultados completos servem aos dois modos).
+
+    Entradas com outro método de detecção de nota são re-tonalizadas a partir
+    do chroma guardado (e atualizadas no cache), sem decodificar o áudio.
+    """
+    from key_detection import key_method, rekey
+
+    method = key_method()
+
+    def lookup(file_path):
+        info = cache.get(file_path)
+        if not info or (mode == 'full' and info.get('analysis_mode') != 'full'):
+            return None
+        if info.get('key_method') != method:
+            info = rekey(info)
+            if info is None:
+                return None  # sem chroma: reanalisar
+            cache.put(file_path, info)
+        return info
+    return lookup
+
+
+def export_file_name(position, music):
+    """Nome do arquivo exportado: posição no set + nome original"""
+    return f"{position:02d} - {music.name}"
+
+
+def export_set(set_list, dest_folder, on_progress=None, exporter=None):
+    """
+    Copia as músicas do set para a pasta de destino, na ordem, e retorna os caminhos criados.
+
+    As cópias são feitas em paralelo por set_export.SetExporter (hardlink/reflink
+    quando possível, retomável); on_progress(bytes_feitos, bytes_total).
+    """
+    from set_export import SetExporter
+
+    exporter = exporter or SetExporter()
+    return exporter.run(set_list, dest_folder, on_progress=on_progress)
@@ -0,0 +1,218 @@
+"""
+Detecção de músicas duplicadas na pasta (inclusive em subpastas diferentes).
+
+Cópias idênticas são encontradas em etapas, cada uma só sobre os candidatos
+da anterior:
+1. tamanho (já conhecido pela varredura, sem ler os arquivos);
+2. hash rápido do início e do fim do arquivo (analysis_cache.quick_hash);
+3. hash do arquivo inteiro (mmap), para confirmar.
+
+O mesmo áudio em arquivos diferentes (ex.: MP3 e WAV da mesma faixa) é
+procurado entre músicas já analisadas com duração, BPM, nota e loudness
+compatíveis; só esses candidatos são decodificados para comparar uma
+impressão digital compacta do áudio.
+"""
+import hashlib
+import mmap
+from collections import defaultdict
+from pathlib import Path
+
+from analysis_cache import HASH_CHUNK, quick_hash
+
+IDENTICAL = 'identical'
+AUDIO = 'audio'
+
+# Candidatos a mesmo áudio (comparados pela impressão digital)
+DURATION_TOLERANCE = 1.0   # segundos
+BPM_TOLERANCE = 1.0
+LOUDNESS_TOLERANCE = 1.5   # dB
+
+# Impressão digital: 32 bits por quadro (diferenças de energia entre bandas e
+# entre quadros, como em Haitsma & Kalker), nos primeiros segundos da música
+FINGERPRINT_SR = 5512
+FINGERPRINT_SECONDS = 30
+FINGERPRINT_N_FFT = 2048
+FINGERPRINT_HOP = 64
+FINGERPRINT_BANDS = 33
+FINGERPRINT_FMIN = 300
+FINGERPRINT_FMAX = 2000
+# Deslocamento máximo testado entre as impressões (atraso do codificador MP3)
+ALIGN_FRAMES = 16
+# Fração máxima de bits diferentes para considerar o mesmo áudio (áudios
+# diferentes ficam perto de 0,5)
+MAX_BIT_ERROR = 0.3
+
+
+class DuplicateGroup:
+    """Arquivos com a mesma música: cópias idênticas ('identical') ou o mesmo áudio em arquivos diferentes ('audio')"""
+
+    def __init__(self, paths, kind=IDENTICAL):
+        self.paths = sorted(paths)
+        self.kind = kind
+
+    def __repr__(self):
+        return f"DuplicateGroup({self.kind!r}, {self.paths!r})"
+
+    @property
+    def representative(self):
+        """Arquivo analisado pelo grupo (o primeiro na ordem da biblioteca)"""
+        return self.paths[0]
+
+    @property
+    def copies(self):
+        return self.paths[1:]
+
+    def to_dict(self):
+        return {'kind': self.kind, 'paths': self.paths}
+
+
+def full_hash(file_path):
+    """Hash do conteúdo inteiro, lido por mmap"""
+    with open(file_path, 'rb') as f:
+        try:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                return hashlib.blake2b(data, digest_size=16).hexdigest()
+        except ValueError:  # arquivo vazio
+            return hashlib.blake2b(b"", digest_size=16).hexdigest()
+
+
+def _split(paths, key):
+    """Subgrupos (com 2 ou mais arquivos) de mesma chave; arquivos ilegíveis ficam de fora"""
+    groups = defaultdict(list)
+    for path in paths:
+        try:
+            groups[key(path)].append(path)
+        except OSError:
+            continue
+    return [group for group in groups.values() if len(group) > 1]
+
+
+def identical_groups(snapshot):
+    """Grupos de arquivos com conteúdo idêntico, a partir da varredura {caminho: (tamanho, mtime_ns)}"""
+    by_size = defaultdict(list)
+    for path, (size, _) in snapshot.items():
+        if size > 0:
+            by_size[size].append(path)
+
+    groups = []
+    for size, paths in by_size.items():
+        if len(paths) < 2:
+            continue
+        for candidates in _split(paths, lambda path: quick_hash(path, size)):
+            # Até 2 x HASH_CHUNK o hash rápido já cobre o arquivo inteiro
+            confirmed = [candidates] if size <= 2 * HASH_CHUNK else _split(candidates, full_hash)
+            groups.extend(DuplicateGroup(group) for group in confirmed)
+    return sorted(groups, key=lambda group: group.representative)
+
+
+def audio_fingerprint(file_path):
+    """Impressão digital compacta: um uint32 por quadro de ~12 ms"""
+    import librosa
+    import numpy as np
+
+    y, sr = librosa.load(file_path, sr=FINGERPRINT_SR, mono=True, duration=FINGERPRINT_SECONDS,
+                         res_type='soxr_qq')
+    power = np.abs(librosa.stft(y, n_fft=FINGERPRINT_N_FFT, hop_length=FINGERPRINT_HOP)) ** 2
+    bands = librosa.filters.mel(sr=sr, n_fft=FINGERPRINT_N_FFT, n_mels=FINGERPRINT_BANDS,
+                                fmin=FINGERPRINT_FMIN, fmax=FINGERPRINT_FMAX, norm=None) @ power
+    # Bit = sinal da variação (entre quadros) da diferença de energia entre bandas vizinhas
+    energy = np.diff(bands, axis=0)
+    bits = np.diff(energy, axis=1).T > 0  # (quadros, 32)
+    return np.ascontiguousarray(np.packbits(bits, axis=1, bitorder='little')).view('<u4').reshape(-1)
+
+
+def fingerprint_distance(a, b, align=ALIGN_FRAMES):
+    """Menor fração de bits diferentes entre duas impressões, testando deslocamentos de até `align` quadros"""
+    import numpy as np
+
+    best = 1.0
+    for shift in range(-align, align + 1):
+        x, y = (a[shift:], b) if shift >= 0 else (a, b[-shift:])
+        count = min(len(x), len(y))
+        if count < 2 * align:
+            continue
+        differing = np.unpackbits(np.bitwise_xor(x[:count], y[:count]).view(np.uint8)).sum()
+        best = min(best, differing / (count * 32))
+    return best
+
+
+def _similar(a, b):
+    """Se duas músicas analisadas podem ser o mesmo áudio (pré-filtro barato da impressão digital)"""
+    if a.key != b.key or abs(a.bpm - b.bpm) > BPM_TOLERANCE:
+        return False
+    if a.duration is None or b.duration is None or abs(a.duration - b.duration) > DURATION_TOLERANCE:
+        return False
+    if a.loudness_db is not None and b.loudness_db is not None:
+        return abs(a.loudness_db - b.loudness_db) <= LOUDNESS_TOLERANCE
+    return True
+
+
+def find_duplicates(snapshot, tracks=(), audio=False, groups=None):
+    """
+    Grupos de duplicadas da pasta: cópias idênticas e, com audio=True, o mesmo
+    áudio em arquivos diferentes entre as músicas analisadas (`tracks`).
+
+    `groups` reaproveita grupos idênticos já calculados (ex.: no carregamento).
+    """
+    groups = identical_groups(snapshot) if groups is None else groups
+    if not audio:
+        return groups
+
+    # União dos arquivos do mesmo grupo (o representante identifica o grupo)
+    parent = {}
+
+    def find(path):
+        while parent.get(path, path) != path:
+            path = parent[path]
+        return path
+
+    def union(a, b):
+        a, b = find(a), find(b)
+        if a != b:
+            parent[max(a, b)] = min(a, b)
+
+    for group in groups:
+        for path in group.copies:
+            union(group.representative, path)
+
+    # Candidatos por nota e duração (baldes de DURATION_TOLERANCE, comparando com o vizinho)
+    tracks = [t for t in tracks if not t.error and t.duration]
+    buckets = defaultdict(list)
+    for track in tracks:
+        buckets[track.key, int(track.duration // DURATION_TOLERANCE)].append(track)
+    fingerprints = {}
+
+    def fingerprint(track):
+        if track.path not in fingerprints:
+            try:
+                fingerprints[track.path] = audio_fingerprint(track.path)
+            except Exception:
+                fingerprints[track.path] = None
+        return fingerprints[track.path]
+
+    matched = set()
+    for (key, bucket), members in buckets.items():
+        neighbours = members + buckets.get((key, bucket + 1), [])
+        for i, a in enumerate(members):
+            for b in neighbours[i + 1:]:
+                if find(a.path) == find(b.path) or not _similar(a, b):
+                    continue
+                fa, fb = fingerprint(a), fingerprint(b)
+                if fa is None or fb is None:
+                    continue
+                if fingerprint_distance(fa, fb) <= MAX_BIT_ERROR:
+                    union(a.path, b.path)
+                    matched.update((a.path, b.path))
+
+    members = defaultdict(list)
+    for path in {path for group in groups for path in group.paths} | matched:
+        members[find(path)].append(path)
+    identical = {frozenset(group.paths) for group in groups}
+    result = [DuplicateGroup(paths, IDENTICAL if frozenset(paths) in identical else AUDIO)
+              for paths in members.values() if len(paths) > 1]
+    return sorted(result, key=lambda group: group.representative)
+
+
+def with_path(info, path):
+    """Resultado da análise de um arquivo reaproveitado para uma cópia idêntica"""
+    return dict(info, path=path, name=Path(path).name)
@@ -0,0 +1,85 @@
+import os
+import threading
+
+MUSIC_EXTENSIONS = ('.mp3', '.wav')
+
+
+def scan_music_files(folder):
+    """Percorre a pasta uma única vez com os.scandir e retorna {caminho: (tamanho, mtime_ns)}"""
+    snapshot = {}
+    pending = [str(folder)]
+    while pending:
+        directory = pending.pop()
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            pending.append(entry.path)
+                        elif os.path.splitext(entry.name)[1].lower() in MUSIC_EXTENSIONS and entry.is_file():
+                            stat = entry.stat()
+                            snapshot[entry.path] = (stat.st_size, stat.st_mtime_ns)
+                    except OSError:
+                        continue  # Arquivo removido durante a varredura
+        except OSError:
+            continue  # Pasta sem permissão ou removida
+    return snapshot
+
+
+def diff_snapshots(old, new):
+    """Compara duas varreduras e retorna (adicionados, removidos, alterados)"""
+    added = sorted(path for path in new if path not in old)
+    removed = sorted(path for path in old if path not in new)
+    changed = sorted(path for path, state in new.items() if path in old and old[path] != state)
+    return added, removed, changed
+
+
+class FolderWatcher:
+    """Verifica a pasta periodicamente e avisa sobre arquivos adicionados, removidos ou alterados"""
+
+    def __init__(self, folder, snapshot, on_change, interval=5.0):
+        self.folder = folder
+        self.snapshot = dict(snapshot)
+        self.on_change = on_change  # on_change(adicionados, removidos, alterados), chamado na thread do monitor
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        # Arquivos cujo tamanho/mtime ainda está mudando (cópia em andamento)
+        unsettled = {}
+        while not self._stop.wait(self.interval):
+            current = scan_music_files(self.folder)
+            added, removed, changed = diff_snapshots(self.snapshot, current)
+
+            # Só reportar arquivos novos/alterados depois de duas varreduras iguais
+            ready_added, ready_changed = [], []
+            for path in added + changed:
+                if unsettled.get(path) == current[path]:
+                    del unsettled[path]
+                    (ready_added if path in added else ready_changed).append(path)
+                else:
+                    unsettled[path] = current[path]
+            for path in list(unsettled):
+                if path not in current:
+                    del unsettled[path]
+
+            if not (ready_added or removed or ready_changed):
+                continue
+
+            # Atualizar o snapshot apenas com o que foi reportado
+            for path in removed:
+                self.snapshot.pop(path, None)
+            for path in ready_added + ready_changed:
+                self.snapshot[path] = current[path]
+
+            if not self._stop.is_set():
+                self.on_change(ready_added, removed, ready_changed)
@@ -0,0 +1,256 @@
+"""
+Instrumentação da análise: tempo de parede e de CPU por etapa, bytes
+decodificados e falhas, por arquivo e para o carregamento inteiro.
+
+analyze_audio marca as etapas com stage(); elas só são medidas quando há um
+FileMetrics ativo na thread (record_file), então sem relatório o custo é
+nulo. Os processos de análise devolvem as métricas junto com o resultado e
+o RunReport agrega tudo num relatório exportável em JSON. Opcionalmente cada
+processo grava um perfil do cProfile, resumido no mesmo relatório; os arquivos
+de cada execução têm um prefixo próprio, então a pasta indicada pode conter
+outros perfis (nada que o programa não criou é apagado).
+"""
+import os
+import sys
+import json
+import time
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+# Arquivos mais lentos e funções do perfil listados no relatório
+SLOWEST_FILES = 10
+PROFILE_FUNCTIONS = 25
+
+_local = threading.local()
+
+
+class FileMetrics:
+    """Medições da análise de um arquivo"""
+
+    def __init__(self, path):
+        self.path = path
+        self.stages = {}        # nome -> [parede, cpu, chamadas]
+        self.bytes_decoded = 0  # PCM float32 mono na taxa original do arquivo
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.error = None
+
+    def add_stage(self, name, wall, cpu):
+        totals = self.stages.setdefault(name, [0.0, 0.0, 0])
+        totals[0] += wall
+        totals[1] += cpu
+        totals[2] += 1
+
+    def add_share(self, other, fraction=1.0):
+        """Soma uma fração das medições de outro FileMetrics (ex.: etapas compartilhadas por um lote)"""
+        for name, (wall, cpu, _) in other.stages.items():
+            self.add_stage(name, wall * fraction, cpu * fraction)
+        self.wall += other.wall * fraction
+        self.cpu += other.cpu * fraction
+        self.bytes_decoded += int(other.bytes_decoded * fraction)
+
+    def to_dict(self):
+        return {
+            'path': self.path,
+            'wall': self.wall,
+            'cpu': self.cpu,
+            'bytes_decoded': self.bytes_decoded,
+            'error': self.error,
+            'stages': {name: {'wall': wall, 'cpu': cpu, 'calls': calls}
+                       for name, (wall, cpu, calls) in self.stages.items()},
+        }
+
+
+def current():
+    """FileMetrics ativo na thread (None quando nada está sendo medido)"""
+    return getattr(_local, 'metrics', None)
+
+
+@contextmanager
+def record_file(path):
+    """Ativa a medição da análise de `path` na thread atual"""
+    metrics = FileMetrics(path)
+    previous = current()
+    _local.metrics = metrics
+    wall, cpu = time.perf_counter(), time.process_time()
+    try:
+        yield metrics
+    finally:
+        metrics.wall = time.perf_counter() - wall
+        metrics.cpu = time.process_time() - cpu
+        _local.metrics = previous
+
+
+@contextmanager
+def stage(name):
+    """Mede uma etapa da análise (somada se a etapa se repetir, ex.: blocos do modo completo)"""
+    metrics = current()
+    if metrics is None:
+        yield
+        return
+    wall, cpu = time.perf_counter(), time.process_time()
+    try:
+        yield
+    finally:
+        metrics.add_stage(name, time.perf_counter() - wall, time.process_time() - cpu)
+
+
+def add_bytes(count):
+    """Soma bytes decodificados ao arquivo sendo medido"""
+    metrics = current()
+    if metrics is not None:
+        metrics.bytes_decoded += int(count)
+
+
+def profile_prefix():
+    """Prefixo dos perfis de uma execução (data/hora e processo principal)"""
+    return f"djset-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"
+
+
+class Profiler:
+    """cProfile de um processo de análise, regravado em profile_dir após cada arquivo"""
+
+    def __init__(self, profile_dir, prefix):
+        import cProfile
+
+        self.path = Path(profile_dir) / f"{prefix}-worker-{os.getpid()}.prof"
+        self.profile = cProfile.Profile()
+
+    @contextmanager
+    def active(self):
+        self.profile.enable()
+        try:
+            yield
+        finally:
+            self.profile.disable()
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.profile.dump_stats(str(self.path))
+
+
+def profile_summary(profile_dir, prefix, limit=PROFILE_FUNCTIONS):
+    """Funções com maior tempo acumulado, somando os perfis de todos os processos da execução `prefix`"""
+    import pstats
+
+    files = sorted(str(p) for p in Path(profile_dir).glob(f"{prefix}-worker-*.prof"))
+    if not files:
+        return []
+    stats = pstats.Stats(*files)
+    rows = []
+    for (filename, line, function), (_, calls, total, cumulative, _) in stats.stats.items():
+        rows.append({
+            'function': f"{Path(filename).name}:{line}({function})",
+            'calls': calls,
+            'total_time': total,
+            'cumulative_time': cumulative,
+        })
+    rows.sort(key=lambda row: row['cumulative_time'], reverse=True)
+    return rows[:limit]
+
+
+class RunReport:
+    """Relatório de um carregamento: etapas gerais, métricas por arquivo, cache e falhas"""
+
+    def __init__(self, label="", profile_dir=None):
+        self.label = label
+        self.profile_dir = profile_dir  # grava perfis do cProfile dos processos (opcional)
+        self.profile_prefix = profile_prefix() if profile_dir else None
+        self.started = time.time()
+        self.wall = None
+        self.cpu = None
+        self.stages = {}    # etapas do carregamento (varredura, análise, ...)
+        self.files = []     # FileMetrics.to_dict() de cada arquivo analisado
+        self.cached = 0
+        self.failures = []  # {'path', 'reason'} (inclui tempo limite e processo encerrado)
+        self._wall = time.perf_counter()
+        self._cpu = time.process_time()
+        self._lock = threading.Lock()
+
+    def profile(self):
+        """(pasta, prefixo) dos perfis desta execução, enviado aos processos de análise (None sem perfil)"""
+        return (self.profile_dir, self.profile_prefix) if self.profile_dir else None
+
+    @contextmanager
+    def stage(self, name):
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            with self._lock:
+                totals = self.stages.setdefault(name, {'wall': 0.0, 'cpu': 0.0})
+                totals['wall'] += time.perf_counter() - wall
+                totals['cpu'] += time.process_time() - cpu
+
+    def add_file(self, metrics):
+        with self._lock:
+            self.files.append(metrics)
+            if metrics.get('error'):
+                self.failures.append({'path': metrics['path'], 'reason': metrics['error']})
+
+    def add_cached(self, count=1):
+        with self._lock:
+            self.cached += count
+
+    def add_failure(self, path, reason):
+        """Falha sem métricas do processo (tempo limite, processo encerrado)"""
+        with self._lock:
+            self.files.append({'path': path, 'wall': None, 'cpu': None, 'bytes_decoded': 0,
+                               'error': reason, 'stages': {}})
+            self.failures.append({'path': path, 'reason': reason})
+
+    def finish(self):
+        self.wall = time.perf_counter() - self._wall
+        self.cpu = time.process_time() - self._cpu
+
+    def stage_totals(self):
+        """Soma de cada etapa da análise em todos os arquivos, da mais cara para a mais barata"""
+        totals = {}
+        for metrics in self.files:
+            for name, values in metrics['stages'].items():
+                total = totals.setdefault(name, {'wall': 0.0, 'cpu': 0.0, 'calls': 0, 'files': 0})
+                total['wall'] += values['wall']
+                total['cpu'] += values['cpu']
+                total['calls'] += values['calls']
+                total['files'] += 1
+        return dict(sorted(totals.items(), key=lambda item: item[1]['wall'], reverse=True))
+
+    def slowest_files(self, limit=SLOWEST_FILES):
+        measured = [m for m in self.files if m['wall'] is not None]
+        return sorted(measured, key=lambda m: m['wall'], reverse=True)[:limit]
+
+    def summary(self):
+        analyzed = len(self.files)
+        wall = self.wall if self.wall is not None else time.perf_counter() - self._wall
+        return {
+            'label': self.label,
+            'started': time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.started)),
+            'wall': wall,
+            'cpu_main_process': self.cpu,
+            'files_analyzed': analyzed,
+            'files_cached': self.cached,
+            'files_failed': len(self.failures),
+            'files_per_second': analyzed / wall if wall > 0 else None,
+            'bytes_decoded': sum(m['bytes_decoded'] for m in self.files),
+            'analysis_wall': sum(m['wall'] or 0 for m in self.files),
+            'analysis_cpu': sum(m['cpu'] or 0 for m in self.files),
+            'run_stages': self.stages,
+            'analysis_stages': self.stage_totals(),
+            'slowest_files': [{'path': m['path'], 'wall': m['wall']} for m in self.slowest_files()],
+            'failures': self.failures,
+        }
+
+    def to_dict(self):
+        report = self.summary()
+        report['files'] = self.files
+        if self.profile_dir:
+            try:
+                report['profile'] = profile_summary(self.profile_dir, self.profile_prefix)
+            except Exception as e:
+                print(f"Perfil indisponível: {e}", file=sys.stderr)
+        return report
+
+    def save(self, path):
+        Path(path).write_text(json.dumps(self.to_dict(), indent=2, ensure_ascii=False) + "\n",
+                              encoding='utf-8')
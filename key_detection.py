@@ -0,0 +1,113 @@
+"""
+Detecção de tonalidade por correlação com perfis de tonalidade.
+
+O chroma da música (CQT, calculado uma vez na análise a partir de C2, para
+que o bumbo e o sub-grave não puxem a nota) é correlacionado com os 24
+perfis (12 rotações dos perfis maior e menor) numa única multiplicação de
+matrizes. A tonalidade é a de maior correlação, e essa correlação (Pearson,
+de -1 a 1) é a confiança.
+
+O chroma médio fica no resultado da análise (e no cache), então mudar o
+perfil ou o método só exige recalcular a tonalidade a partir dele (rekey),
+sem decodificar o áudio de novo.
+"""
+from functools import lru_cache
+
+NOTE_NAMES = ['C', 'C#', 'D', 'D#', 'E', 'F', 'F#', 'G', 'G#', 'A', 'A#', 'B']
+KEY_NAMES = NOTE_NAMES + [f"{note}m" for note in NOTE_NAMES]  # ordem das linhas da matriz de perfis
+
+# Perfis de tonalidade (maior, menor) a partir da tônica
+KEY_PROFILES = {
+    # Krumhansl & Kessler (1982), avaliações de ouvintes
+    'krumhansl': ([6.35, 2.23, 3.48, 2.33, 4.38, 4.09, 2.52, 5.19, 2.39, 3.66, 2.29, 2.88],
+                  [6.33, 2.68, 3.52, 5.38, 2.60, 3.53, 2.54, 4.75, 3.98, 2.69, 3.34, 3.17]),
+    # Temperley (1999), revisão do anterior
+    'temperley': ([5.0, 2.0, 3.5, 2.0, 4.5, 4.0, 2.0, 4.5, 2.0, 3.5, 1.5, 4.0],
+                  [5.0, 2.0, 3.5, 4.5, 2.0, 4.0, 2.0, 4.5, 3.5, 2.0, 1.5, 4.0]),
+}
+DEFAULT_PROFILE = 'krumhansl'
+
+# Versão da detecção. Incrementar ao mudar detect_key: o cache é re-tonalizado
+# a partir do chroma guardado, sem nova análise.
+KEY_VERSION = 1
+
+# Chroma CQT: a tonalidade é global, então um quadro a cada ~0,19 s basta
+CHROMA_HOP = 2048
+CHROMA_FMIN = 65.406  # C2
+CHROMA_OCTAVES = 6
+CHROMA_BINS_PER_OCTAVE = 36
+
+
+def key_method(profile=DEFAULT_PROFILE):
+    """Identifica o método no resultado da análise (perfil + versão)"""
+    return f"{profile}-{KEY_VERSION}"
+
+
+def key_chroma(y, sr):
+    """Chroma CQT (12, quadros) do sinal"""
+    import librosa
+
+    return librosa.feature.chroma_cqt(y=y, sr=sr, hop_length=CHROMA_HOP, fmin=CHROMA_FMIN,
+                                      n_octaves=CHROMA_OCTAVES, bins_per_octave=CHROMA_BINS_PER_OCTAVE)
+
+
+@lru_cache(maxsize=None)
+def profile_matrix(profile=DEFAULT_PROFILE):
+    """Matriz 24x12 dos perfis rotacionados, centrados e normalizados (linhas na ordem de KEY_NAMES)"""
+    import numpy as np
+
+    major, minor = KEY_PROFILES[profile]
+    rows = [np.roll(major, tonic) for tonic in range(12)] + [np.roll(minor, tonic) for tonic in range(12)]
+    matrix = np.asarray(rows, dtype=np.float64)
+    matrix -= matrix.mean(axis=1, keepdims=True)
+    return matrix / np.linalg.norm(matrix, axis=1, keepdims=True)
+
+
+def key_scores(chroma, profile=DEFAULT_PROFILE):
+    """Correlação do chroma médio (12) com cada uma das 24 tonalidades (None se o chroma for plano)"""
+    import numpy as np
+
+    chroma = np.asarray(chroma, dtype=np.float64)
+    centered = chroma - chroma.mean()
+    norm = np.linalg.norm(centered)
+    if not norm > 1e-9:
+        return None
+    return profile_matrix(profile) @ (centered / norm)
+
+
+def detect_key(chroma, profile=DEFAULT_PROFILE):
+    """(tonalidade, confiança) a partir do chroma médio; ("N/A", None) sem informação tonal"""
+    import numpy as np
+
+    scores = key_scores(chroma, profile)
+    if scores is None:
+        return "N/A", None
+    best = int(np.argmax(scores))
+    return KEY_NAMES[best], round(float(scores[best]), 3)
+
+
+def summarize_chroma(chroma):
+    """Chroma médio guardado no resultado: 12 valores com máximo 1"""
+    import numpy as np
+
+    chroma = np.asarray(chroma, dtype=np.float64)
+    peak = chroma.max()
+    return [round(float(v), 4) for v in (chroma / peak if peak > 0 else chroma)]
+
+
+def rekey(info, profile=DEFAULT_PROFILE):
+    """
+    Resultado da análise com a tonalidade recalculada a partir do chroma guardado
+    (também a de cada segmento da análise completa), ou None se não houver chroma.
+    """
+    chroma = info.get('chroma')
+    if not chroma:
+        return None
+    info = dict(info)
+    info['key'], info['key_confidence'] = detect_key(chroma, profile)
+    if info.get('segments'):
+        info['segments'] = [dict(segment, key=detect_key(segment['chroma'], profile)[0])
+                            if segment.get('chroma') else segment
+                            for segment in info['segments']]
+    info['key_method'] = key_method(profile)
+    return info
@@ -1,13 +1,38 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 import os
-import shutil
+import json
 import threading
-import pygame
-import librosa
-import numpy as np
 from pathlib import Path
 import re
+import multiprocessing
+import core
+from analysis import ANALYSIS_VERSION
+from analysis_cache import AnalysisCache
+from analysis_engine import AnalysisEngine, default_workers
+from batch_analysis import BATCH_FILES
+from duplicates import AUDIO, find_duplicates, identical_groups
+from folder_watch import FolderWatcher, diff_snapshots, scan_music_files
+from instrumentation import RunReport
+from player import Player, format_time
+from search_index import SearchIndex, parse_query
+from session import (AUTOSAVE_PATH, BINARY_EXTENSION, JSON_EXTENSION, Session, SessionError,
+                     load_session, save_session)
+from track_registry import TrackRegistry
+from track_store import NO_KEY, Track, format_bpm, format_duration, format_volume
+from virtual_tree import VirtualTreeview
+
+# Aparência das formas de onda
+WAVEFORM_HEIGHT = 56
+WAVEFORM_BG = '#1e1e1e'
+WAVEFORM_FG = '#4fa3e0'
+WAVEFORM_BEAT = '#888888'
+WAVEFORM_TEXT = '#cccccc'
+WAVEFORM_PLAYHEAD = '#ff5050'
+TRANSITION_SECONDS = 30  # trecho mostrado de cada lado da transição
+PEAKS_CACHE_SIZE = 64
+PREFETCH_AHEAD = 3       # sugestões seguintes preparadas para a pré-escuta
+POSITION_UPDATE_MS = 50  # atualização da posição do player (~20 vezes por segundo)
 
 class DJSetOrganizer:
     def __init__(self, root):
@@ -18,31 +43,65 @@ class DJSetOrganizer:
         # Variáveis
         self.music_files = []  # Lista de todas as músicas da pasta
         self.set_list = []     # Lista do set organizado
+        self.registry = TrackRegistry()  # ID da música (= iid nas Treeviews) -> música
+        self.library_columns = None      # scoring.LibraryColumns de music_files (montado sob demanda)
+        self.music_tags = {}             # iid -> tag de compatibilidade aplicada na music_tree
+        self.search_index = SearchIndex()   # índices da busca sobre music_files
+        self.search_query = parse_query("")  # filtro aplicado à music_tree
         self.current_playing = None
-        self.pygame_initialized = False
+        self.player = Player()
         self.music_length = 0
         self.music_position = 0
         self.is_paused = False
         self.position_update_job = None
+        self.seeking = False   # arrastando a barra de progresso
+        self.preview = None    # preview.PreviewPlayer (criado na primeira pré-escuta)
+        self.transitions = None  # transition.TransitionPlayer (criado na primeira transição ouvida)
+        
+        # Análise em paralelo (processos criados só quando a análise é necessária)
+        self.analysis_workers = default_workers()
+        self.analysis_engine = AnalysisEngine(workers=self.analysis_workers, peaks=True,
+                                              batch_files=BATCH_FILES)
+        self.loading_engine = None
+        self.load_generation = 0
+        
+        # Monitoramento da pasta
+        self.current_folder = None
+        self.folder_snapshot = {}   # caminho -> (tamanho, mtime_ns)
+        self.folder_watcher = None
+        
+        # Músicas duplicadas na pasta (duplicates.DuplicateGroup)
+        self.duplicate_groups = []
+        self.duplicate_of = {}      # caminho -> grupo
+        
+        # Exportação do set em andamento (set_export.SetExporter)
+        self.exporter = None
+        
+        # Ordenação automática do set em andamento (roda em uma thread)
+        self.ordering = False
+        
+        # Relatório de desempenho do último carregamento (instrumentation.RunReport)
+        self.analysis_report = None
+        
+        # Formas de onda: caminho -> waveform.Peaks (mmap) e caminhos sendo gerados
+        self.peaks_cache = {}
+        self.peaks_pending = set()
         
         # Camelot Wheel mapping
-        self.camelot_wheel = {
-            # Menores (A)
-            'Am': '8A', 'Em': '9A', 'Bm': '10A', 'F#m': '11A', 'C#m': '12A', 'G#m': '1A',
-            'D#m': '2A', 'A#m': '3A', 'Fm': '4A', 'Cm': '5A', 'Gm': '6A', 'Dm': '7A',
-            # Maiores (B)
-            'C': '8B', 'G': '9B', 'D': '10B', 'A': '11B', 'E': '12B', 'B': '1B',
-            'F#': '2B', 'C#': '3B', 'G#': '4B', 'D#': '5B', 'A#': '6B', 'F': '7B'
-        }
-        
-        # Inicializar pygame mixer
-        try:
-            pygame.mixer.init()
-            self.pygame_initialized = True
-        except:
-            pass
+        self.camelot_wheel = core.CAMELOT_WHEEL
         
         self.setup_ui()
+        
+        # Inicializar o áudio depois que a janela aparecer
+        self.root.after(200, self.init_audio)
+        
+        # Reabrir a sessão do último uso; salvá-la ao fechar
+        self.root.after(100, self.restore_last_session)
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+    
+    def init_audio(self):
+        """Importa o pygame e inicializa o mixer (uma única vez)"""
+        return self.player.init()
     
     def setup_ui(self):
         # Frame principal
@@ -57,10 +116,29 @@ class DJSetOrganizer:
         ttk.Button(control_frame, text="Selecionar Pasta", 
                   command=self.select_folder).pack(side=tk.LEFT, padx=(0, 10))
         
+        # Sessões: biblioteca analisada + set, reabertas sem reanalisar
+        ttk.Button(control_frame, text="Abrir Sessão",
+                   command=self.open_session).pack(side=tk.LEFT, padx=(0, 5))
+        ttk.Button(control_frame, text="Salvar Sessão",
+                   command=self.save_session_as).pack(side=tk.LEFT, padx=(0, 10))
+        
         # Label da pasta selecionada
         self.folder_label = ttk.Label(control_frame, text="Nenhuma pasta selecionada")
         self.folder_label.pack(side=tk.LEFT, padx=(0, 10))
         
+        # Monitorar a pasta e atualizar a lista automaticamente
+        self.watch_var = tk.BooleanVar(value=False)
+        self.watch_check = ttk.Checkbutton(control_frame, text="Monitorar Pasta",
+                                           variable=self.watch_var, command=self.toggle_folder_watch,
+                                           state=tk.DISABLED)
+        self.watch_check.pack(side=tk.LEFT, padx=(0, 10))
+        
+        # Analisar a música inteira (mais lento, detecta mudanças de BPM/tom ao longo da faixa)
+        self.full_analysis_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(control_frame, text="Análise Completa",
+                        variable=self.full_analysis_var,
+                        command=self.toggle_full_analysis).pack(side=tk.LEFT, padx=(0, 10))
+        
         # Botão para organizar set
         self.organize_btn = ttk.Button(control_frame, text="Exportar Set", 
                                      command=self.organize_set, state=tk.DISABLED)
@@ -96,6 +174,9 @@ class DJSetOrganizer:
         self.move_bottom_btn = ttk.Button(reorder_frame, text="⬇⬇", width=4,
                   command=self.move_to_bottom)
         self.move_bottom_btn.pack(side=tk.LEFT, padx=(0, 2))
+        self.auto_order_btn = ttk.Button(reorder_frame, text="Auto-Ordenar",
+                  command=self.show_auto_order_dialog)
+        self.auto_order_btn.pack(side=tk.LEFT, padx=(5, 0))
         
         # Frame principal para as duas listas
         lists_frame = ttk.Frame(main_frame)
@@ -105,9 +186,27 @@ class DJSetOrganizer:
         music_frame = ttk.LabelFrame(lists_frame, text="📁 Músicas da Pasta")
         music_frame.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=(0, 5))
         
+        # Busca e filtros (ex.: "8A/9A 122-126 energia>70 house"), aplicados enquanto se digita
+        search_frame = ttk.Frame(music_frame)
+        search_frame.pack(side=tk.TOP, fill=tk.X, pady=(0, 5))
+        ttk.Label(search_frame, text="🔍").pack(side=tk.LEFT)
+        self.search_var = tk.StringVar()
+        self.search_var.trace_add('write', lambda *args: self.apply_search())
+        search_entry = ttk.Entry(search_frame, textvariable=self.search_var)
+        search_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=(5, 5))
+        search_entry.bind('<Escape>', lambda e: self.search_var.set(""))
+        ttk.Button(search_frame, text="✕", width=3,
+                   command=lambda: self.search_var.set("")).pack(side=tk.LEFT)
+        self.search_count_label = ttk.Label(search_frame, text="")
+        self.search_count_label.pack(side=tk.LEFT, padx=(5, 0))
+        ttk.Label(music_frame, text="Camelot (8A/9A), BPM (122-126, bpm>120), energia>70, nota:Am, nome ou pasta",
+                  font=("Arial", 8), foreground="gray").pack(side=tk.TOP, anchor=tk.W)
+        
         # Treeview para mostrar todas as músicas
         columns = ('Nome', 'BPM', 'Nota', 'Camelot', 'Volume', 'Duração')
-        self.music_tree = ttk.Treeview(music_frame, columns=columns, show='tree headings', height=20)
+        # Apenas as linhas visíveis são criadas no widget (bibliotecas com dezenas de milhares de músicas)
+        self.music_tree = VirtualTreeview(music_frame, self.music_tree_row, columns=columns,
+                                          show='tree headings', height=20)
         
         # Configurar colunas da lista de músicas
         self.music_tree.heading('#0', text='')
@@ -172,7 +271,8 @@ class DJSetOrganizer:
         
         # Treeview para mostrar o set
         set_columns = ('Ordem', 'Nome', 'BPM', 'Nota', 'Camelot', 'Volume', 'Duração')
-        self.set_tree = ttk.Treeview(set_frame, columns=set_columns, show='tree headings', height=20)
+        self.set_tree = VirtualTreeview(set_frame, self.set_tree_row, columns=set_columns,
+                                        show='tree headings', height=20)
         
         # Configurar colunas da lista do set
         self.set_tree.heading('#0', text='')
@@ -201,6 +301,8 @@ class DJSetOrganizer:
         
         self.set_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         set_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        # Músicas de uma sessão cujo arquivo não existe mais
+        self.set_tree.tag_configure('missing', foreground='gray')
         
         # Bind para duplo clique nas duas listas (play música)
         self.music_tree.bind('<Double-1>', self.play_music_from_list)
@@ -251,11 +353,33 @@ class DJSetOrganizer:
         self.music_progress.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=(0, 5))
         self.music_progress.bind('<Button-1>', self.on_progress_click)
         self.music_progress.bind('<B1-Motion>', self.on_progress_drag)
+        self.music_progress.bind('<ButtonRelease-1>', self.on_progress_release)
         
         # Label do tempo total
         self.time_total_label = ttk.Label(player_frame, text="00:00")
         self.time_total_label.pack(side=tk.LEFT, padx=(0, 5))
         
+        # Forma de onda da música tocando (clique para ir à posição)
+        self.waveform_canvas = tk.Canvas(main_frame, height=WAVEFORM_HEIGHT, bg=WAVEFORM_BG, highlightthickness=0)
+        self.waveform_canvas.pack(fill=tk.X, pady=(5, 0))
+        self.waveform_canvas.bind('<Configure>', lambda e: self.draw_player_waveform())
+        self.waveform_canvas.bind('<Button-1>', self.on_waveform_click)
+        
+        # Transição entre a música selecionada no set e a próxima
+        transition_frame = ttk.LabelFrame(main_frame, text="Transição")
+        transition_frame.pack(fill=tk.X, pady=(5, 0))
+        # Mixagem das duas músicas no andamento da primeira (renderizada em segundo plano)
+        self.play_transition_btn = ttk.Button(transition_frame, text="Ouvir Transição",
+                                              command=self.play_transition, state=tk.DISABLED)
+        self.play_transition_btn.pack(side=tk.RIGHT, padx=(5, 0))
+        self.transition_out_canvas = tk.Canvas(transition_frame, height=WAVEFORM_HEIGHT, bg=WAVEFORM_BG,
+                                               highlightthickness=0)
+        self.transition_out_canvas.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=(0, 2))
+        self.transition_in_canvas = tk.Canvas(transition_frame, height=WAVEFORM_HEIGHT, bg=WAVEFORM_BG,
+                                              highlightthickness=0)
+        self.transition_in_canvas.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=(2, 0))
+        transition_frame.bind('<Configure>', lambda e: self.update_transition_view())
+        
         # Barra de progresso
         progress_frame = ttk.Frame(main_frame)
         progress_frame.pack(fill=tk.X, pady=(5, 0))
@@ -267,6 +391,17 @@ class DJSetOrganizer:
         self.progress_bar.pack(fill=tk.X, pady=(5, 0))
         self.progress_bar.pack_forget()  # Esconder inicialmente
         
+        # Botão para cancelar a análise em andamento
+        self.cancel_load_btn = ttk.Button(progress_frame, text="Cancelar Análise",
+                                          command=self.cancel_loading)
+        
+        # Relatório de desempenho do último carregamento (aparece ao terminar)
+        self.report_btn = ttk.Button(progress_frame, text="Relatório da Análise",
+                                     command=self.show_analysis_report)
+        
+        # Duplicadas encontradas no último carregamento (aparece se houver alguma)
+        self.duplicates_btn = ttk.Button(progress_frame, command=self.show_duplicates)
+        
         # Variáveis para drag and drop
         self.drag_data = {'item': None, 'index': None, 'dragging': False, 'source': None}
         
@@ -275,152 +410,567 @@ class DJSetOrganizer:
         self.update_transfer_buttons()
     
     def select_folder(self):
+        # Preparar os processos de análise (librosa/numba) enquanto o usuário escolhe a pasta
+        if not self.analysis_engine.busy:
+            threading.Thread(target=self.analysis_engine.start, daemon=True).start()
+        
         folder = filedialog.askdirectory(title="Selecionar pasta com músicas")
         if folder:
             self.folder_label.config(text=f"Pasta: {folder}")
             self.load_music_files(folder)
     
+    def analysis_mode(self):
+        return 'full' if self.full_analysis_var.get() else 'window'
+    
+    def toggle_full_analysis(self):
+        """Recarrega a pasta atual no novo modo (o cache evita refazer o que já serve)"""
+        if self.current_folder:
+            self.load_music_files(self.current_folder)
+    
     def load_music_files(self, folder):
+        # Cancelar carregamento anterior ainda em andamento
+        self.cancel_loading()
+        self.stop_folder_watch()
+        self.load_generation += 1
+        self.current_folder = folder
+        self.folder_snapshot = {}
+        self.set_duplicates([])
+        self.music_files = []
+        self.library_columns = None
+        self.music_tags = {}
+        self.registry.clear()
+        self.search_index.clear()
+        self.music_tree.set_rows([])
+        self.update_search_count()
+        # As músicas do set continuam registradas (o set sobrevive à troca de pasta)
+        for music in self.set_list:
+            self.registry.add(music)
+            self.registry.mark_in_set(music.id)
+        self.update_set_list()
+        self.watch_check.config(state=tk.DISABLED)
+        self.report_btn.pack_forget()
+        
         self.progress_label.config(text="Carregando músicas...")
         self.progress_bar.pack(fill=tk.X, pady=(5, 0))
         self.progress_bar['value'] = 0
+        self.cancel_load_btn.pack(pady=(5, 0))
+        
+        # O engine principal mantém os processos já aquecidos; se ainda estiver
+        # encerrando um carregamento cancelado, usar um engine temporário
+        if self.analysis_engine.busy:
+            self.loading_engine = AnalysisEngine(workers=self.analysis_workers, peaks=True,
+                                                 batch_files=BATCH_FILES)
+        else:
+            self.loading_engine = self.analysis_engine
+        self.loading_engine.mode = self.analysis_mode()
         
         # Executar em thread separada para não travar a interface
-        thread = threading.Thread(target=self._load_files_thread, args=(folder,))
+        thread = threading.Thread(target=self._load_files_thread,
+                                  args=(folder, self.loading_engine, self.load_generation))
         thread.daemon = True
         thread.start()
     
-    def _load_files_thread(self, folder):
-        # Encontrar arquivos de música
-        music_extensions = ['.mp3', '.wav']
-        files = []
-        
-        for ext in music_extensions:
-            files.extend(Path(folder).glob(f'**/*{ext}'))
-            files.extend(Path(folder).glob(f'**/*{ext.upper()}'))
+    def cancel_loading(self):
+        """Cancela a análise da pasta em andamento"""
+        if self.loading_engine:
+            self.loading_engine.cancel()
+    
+    def _load_files_thread(self, folder, engine, generation):
+        def on_batch(batch):
+            self.root.after(0, self.append_music_batch, generation, batch)
         
-        self.music_files = []
-        total_files = len(files)
+        def on_progress(done, total):
+            self.root.after(0, self.update_progress, done / total * 100)
         
-        for i, file_path in enumerate(files):
-            try:
-                # Analisar arquivo de áudio
-                music_info = self.analyze_audio(str(file_path))
-                if music_info:
-                    self.music_files.append(music_info)
-                
-                # Atualizar progresso na thread principal
-                progress = (i + 1) / total_files * 100
-                self.root.after(0, self.update_progress, progress)
-                
-            except Exception as e:
-                print(f"Erro crítico ao processar {file_path}: {e}")
-                # Adicionar arquivo básico mesmo com erro
-                basic_info = {
-                    'path': str(file_path),
-                    'name': Path(file_path).name,
-                    'bpm': 120,
-                    'key': "N/A",
-                    'camelot': "N/A",
-                    'volume': "N/A",
-                    'duration': "N/A"
-                }
-                self.music_files.append(basic_info)
+        # DJSET_PROFILE_DIR: grava também um perfil do cProfile de cada processo de análise
+        report = RunReport(label=folder, profile_dir=os.environ.get("DJSET_PROFILE_DIR"))
+        try:
+            _, snapshot, duplicates = core.load_library(folder, engine, on_batch=on_batch,
+                                                        on_progress=on_progress, report=report)
+        except Exception as e:
+            print(f"Erro crítico ao analisar a pasta {folder}: {e}")
+            snapshot, duplicates = {}, []
         
         # Atualizar interface na thread principal
-        self.root.after(0, self.update_music_list)
+        self.root.after(0, self.finish_loading, generation, snapshot, report, duplicates)
+    
+    def append_music_batch(self, generation, batch):
+        """Adiciona um lote de músicas analisadas (chamado na thread principal)"""
+        if generation != self.load_generation:
+            return  # Lote de um carregamento anterior
+        
+        # Registrar o lote inteiro e inserir as linhas de uma vez
+        new_ids = [track_id for track_id in map(self.register_library_track, batch) if track_id]
+        self.music_tree.insert('end', new_ids)
+        self.update_search_count()
+        self.progress_label.config(text=f"Analisando... {len(self.music_files)} músicas prontas")
+    
+    def finish_loading(self, generation, snapshot, report=None, duplicates=()):
+        """Finaliza o carregamento da pasta (chamado na thread principal)"""
+        if generation != self.load_generation:
+            return
+        
+        self.analysis_report = report
+        if report:
+            self.report_btn.pack(pady=(5, 0))
+        self.set_duplicates(duplicates)
+        
+        cancelled = self.loading_engine is not None and self.loading_engine.cancelled
+        self.loading_engine = None
+        self.cancel_load_btn.pack_forget()
+        self.progress_bar.pack_forget()
+        
+        if cancelled:
+            self.progress_label.config(text=f"Análise cancelada - {len(self.music_files)} músicas carregadas")
+        else:
+            self.progress_label.config(text=f"{len(self.music_files)} músicas carregadas")
+        self.organize_btn.config(state=tk.NORMAL)
+        self.clear_set_btn.config(state=tk.NORMAL)
+        self.search_index.prepare()
+        
+        # O snapshot só vale para os arquivos que foram de fato carregados
+        self.folder_snapshot = {path: state for path, state in snapshot.items()
+                                if self.registry.id_for_path(path) in self.search_index}
+        self.watch_check.config(state=tk.NORMAL)
+        if self.watch_var.get():
+            self.start_folder_watch()
+    
+    def current_session(self):
+        return Session(self.current_folder, self.music_files, self.set_list, self.folder_snapshot,
+                       self.analysis_mode())
+    
+    def save_session_as(self):
+        if not self.music_files and not self.set_list:
+            messagebox.showwarning("Aviso", "Nada para salvar: carregue uma pasta ou monte um set")
+            return
+        path = filedialog.asksaveasfilename(
+            title="Salvar sessão", defaultextension=BINARY_EXTENSION,
+            filetypes=[("Sessão (rápida)", f"*{BINARY_EXTENSION}"), ("Sessão JSON", f"*{JSON_EXTENSION}")])
+        if not path:
+            return
+        try:
+            save_session(path, self.current_session())
+        except OSError as e:
+            messagebox.showerror("Erro", f"Não foi possível salvar a sessão: {e}")
+            return
+        self.progress_label.config(text=f"Sessão salva em {Path(path).name}")
     
-    def analyze_audio(self, file_path):
+    def open_session(self):
+        path = filedialog.askopenfilename(
+            title="Abrir sessão",
+            filetypes=[("Sessões", f"*{BINARY_EXTENSION} *{JSON_EXTENSION}"), ("Todos os arquivos", "*.*")])
+        if not path:
+            return
         try:
-            # Carregar áudio
-            y, sr = librosa.load(file_path, duration=60)  # Analisar apenas primeiro minuto
-            
-            # Calcular BPM
+            session = load_session(path)
+        except SessionError as e:
+            messagebox.showerror("Erro", str(e))
+            return
+        self.apply_session(session)
+    
+    def restore_last_session(self):
+        if not AUTOSAVE_PATH.exists() or self.current_folder or self.set_list:
+            return
+        try:
+            self.apply_session(load_session(AUTOSAVE_PATH))
+        except SessionError as e:
+            print(f"Sessão anterior não restaurada: {e}")
+    
+    def on_close(self):
+        """Salva a sessão atual (para reabrir na próxima execução) e fecha a janela"""
+        if self.music_files or self.set_list:
             try:
-                tempo, _ = librosa.beat.beat_track(y=y, sr=sr)
-                # Garantir que extraímos um escalar do array
-                if hasattr(tempo, 'item'):
-                    bpm = int(tempo.item())
-                else:
-                    bpm = int(tempo)
-            except:
-                bpm = 120  # BPM padrão se não conseguir detectar
+                save_session(AUTOSAVE_PATH, self.current_session())
+            except OSError as e:
+                print(f"Não foi possível salvar a sessão: {e}")
+        self.root.destroy()
+    
+    def apply_session(self, session):
+        """Substitui a biblioteca e o set pelos da sessão, sem reanalisar"""
+        self.cancel_loading()
+        self.stop_folder_watch()
+        self.load_generation += 1
+        self.current_folder = session.folder
+        self.folder_label.config(text=f"Pasta: {session.folder}" if session.folder else "Nenhuma pasta selecionada")
+        self.full_analysis_var.set(session.analysis_mode == 'full')
+        self.music_files = []
+        self.library_columns = None
+        self.music_tags = {}
+        self.set_list = []
+        self.registry.clear()
+        self.search_index.clear()
+        self.analysis_report = None
+        self.report_btn.pack_forget()
+        self.set_duplicates([])
+        
+        self.music_tree.set_rows([track_id for track_id in map(self.register_library_track, session.library)
+                                  if track_id])
+        for music in session.set_list:
+            self.registry.mark_in_set(self.registry.add(music))
+            self.set_list.append(music)
+        self.update_set_list()
+        self.search_index.prepare()
+        self.update_search_count()
+        self.folder_snapshot = dict(session.snapshot)
+        
+        self.progress_label.config(
+            text=f"Sessão aberta: {len(self.music_files)} músicas, {len(self.set_list)} no set")
+        self.organize_btn.config(state=tk.NORMAL)
+        self.clear_set_btn.config(state=tk.NORMAL)
+        self.watch_check.config(state=tk.NORMAL if session.folder else tk.DISABLED)
+        self.update_buttons()
+        self.update_transfer_buttons()
+        
+        # Conferir os arquivos em segundo plano (as listas já estão na tela)
+        threading.Thread(target=self._verify_session,
+                         args=(self.load_generation, session.folder, self.analysis_mode(),
+                               dict(session.snapshot), list(self.set_list)),
+                         daemon=True).start()
+    
+    def _verify_session(self, generation, folder, mode, snapshot, set_list):
+        """Compara a sessão com os arquivos atuais: músicas do set sumidas e pasta alterada"""
+        missing = [music.id for music in set_list if not os.path.exists(music.path)]
+        current = scan_music_files(folder) if folder and os.path.isdir(folder) else None
+        duplicates = identical_groups(current) if current else []
+        self.root.after(0, self.finish_session_check, generation, missing, current, duplicates)
+        if current is None:
+            return
+        added, removed, changed = diff_snapshots(snapshot, current)
+        if (added or removed or changed) and generation == self.load_generation:
+            # Mesmo caminho do monitoramento: só o que mudou é analisado
+            self._on_folder_changes(generation, folder, mode, current, added, removed, changed, duplicates)
+    
+    def finish_session_check(self, generation, missing, snapshot, duplicates=()):
+        """Marca as músicas do set sem arquivo e passa a monitorar a pasta a partir da varredura atual"""
+        if generation != self.load_generation:
+            return
+        self.set_duplicates(duplicates)
+        messages = []
+        for track_id in missing:
+            self.set_tree.set_tags(track_id, ('missing',))
+        if missing:
+            messages.append(f"{len(missing)} músicas do set não foram encontradas")
+        if snapshot is not None:
+            self.folder_snapshot = snapshot
+            if self.watch_var.get():
+                self.start_folder_watch()
+        elif self.current_folder:
+            messages.append(f"Pasta da sessão não encontrada: {self.current_folder}")
+        if messages:
+            self.progress_label.config(text=" - ".join(messages))
+    
+    def show_analysis_report(self):
+        """Resumo do desempenho do último carregamento: etapas, arquivos mais lentos e falhas"""
+        report = self.analysis_report
+        if not report:
+            return
+        summary = report.summary()
+        
+        window = tk.Toplevel(self.root)
+        window.title("Relatório da Análise")
+        window.geometry("700x550")
+        window.transient(self.root)
+        
+        frame = ttk.Frame(window, padding=10)
+        frame.pack(fill=tk.BOTH, expand=True)
+        
+        ttk.Label(frame, text=(
+            f"{summary['files_analyzed']} analisadas, {summary['files_cached']} do cache, "
+            f"{summary['files_failed']} com falha - {summary['wall']:.1f}s no total "
+            f"({summary['bytes_decoded'] / 2**20:.0f} MB decodificados)"
+        )).pack(anchor=tk.W)
+        
+        def table(title, columns, rows, height):
+            ttk.Label(frame, text=title, font=("Arial", 10, "bold")).pack(anchor=tk.W, pady=(10, 2))
+            tree = ttk.Treeview(frame, columns=columns, show='headings', height=height)
+            for i, col in enumerate(columns):
+                tree.heading(col, text=col)
+                tree.column(col, width=320 if i == 0 else 90, anchor=tk.W if i == 0 else tk.E)
+            for row in rows:
+                tree.insert('', 'end', values=row)
+            tree.pack(fill=tk.X)
+        
+        table("Etapas da análise (soma de todos os arquivos)", ('Etapa', 'Parede (s)', 'CPU (s)', 'Arquivos'),
+              [(name, f"{t['wall']:.2f}", f"{t['cpu']:.2f}", t['files'])
+               for name, t in summary['analysis_stages'].items()], 8)
+        table("Arquivos mais lentos", ('Arquivo', 'Tempo (s)'),
+              [(Path(f['path']).name, f"{f['wall']:.2f}") for f in summary['slowest_files']], 6)
+        table("Falhas", ('Arquivo', 'Motivo'),
+              [(Path(f['path']).name, f['reason']) for f in summary['failures']], 4)
+        
+        def export():
+            path = filedialog.asksaveasfilename(parent=window, title="Exportar relatório",
+                                                defaultextension=".json",
+                                                filetypes=[("JSON", "*.json")])
+            if path:
+                try:
+                    report.save(path)
+                except OSError as e:
+                    messagebox.showerror("Erro", f"Não foi possível salvar o relatório: {e}", parent=window)
+        
+        buttons = ttk.Frame(frame)
+        buttons.pack(fill=tk.X, pady=(10, 0))
+        ttk.Button(buttons, text="Exportar JSON", command=export).pack(side=tk.LEFT)
+        ttk.Button(buttons, text="Fechar", command=window.destroy).pack(side=tk.RIGHT)
+    
+    def set_duplicates(self, groups):
+        """Guarda os grupos de duplicadas e mostra o botão quando há algum"""
+        self.duplicate_groups = list(groups)
+        self.duplicate_of = {path: group for group in self.duplicate_groups for path in group.paths}
+        if self.duplicate_groups:
+            self.duplicates_btn.config(text=f"Duplicadas ({len(self.duplicate_groups)})")
+            self.duplicates_btn.pack(pady=(5, 0))
+        else:
+            self.duplicates_btn.pack_forget()
+    
+    def show_duplicates(self):
+        """Grupos de músicas duplicadas: cópias idênticas e (sob demanda) o mesmo áudio em outro arquivo"""
+        window = tk.Toplevel(self.root)
+        window.title("Músicas Duplicadas")
+        window.geometry("750x450")
+        window.transient(self.root)
+        
+        frame = ttk.Frame(window, padding=10)
+        frame.pack(fill=tk.BOTH, expand=True)
+        
+        summary = ttk.Label(frame)
+        summary.pack(anchor=tk.W)
+        
+        kinds = {'identical': "Cópia idêntica", 'audio': "Mesmo áudio"}
+        columns = ('Arquivo', 'Tipo')
+        tree = ttk.Treeview(frame, columns=columns, show='tree headings')
+        tree.heading('#0', text='Grupo')
+        tree.column('#0', width=80, stretch=False)
+        tree.heading('Arquivo', text='Arquivo')
+        tree.column('Arquivo', width=500, anchor=tk.W)
+        tree.heading('Tipo', text='Tipo')
+        tree.column('Tipo', width=120, anchor=tk.W)
+        tree.pack(fill=tk.BOTH, expand=True, pady=(5, 0))
+        
+        def refresh():
+            tree.delete(*tree.get_children())
+            for number, group in enumerate(self.duplicate_groups, 1):
+                parent = tree.insert('', 'end', text=str(number), open=True,
+                                     values=(Path(group.representative).name, kinds[group.kind]))
+                for path in group.paths:
+                    tree.insert(parent, 'end', values=(path, ""))
+            copies = sum(len(group.copies) for group in self.duplicate_groups)
+            summary.config(text=f"{len(self.duplicate_groups)} grupos, {copies} arquivos repetidos")
+        
+        def search_audio():
+            audio_btn.config(state=tk.DISABLED)
+            summary.config(text="Comparando o áudio das músicas parecidas...")
+            generation = self.load_generation
+            snapshot, tracks, groups = dict(self.folder_snapshot), list(self.music_files), self.duplicate_groups
             
-            # Estimar nota (chroma features)
-            try:
-                chroma = librosa.feature.chroma_stft(y=y, sr=sr)
-                chroma_mean = np.mean(chroma, axis=1)
-                note_names = ['C', 'C#', 'D', 'D#', 'E', 'F', 'F#', 'G', 'G#', 'A', 'A#', 'B']
-                dominant_note = note_names[np.argmax(chroma_mean)]
-                
-                # Detectar se é maior ou menor (aproximação simples)
-                # Verificar se há predominância de acordes menores
-                minor_indicator = chroma_mean[3] + chroma_mean[7] + chroma_mean[10]  # acordes menores
-                major_indicator = chroma_mean[0] + chroma_mean[4] + chroma_mean[7]   # acordes maiores
-                
-                if minor_indicator > major_indicator:
-                    key = f"{dominant_note}m"
-                else:
-                    key = dominant_note
-            except:
-                key = "N/A"  # Se não conseguir detectar a nota
+            def work():
+                try:
+                    found = find_duplicates(snapshot, tracks, audio=True, groups=groups)
+                except Exception as e:
+                    print(f"Erro ao procurar duplicadas: {e}")
+                    found = groups
+                self.root.after(0, done, found)
             
-            # Calcular volume (RMS - Root Mean Square)
-            try:
-                rms = librosa.feature.rms(y=y)[0]
-                avg_rms = np.mean(rms)
-                # Converter para decibéis e normalizar para uma escala mais legível
-                volume_db = 20 * np.log10(avg_rms + 1e-6)  # +1e-6 para evitar log(0)
-                # Normalizar para escala de 0-100 (aproximada)
-                volume_normalized = max(0, min(100, int((volume_db + 60) * 100 / 60)))
-                volume_str = f"{volume_normalized}%"
-            except:
-                volume_str = "N/A"
+            def done(found):
+                if generation == self.load_generation:
+                    self.set_duplicates(found)
+                if window.winfo_exists():
+                    audio_btn.config(state=tk.NORMAL)
+                    refresh()
             
-            # Duração (do arquivo completo, não do trecho analisado)
+            threading.Thread(target=work, daemon=True).start()
+        
+        def export():
+            path = filedialog.asksaveasfilename(parent=window, title="Exportar duplicadas",
+                                                defaultextension=".json",
+                                                filetypes=[("JSON", "*.json")])
+            if path:
+                try:
+                    Path(path).write_text(json.dumps([group.to_dict() for group in self.duplicate_groups],
+                                                     indent=2, ensure_ascii=False) + "\n", encoding='utf-8')
+                except OSError as e:
+                    messagebox.showerror("Erro", f"Não foi possível salvar a lista: {e}", parent=window)
+        
+        buttons = ttk.Frame(frame)
+        buttons.pack(fill=tk.X, pady=(10, 0))
+        audio_btn = ttk.Button(buttons, text="Procurar mesmo áudio (MP3/WAV)", command=search_audio)
+        audio_btn.pack(side=tk.LEFT)
+        ttk.Button(buttons, text="Exportar JSON", command=export).pack(side=tk.LEFT, padx=(5, 0))
+        ttk.Button(buttons, text="Fechar", command=window.destroy).pack(side=tk.RIGHT)
+        refresh()
+    
+    def add_library_track(self, music):
+        """Registra a música e insere sua linha na lista da esquerda (iid = ID da música)"""
+        if self.register_library_track(music):
+            self.music_tree.insert('end', [music.id])
+        return music.id
+    
+    def register_library_track(self, music):
+        """Registra a música na biblioteca; retorna o ID se ela for nova e passar pelo filtro da busca"""
+        track_id = self.registry.add(music)
+        if track_id in self.search_index:
+            return None
+        if self.registry.in_set(track_id):
+            # Mesmo arquivo já no set: o set passa a apontar para a análise nova
+            self.set_list = [music if m.id == track_id else m for m in self.set_list]
+            self.set_tree.refresh(track_id)
+        self.music_files.append(music)
+        self.search_index.add(music)
+        self.library_columns = None
+        return track_id if self.search_index.matches(self.search_query, track_id) else None
+    
+    def music_tree_row(self, track_id, index):
+        """Valores da linha da lista de músicas, gerados quando a linha fica visível"""
+        return self.music_row_values(self.registry.get(track_id))
+    
+    def set_tree_row(self, track_id, index):
+        """Valores da linha do set (a ordem vem da posição da linha)"""
+        return (index + 1,) + self.music_row_values(self.registry.get(track_id))
+    
+    def music_row_values(self, music):
+        """Valores exibidos na lista de músicas (formatados só aqui, quando a linha é desenhada)"""
+        return (music.name, format_bpm(music.bpm), music.key_label, music.camelot,
+                format_volume(music.loudness_db), format_duration(music.duration))
+    
+    def apply_search(self):
+        """Filtra a lista de músicas pela busca digitada (só o modelo da lista é trocado)"""
+        self.search_query = parse_query(self.search_var.get())
+        self.music_tree.set_rows(self.search_index.search(self.search_query))
+        # set_rows descarta as tags das linhas que saíram; reaplicar o destaque
+        for track_id, tag in self.music_tags.items():
+            self.music_tree.set_tags(track_id, tag)
+        self.update_search_count()
+    
+    def update_search_count(self):
+        if self.search_query.empty:
+            self.search_count_label.config(text="")
+        else:
+            self.search_count_label.config(text=f"{len(self.music_tree)} de {len(self.search_index)}")
+    
+    def toggle_folder_watch(self):
+        """Liga/desliga o monitoramento da pasta"""
+        if self.watch_var.get():
+            self.start_folder_watch()
+        else:
+            self.stop_folder_watch()
+    
+    def start_folder_watch(self):
+        self.stop_folder_watch()
+        if not self.current_folder:
+            return
+        # Lidos aqui, na thread principal: o aviso de mudanças chega na thread do monitor
+        generation, folder, mode = self.load_generation, self.current_folder, self.analysis_mode()
+        
+        def on_change(added, removed, changed):
+            self._on_folder_changes(generation, folder, mode, watcher.snapshot, added, removed, changed)
+        
+        watcher = FolderWatcher(folder, self.folder_snapshot, on_change)
+        self.folder_watcher = watcher
+        watcher.start()
+    
+    def stop_folder_watch(self):
+        if self.folder_watcher:
+            self.folder_watcher.stop()
+            self.folder_watcher = None
+    
+    def _on_folder_changes(self, generation, folder, mode, snapshot, added, removed, changed, duplicates=None):
+        """
+        Analisa apenas os arquivos novos/alterados (executado na thread do monitor).
+        
+        generation, folder e mode são lidos na thread principal; snapshot é a
+        varredura atual, usada para refazer os grupos de cópias idênticas (uma
+        cópia nova reaproveita a análise de outra cópia do grupo).
+        """
+        if duplicates is None:
+            duplicates = identical_groups(snapshot)
+        to_analyze = added + changed
+        results = []
+        if to_analyze:
             try:
-                duration = librosa.get_duration(path=file_path)
-                duration_str = f"{int(duration//60):02d}:{int(duration%60):02d}"
-            except:
-                duration_str = "00:00"
-            
-            return {
-                'path': file_path,
-                'name': Path(file_path).name,
-                'bpm': bpm,
-                'key': key,
-                'camelot': self.get_camelot_code(key),
-                'volume': volume_str,
-                'duration': duration_str
-            }
-            
-        except Exception as e:
-            print(f"Erro ao analisar {file_path}: {e}")
-            # Retornar informações básicas mesmo se a análise falhar
-            return {
-                'path': file_path,
-                'name': Path(file_path).name,
-                'bpm': 120,
-                'key': "N/A",
-                'camelot': "N/A",
-                'volume': "N/A",
-                'duration': "N/A"
-            }
+                cache = AnalysisCache.for_folder(folder, ANALYSIS_VERSION)
+            except Exception:
+                cache = None
+            engine = AnalysisEngine(workers=min(self.analysis_workers, len(to_analyze)), peaks=True,
+                                    mode=mode)
+            try:
+                results = [Track.from_analysis(info) for info in engine.run(
+                    to_analyze,
+                    lookup=core.duplicate_lookup(core.cache_lookup(cache, mode), duplicates) if cache else None,
+                    store=cache.put if cache else None)]
+            except Exception as e:
+                print(f"Erro ao analisar alterações da pasta: {e}")
+            if cache:
+                cache.close()
+        self.root.after(0, self.apply_folder_changes, generation, results, removed, duplicates)
+    
+    def apply_folder_changes(self, generation, results, removed, duplicates=None):
+        """Atualiza music_files e a music_tree linha a linha, sem reconstruir a lista"""
+        if generation != self.load_generation:
+            return
+        
+        if duplicates is not None:
+            # Grupos de mesmo áudio (procurados sob demanda) continuam valendo se nenhum arquivo
+            # deles mudou ou saiu e se não repetem um grupo de cópias idênticas
+            touched = set(removed) | {music.path for music in results}
+            grouped = {path for group in duplicates for path in group.paths}
+            kept = [group for group in self.duplicate_groups if group.kind == AUDIO
+                    and not touched.intersection(group.paths) and not grouped.intersection(group.paths)]
+            self.set_duplicates(sorted(duplicates + kept, key=lambda group: group.representative))
+        
+        removed = set(removed)
+        self.library_columns = None
+        if removed:
+            self.music_files = [music for music in self.music_files if music.path not in removed]
+            removed_ids = []
+            for path in removed:
+                track_id = self.registry.id_for_path(path)
+                if track_id is None:
+                    continue
+                removed_ids.append(track_id)
+                self.music_tags.pop(track_id, None)
+                # Músicas do set continuam registradas até saírem do set
+                if not self.registry.in_set(track_id):
+                    self.registry.remove(track_id)
+                self.search_index.remove(track_id)
+                self.folder_snapshot.pop(path, None)
+            self.music_tree.delete(*removed_ids)
+        
+        positions = {music.path: i for i, music in enumerate(self.music_files)}
+        for music in results:
+            path = music.path
+            if path in positions:
+                # Arquivo alterado: atualizar a linha existente
+                track_id = self.registry.add(music)
+                self.music_files[positions[path]] = music
+                self.search_index.add(music)
+                self.music_tree.refresh(track_id)
+                if self.registry.in_set(track_id):
+                    self.set_list = [music if m.id == track_id else m for m in self.set_list]
+                    self.set_tree.refresh(track_id)
+            else:
+                self.add_library_track(music)
+        
+        self.search_index.prepare()
+        if not self.search_query.empty:
+            # A reanálise pode tirar ou colocar músicas no filtro
+            self.apply_search()
+        self.update_search_count()
+        if self.folder_watcher:
+            self.folder_snapshot = self.folder_watcher.snapshot
+        self.progress_label.config(text=f"{len(self.music_files)} músicas carregadas")
     
     def update_progress(self, value):
         self.progress_bar['value'] = value
         self.root.update_idletasks()
     
     def update_music_list(self):
-        # Limpar lista de músicas
-        for item in self.music_tree.get_children():
-            self.music_tree.delete(item)
-        
-        # Adicionar todas as músicas na lista da esquerda
-        for music in self.music_files:
-            self.music_tree.insert('', 'end', values=(
-                music['name'], music['bpm'], music['key'], music['camelot'], music['volume'], music['duration']
-            ))
+        # Substituir todas as linhas da lista de músicas (só as visíveis são desenhadas)
+        self.library_columns = None
+        for track_id in self.music_tags:
+            self.music_tree.set_tags(track_id, ())
+        self.music_tags = {}
+        self.music_tree.set_rows(self.search_index.search(self.search_query))
+        self.update_search_count()
         
         self.progress_bar.pack_forget()
         self.progress_label.config(text=f"{len(self.music_files)} músicas carregadas")
@@ -428,71 +978,67 @@ class DJSetOrganizer:
         self.clear_set_btn.config(state=tk.NORMAL)
     
     def update_set_list(self):
-        # Limpar lista do set
-        for item in self.set_tree.get_children():
-            self.set_tree.delete(item)
-        
-        # Adicionar músicas do set na lista da direita
-        for i, music in enumerate(self.set_list, 1):
-            self.set_tree.insert('', 'end', values=(
-                i, music['name'], music['bpm'], music['key'], music['camelot'], music['volume'], music['duration']
-            ))
+        # Sincronizar todas as linhas do set (iid = ID da música); edições pontuais
+        # usam insert/move/delete diretamente na set_tree
+        self.set_tree.set_rows([music.id for music in self.set_list])
+    
+    def duplicate_in_set(self, music):
+        """Se outra cópia da mesma música (duplicates.DuplicateGroup) já está no set"""
+        group = self.duplicate_of.get(music.path)
+        if group is None:
+            return False
+        return any(self.registry.in_set(self.registry.id_for_path(path))
+                   for path in group.paths if path != music.path)
+    
+    def add_to_set(self, music):
+        """Adiciona uma música ao final do set (ignora se ela ou uma duplicada já estiver no set)"""
+        track_id = self.registry.add(music)
+        if self.registry.in_set(track_id) or self.duplicate_in_set(music):
+            return False
+        self.registry.mark_in_set(track_id)
+        self.set_list.append(music)
+        self.set_tree.insert('end', [track_id])
+        return True
     
     def play_music_from_list(self, event):
         """Toca música da lista de músicas (esquerda)"""
         selection = self.music_tree.selection()
         if selection:
-            item = selection[0]
-            values = self.music_tree.item(item, 'values')
-            if values:
-                # Encontrar música pelo nome
-                music_name = values[0]
-                for music in self.music_files:
-                    if music['name'] == music_name:
-                        self.play_selected_music(music)
-                        break
+            music = self.registry.get(selection[0])
+            if music:
+                self.play_selected_music(music)
     
     def play_music_from_set(self, event):
         """Toca música da lista do set (direita)"""
         selection = self.set_tree.selection()
         if selection:
-            item = selection[0]
-            values = self.set_tree.item(item, 'values')
-            if values:
-                # Encontrar música pelo nome
-                music_name = values[1]  # Nome está na segunda coluna (após ordem)
-                for music in self.set_list:
-                    if music['name'] == music_name:
-                        self.play_selected_music(music)
-                        break
+            music = self.registry.get(selection[0])
+            if music:
+                self.play_selected_music(music)
     
     def play_selected_music(self, music):
         """Toca uma música específica"""
-        if not self.pygame_initialized:
+        if not self.init_audio():
             messagebox.showerror("Erro", "Sistema de áudio não inicializado")
             return
         
         try:
-            pygame.mixer.music.load(music['path'])
-            pygame.mixer.music.play()
-            self.current_playing = music['path']
-            
-            # Obter duração da música
-            duration_str = music['duration']
-            if duration_str != "N/A":
-                parts = duration_str.split(':')
-                self.music_length = int(parts[0]) * 60 + int(parts[1])
-            else:
-                self.music_length = 0
+            for clips in (self.preview, self.transitions):
+                if clips:
+                    clips.stop()
+            self.player.load(music)
+            self.current_playing = music.path
+            self.music_length = self.player.length
+            self.draw_player_waveform()
             
             # Configurar barra de progresso
-            self.music_progress.config(to=self.music_length)
-            self.time_total_label.config(text=duration_str)
+            self.music_progress.config(to=max(self.music_length, 1))
+            self.time_total_label.config(text=format_time(self.music_length) if self.music_length else "N/A")
             self.music_position = 0
             self.is_paused = False
             
             # Atualizar labels
-            self.current_music_label.config(text=f"Tocando: {music['name']}")
+            self.current_music_label.config(text=f"Tocando: {music.name}")
             self.time_current_label.config(text="00:00")
             
             # Iniciar atualização da posição
@@ -501,32 +1047,69 @@ class DJSetOrganizer:
         except Exception as e:
             messagebox.showerror("Erro", f"Não foi possível tocar a música: {e}")
     
+    def get_preview(self):
+        """Player de pré-escuta (None se o áudio não puder ser inicializado)"""
+        if self.preview is None and self.init_audio():
+            from preview import PreviewPlayer
+            self.preview = PreviewPlayer()
+        return self.preview
+    
+    def preview_music(self, music):
+        """Toca o trecho de pré-escuta da música, pausando o player principal"""
+        preview = self.get_preview()
+        if not preview:
+            messagebox.showerror("Erro", "Sistema de áudio não inicializado")
+            return
+        if self.player.playing:
+            self.toggle_play()
+        preview.play(music)
+    
+    def play_transition(self):
+        """Ouve a transição da música selecionada no set para a próxima"""
+        selection = self.set_tree.selection()
+        if not selection or not self.set_tree.exists(selection[0]):
+            return
+        index = self.set_tree.index(selection[0])
+        if index + 1 >= len(self.set_list):
+            return
+        if self.transitions is None:
+            if not self.init_audio():
+                messagebox.showerror("Erro", "Sistema de áudio não inicializado")
+                return
+            from transition import TransitionPlayer
+            self.transitions = TransitionPlayer()
+        if self.player.playing:
+            self.toggle_play()
+        pairs = list(zip(self.set_list, self.set_list[1:]))
+        self.transitions.play(pairs[index])
+        # Renderizar as demais transições do set, a partir da próxima
+        self.transitions.prefetch(pairs[index + 1:] + pairs[:index])
+    
     def toggle_play(self):
-        if not self.pygame_initialized:
+        if not self.player.initialized:
             return
             
         try:
-            if pygame.mixer.music.get_busy():
-                pygame.mixer.music.pause()
+            if self.player.playing:
+                self.player.pause()
                 self.current_music_label.config(text="Pausado")
                 self.is_paused = True
                 self.stop_position_update()
-            else:
-                pygame.mixer.music.unpause()
-                if self.current_playing:
-                    name = Path(self.current_playing).name
-                    self.current_music_label.config(text=f"Tocando: {name}")
-                    self.is_paused = False
-                    self.start_position_update()
-        except:
+            elif self.player.paused:
+                self.player.resume()
+                name = Path(self.current_playing).name
+                self.current_music_label.config(text=f"Tocando: {name}")
+                self.is_paused = False
+                self.start_position_update()
+        except Exception:
             pass
     
     def stop_music(self):
-        if not self.pygame_initialized:
+        if not self.player.initialized:
             return
             
         try:
-            pygame.mixer.music.stop()
+            self.player.stop()
             self.current_playing = None
             self.current_music_label.config(text="Parado")
             self.music_position = 0
@@ -534,6 +1117,7 @@ class DJSetOrganizer:
             self.music_progress.set(0)
             self.time_current_label.config(text="00:00")
             self.stop_position_update()
+            self.draw_player_waveform()
         except:
             pass
     
@@ -579,15 +1163,9 @@ class DJSetOrganizer:
                     set_y <= mouse_y <= set_y + set_height):
                     
                     # Adicionar música ao set
-                    values = self.music_tree.item(self.drag_data['item'], 'values')
-                    music_name = values[0]
-                    
-                    # Encontrar a música completa
-                    for music in self.music_files:
-                        if music['name'] == music_name:
-                            self.set_list.append(music.copy())
-                            self.update_set_list()
-                            break
+                    music = self.registry.get(self.drag_data['item'])
+                    if music:
+                        self.add_to_set(music)
                             
             except Exception as e:
                 print(f"Erro no drag and drop: {e}")
@@ -633,13 +1211,12 @@ class DJSetOrganizer:
                 music_item = self.set_list.pop(old_index)
                 self.set_list.insert(target_index, music_item)
                 
-                # Atualizar interface
-                self.update_set_list()
+                # Atualizar interface (só a linha movida)
+                self.set_tree.move(music_item.id, target_index)
                 
                 # Reselecionar item movido
-                new_item = self.set_tree.get_children()[target_index]
-                self.set_tree.selection_set(new_item)
-                self.set_tree.focus(new_item)
+                self.set_tree.selection_set(music_item.id)
+                self.set_tree.focus(music_item.id)
         
         # Limpar dados de drag
         self.drag_data = {'item': None, 'index': None, 'dragging': False, 'source': None}
@@ -650,14 +1227,13 @@ class DJSetOrganizer:
     
     def update_order_numbers(self):
         """Atualiza números de ordem no set"""
-        for i, item in enumerate(self.set_tree.get_children()):
-            values = list(self.set_tree.item(item, 'values'))
-            values[0] = str(i + 1)  # Atualizar número da ordem
-            self.set_tree.item(item, values=values)
+        # A ordem é calculada pela posição quando a linha é desenhada
+        self.set_tree.refresh()
     
     def clear_set(self):
         """Limpa a lista do set"""
         self.set_list.clear()
+        self.registry.clear_set()
         self.update_set_list()
         self.update_buttons()
         self.update_transfer_buttons()
@@ -666,39 +1242,82 @@ class DJSetOrganizer:
         if not self.set_list:
             messagebox.showwarning("Aviso", "Nenhuma música no set")
             return
+        if self.exporter:
+            return  # Exportação já em andamento
         
         # Selecionar pasta de destino
         dest_folder = filedialog.askdirectory(title="Selecionar pasta para salvar o set organizado")
         if not dest_folder:
             return
         
-        try:
-            # Criar pasta se não existir
-            os.makedirs(dest_folder, exist_ok=True)
-            
-            # Copiar arquivos na ordem do set
-            for i, music in enumerate(self.set_list, 1):
-                source_path = music['path']
-                extension = Path(source_path).suffix
-                new_name = f"{i:02d} - {music['name']}"
-                dest_path = os.path.join(dest_folder, new_name)
-                
-                shutil.copy2(source_path, dest_path)
-            
-            messagebox.showinfo("Sucesso", 
-                              f"Set exportado com sucesso!\n{len(self.set_list)} músicas copiadas para:\n{dest_folder}")
+        from set_export import SetExporter
         
-        except Exception as e:
-            messagebox.showerror("Erro", f"Erro ao exportar set: {e}")
+        self.exporter = SetExporter()
+        self.organize_btn.config(state=tk.DISABLED)
+        set_list = list(self.set_list)
+        
+        # Janela de progresso (a cópia roda em threads, a interface continua livre)
+        window = tk.Toplevel(self.root)
+        window.title("Exportando Set")
+        window.transient(self.root)
+        window.resizable(False, False)
+        frame = ttk.Frame(window, padding=10)
+        frame.pack(fill=tk.BOTH, expand=True)
+        status_label = ttk.Label(frame, text=f"Exportando {len(set_list)} músicas para:\n{dest_folder}")
+        status_label.pack(anchor=tk.W)
+        progress = ttk.Progressbar(frame, mode='determinate', length=350)
+        progress.pack(fill=tk.X, pady=(10, 5))
+        cancel_btn = ttk.Button(frame, text="Cancelar", command=self.exporter.cancel)
+        cancel_btn.pack()
+        window.protocol("WM_DELETE_WINDOW", self.exporter.cancel)
+        
+        state = {'scheduled': False, 'percent': 0}
+        
+        def on_progress(done, total):
+            # Chamado pelas threads de cópia: agendar no máximo uma atualização por vez
+            state['percent'] = done / total * 100 if total else 100
+            if not state['scheduled']:
+                state['scheduled'] = True
+                self.root.after(100, update_progress)
+        
+        def update_progress():
+            state['scheduled'] = False
+            if window.winfo_exists():
+                progress['value'] = state['percent']
+        
+        def run_export(exporter):
+            try:
+                exported = core.export_set(set_list, dest_folder, on_progress=on_progress, exporter=exporter)
+                error = None
+            except Exception as e:
+                exported, error = [], e
+            self.root.after(0, self.finish_export, window, dest_folder, exported, error)
+        
+        threading.Thread(target=run_export, args=(self.exporter,), daemon=True).start()
+    
+    def finish_export(self, window, dest_folder, exported, error):
+        """Finaliza a exportação (chamado na thread principal)"""
+        cancelled = self.exporter.cancelled and error is None
+        self.exporter = None
+        window.destroy()
+        self.update_buttons()
+        
+        if error is not None:
+            messagebox.showerror("Erro", f"Erro ao exportar set: {error}\n\n"
+                                 "As músicas já copiadas foram mantidas; exporte novamente para continuar.")
+        elif cancelled:
+            messagebox.showinfo("Exportação cancelada",
+                                "As músicas já copiadas foram mantidas; exporte novamente "
+                                "para a mesma pasta para continuar.")
+        else:
+            messagebox.showinfo("Sucesso", 
+                              f"Set exportado com sucesso!\n{len(exported)} músicas copiadas para:\n{dest_folder}")
 
     def get_selected_index(self):
         """Retorna o índice da música selecionada no set ou None se nenhuma estiver selecionada"""
         selection = self.set_tree.selection()
         if selection:
-            item = selection[0]
-            values = self.set_tree.item(item, 'values')
-            if values:
-                return int(values[0]) - 1  # Converter para índice 0-based
+            return self.set_tree.index(selection[0])
         return None
     
     def move_to_top(self):
@@ -712,13 +1331,12 @@ class DJSetOrganizer:
         self.set_list.insert(0, music_item)
         
         # Atualizar interface
-        self.update_set_list()
+        self.set_tree.move(music_item.id, 0)
         self.update_buttons()
         
         # Reselecionar o item na nova posição
-        first_item = self.set_tree.get_children()[0]
-        self.set_tree.selection_set(first_item)
-        self.set_tree.focus(first_item)
+        self.set_tree.selection_set(music_item.id)
+        self.set_tree.focus(music_item.id)
         self.update_buttons()
     
     def move_up(self):
@@ -731,13 +1349,13 @@ class DJSetOrganizer:
         self.set_list[index], self.set_list[index-1] = self.set_list[index-1], self.set_list[index]
         
         # Atualizar interface
-        self.update_set_list()
+        self.set_tree.move(self.set_list[index-1].id, index-1)
         self.update_buttons()
         
         # Reselecionar o item na nova posição
-        new_item = self.set_tree.get_children()[index-1]
-        self.set_tree.selection_set(new_item)
-        self.set_tree.focus(new_item)
+        moved_id = self.set_list[index-1].id
+        self.set_tree.selection_set(moved_id)
+        self.set_tree.focus(moved_id)
         self.update_buttons()
     
     def move_down(self):
@@ -750,13 +1368,13 @@ class DJSetOrganizer:
         self.set_list[index], self.set_list[index+1] = self.set_list[index+1], self.set_list[index]
         
         # Atualizar interface
-        self.update_set_list()
+        self.set_tree.move(self.set_list[index+1].id, index+1)
         self.update_buttons()
         
         # Reselecionar o item na nova posição
-        new_item = self.set_tree.get_children()[index+1]
-        self.set_tree.selection_set(new_item)
-        self.set_tree.focus(new_item)
+        moved_id = self.set_list[index+1].id
+        self.set_tree.selection_set(moved_id)
+        self.set_tree.focus(moved_id)
         self.update_buttons()
     
     def move_to_bottom(self):
@@ -770,15 +1388,212 @@ class DJSetOrganizer:
         self.set_list.append(music_item)
         
         # Atualizar interface
-        self.update_set_list()
+        self.set_tree.move(music_item.id, len(self.set_list) - 1)
         self.update_buttons()
         
         # Reselecionar o item na nova posição
-        last_item = self.set_tree.get_children()[-1]
-        self.set_tree.selection_set(last_item)
-        self.set_tree.focus(last_item)
+        self.set_tree.selection_set(music_item.id)
+        self.set_tree.focus(music_item.id)
         self.update_buttons()
 
+    def show_auto_order_dialog(self):
+        """Janela com as opções da ordenação automática do set"""
+        if len(self.set_list) < 2:
+            return
+        
+        window = tk.Toplevel(self.root)
+        window.title("Auto-Ordenar Set")
+        window.transient(self.root)
+        window.resizable(False, False)
+        
+        frame = ttk.Frame(window, padding=10)
+        frame.pack(fill=tk.BOTH, expand=True)
+        
+        ttk.Label(frame, text="Ordena o set pelas melhores transições (harmonia + BPM)",
+                  font=("Arial", 10, "bold")).pack(anchor=tk.W, pady=(0, 10))
+        
+        keep_first_var = tk.BooleanVar(value=False)
+        keep_last_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(frame, text=f"Manter abertura: {self.set_list[0].name}",
+                        variable=keep_first_var).pack(anchor=tk.W)
+        ttk.Checkbutton(frame, text=f"Manter encerramento: {self.set_list[-1].name}",
+                        variable=keep_last_var).pack(anchor=tk.W)
+        
+        # Curva de energia (volume) ao longo do set
+        curves = {"Sem curva de energia": None, "Energia crescente": 'rising',
+                  "Energia decrescente": 'falling', "Pico no meio do set": 'peak'}
+        curve_frame = ttk.Frame(frame)
+        curve_frame.pack(fill=tk.X, pady=(10, 0))
+        ttk.Label(curve_frame, text="Energia:").pack(side=tk.LEFT, padx=(0, 5))
+        curve_var = tk.StringVar(value="Sem curva de energia")
+        ttk.Combobox(curve_frame, textvariable=curve_var, values=list(curves),
+                     state='readonly', width=25).pack(side=tk.LEFT)
+        
+        def apply_order():
+            opener = 0 if keep_first_var.get() else None
+            closer = len(self.set_list) - 1 if keep_last_var.get() else None
+            window.destroy()
+            self.auto_order_set(opener, closer, curves[curve_var.get()])
+        
+        button_frame = ttk.Frame(frame)
+        button_frame.pack(fill=tk.X, pady=(15, 0))
+        ttk.Button(button_frame, text="Ordenar", command=apply_order).pack(side=tk.LEFT)
+        ttk.Button(button_frame, text="Cancelar", command=window.destroy).pack(side=tk.RIGHT)
+    
+    def auto_order_set(self, opener=None, closer=None, energy_curve=None):
+        """Reordena o set com o sequenciador automático (a busca roda em uma thread)"""
+        if self.ordering:
+            return
+        self.ordering = True
+        self.update_buttons()
+        self.root.config(cursor='watch')
+        self.progress_label.config(text="Ordenando set...")
+        set_list = list(self.set_list)
+        
+        def run_order():
+            # Importado aqui: o sequenciador depende do NumPy
+            import sequencer
+            
+            try:
+                before = sequencer.sequence_score(set_list)
+                ordered = sequencer.order_set(set_list, opener=opener, closer=closer,
+                                              energy_curve=energy_curve)
+                result, error = (ordered, before, sequencer.sequence_score(ordered)), None
+            except Exception as e:
+                result, error = None, e
+            self.root.after(0, self.finish_auto_order, set_list, result, error)
+        
+        threading.Thread(target=run_order, daemon=True).start()
+    
+    def finish_auto_order(self, set_list, result, error):
+        """Aplica a ordem calculada (chamado na thread principal)"""
+        self.ordering = False
+        self.root.config(cursor='')
+        self.update_buttons()
+        if error is not None:
+            self.progress_label.config(text="")
+            messagebox.showerror("Erro", f"Erro ao ordenar o set: {error}")
+            return
+        if self.set_list != set_list:
+            # O set foi editado durante a busca: a ordem calculada não vale mais
+            self.progress_label.config(text="Set alterado durante a ordenação - ordem não aplicada")
+            return
+        
+        ordered, before, after = result
+        selection = self.set_tree.selection()
+        self.set_list = ordered
+        self.update_set_list()
+        if selection:
+            self.set_tree.selection_set(selection)
+            self.set_tree.focus(selection[0])
+        self.update_buttons()
+        self.progress_label.config(
+            text=f"Set ordenado - transição média: {before:.0f}% → {after:.0f}%")
+    
+    def get_peaks(self, music, on_ready):
+        """Picos da forma de onda da música; se ainda não existirem, gera em segundo plano e chama on_ready"""
+        import waveform
+        
+        path = music.path
+        peaks = self.peaks_cache.get(path)
+        if peaks is None:
+            peaks = waveform.load_peaks(path)
+            if peaks is not None:
+                # Cada Peaks mantém um mmap aberto: guardar só os mais recentes
+                if len(self.peaks_cache) >= PEAKS_CACHE_SIZE:
+                    self.peaks_cache.pop(next(iter(self.peaks_cache)))
+                self.peaks_cache[path] = peaks
+            elif path not in self.peaks_pending and not music.error:
+                self.peaks_pending.add(path)
+                
+                def extract():
+                    try:
+                        waveform.extract_peaks(path)
+                    except Exception as e:
+                        print(f"Erro ao gerar a forma de onda de {path}: {e}")
+                    self.root.after(0, done)
+                
+                def done():
+                    self.peaks_pending.discard(path)
+                    on_ready()
+                
+                threading.Thread(target=extract, daemon=True).start()
+        return peaks
+    
+    def draw_waveform(self, canvas, music, start, end, on_ready):
+        """Desenha os picos de music entre start e end (s), com as batidas da grade"""
+        import numpy as np
+        import waveform
+        
+        canvas.delete('all')
+        width = max(canvas.winfo_width(), 1)
+        height = max(canvas.winfo_height(), WAVEFORM_HEIGHT)
+        middle = height / 2
+        if music is None:
+            return
+        
+        peaks = self.get_peaks(music, on_ready)
+        if peaks is None:
+            text = "Gerando forma de onda..." if music.path in self.peaks_pending else "Forma de onda indisponível"
+            canvas.create_text(width / 2, middle, text=text, fill=WAVEFORM_TEXT)
+            return
+        
+        span = max(end - start, 1e-3)
+        mins, maxs, bin_seconds, first_time = peaks.window(start, end, width)
+        x = (first_time + bin_seconds * np.arange(len(mins)) - start) / span * width
+        for xi, low, high in zip(x, mins, maxs):
+            canvas.create_line(xi, middle - high * middle, xi, middle - low * middle + 1, fill=WAVEFORM_FG)
+        
+        # Marcadores de batida (só os compassos quando as batidas ficariam muito juntas)
+        beats = waveform.beat_times(music, start, end)
+        if len(beats) > 1:
+            step = 1 if (beats[1] - beats[0]) / span * width >= 6 else 4
+            for t in beats[::step]:
+                bx = (t - start) / span * width
+                canvas.create_line(bx, 0, bx, 6, fill=WAVEFORM_BEAT)
+                canvas.create_line(bx, height - 6, bx, height, fill=WAVEFORM_BEAT)
+        
+        canvas.create_text(4, 2, text=music.name, anchor=tk.NW, fill=WAVEFORM_TEXT, font=("Arial", 8))
+    
+    def draw_player_waveform(self):
+        """Visão geral da música tocando, com a posição atual"""
+        music = self.registry.by_path(self.current_playing) if self.current_playing else None
+        length = self.music_length or (music and self.peaks_cache.get(music.path) and
+                                       self.peaks_cache[music.path].duration) or 0
+        self.draw_waveform(self.waveform_canvas, music, 0, length, self.draw_player_waveform)
+        self.update_playhead()
+    
+    def update_playhead(self):
+        canvas = self.waveform_canvas
+        canvas.delete('playhead')
+        if self.current_playing and self.music_length > 0:
+            x = self.music_position / self.music_length * max(canvas.winfo_width(), 1)
+            canvas.create_line(x, 0, x, canvas.winfo_height(), fill=WAVEFORM_PLAYHEAD, width=2, tags='playhead')
+    
+    def on_waveform_click(self, event):
+        """Clique na forma de onda: ir para a posição correspondente"""
+        if self.current_playing and self.music_length > 0:
+            width = max(self.waveform_canvas.winfo_width(), 1)
+            self.set_music_position(event.x / width * self.music_length)
+    
+    def update_transition_view(self):
+        """Final da música selecionada no set e início da próxima"""
+        outgoing = incoming = None
+        selection = self.set_tree.selection()
+        if selection and self.set_tree.exists(selection[0]):
+            index = self.set_tree.index(selection[0])
+            outgoing = self.set_list[index] if index < len(self.set_list) else None
+            incoming = self.set_list[index + 1] if index + 1 < len(self.set_list) else None
+        
+        end = 0
+        if outgoing is not None:
+            peaks = self.peaks_cache.get(outgoing.path) or self.get_peaks(outgoing, self.update_transition_view)
+            end = peaks.duration if peaks else 0
+        self.draw_waveform(self.transition_out_canvas, outgoing, max(0, end - TRANSITION_SECONDS), end,
+                           self.update_transition_view)
+        self.draw_waveform(self.transition_in_canvas, incoming, 0, TRANSITION_SECONDS,
+                           self.update_transition_view)
+    
     def start_position_update(self):
         """Inicia a atualização da posição da música"""
         self.stop_position_update()  # Para qualquer atualização anterior
@@ -791,83 +1606,76 @@ class DJSetOrganizer:
             self.position_update_job = None
     
     def update_position(self):
-        """Atualiza a posição da barra de progresso"""
-        if self.current_playing and not self.is_paused and pygame.mixer.music.get_busy():
-            # Incrementar posição (aproximação, já que pygame não fornece posição real)
-            self.music_position += 1
-            
-            # Atualizar barra de progresso
-            if self.music_length > 0:
-                self.music_progress.set(self.music_position)
-            
-            # Atualizar label do tempo atual
-            minutes = self.music_position // 60
-            seconds = self.music_position % 60
-            self.time_current_label.config(text=f"{minutes:02d}:{seconds:02d}")
-            
-            # Verificar se música terminou
-            if self.music_position >= self.music_length:
-                self.stop_music()
-                return
-            
-            # Agendar próxima atualização
-            self.position_update_job = self.root.after(1000, self.update_position)
+        """Atualiza a barra de progresso com a posição real da reprodução"""
+        self.position_update_job = None
+        if not self.current_playing or self.is_paused:
+            return
+        if self.player.finished:
+            self.stop_music()
+            return
+        
+        self.music_position = self.player.position
+        if not self.seeking:
+            self.show_position(self.music_position)
+        
+        # Só reagenda enquanto toca (pausado/parado não há nada para atualizar)
+        self.position_update_job = self.root.after(POSITION_UPDATE_MS, self.update_position)
+    
+    def show_position(self, position):
+        """Mostra a posição (s) na barra, no tempo atual e na forma de onda"""
+        self.music_progress.set(position)
+        self.time_current_label.config(text=format_time(position))
+        self.update_playhead()
+    
+    def progress_position(self, event):
+        """Posição (s) correspondente ao ponto x da barra de progresso"""
+        widget_width = max(self.music_progress.winfo_width(), 1)
+        return max(0, min(event.x / widget_width, 1)) * self.music_length
     
     def on_progress_click(self, event):
-        """Manipula clique na barra de progresso"""
+        """Clique na barra: mostra a posição e faz o seek ao soltar o botão"""
         if self.current_playing and self.music_length > 0:
-            # Calcular nova posição baseada no clique
-            widget_width = self.music_progress.winfo_width()
-            click_x = event.x
-            new_position = int((click_x / widget_width) * self.music_length)
-            
-            # Definir nova posição
-            self.set_music_position(new_position)
+            self.seeking = True
+            self.music_position = self.progress_position(event)
+            self.show_position(self.music_position)
+            return 'break'
     
     def on_progress_drag(self, event):
-        """Manipula arrastar na barra de progresso"""
-        self.on_progress_click(event)  # Mesmo comportamento que clique
+        """Arrastar só move a barra; o decoder é reposicionado uma vez, ao soltar"""
+        if self.seeking:
+            self.music_position = self.progress_position(event)
+            self.show_position(self.music_position)
+            return 'break'
+    
+    def on_progress_release(self, event):
+        if self.seeking:
+            self.seeking = False
+            self.set_music_position(self.progress_position(event))
+            return 'break'
     
     def set_music_position(self, position):
-        """Define uma nova posição na música"""
+        """Vai para a posição (s) da música tocando"""
         if self.current_playing and self.music_length > 0:
-            # Limitar posição aos limites da música
             position = max(0, min(position, self.music_length))
-            
-            # Infelizmente, pygame não suporta seek diretamente
-            # Vamos simular recarregando e "pulando" o tempo
-            # Nota: Esta é uma limitação do pygame - para seek real, 
-            # seria necessário usar outras bibliotecas como python-vlc
-            
-            self.music_position = position
-            self.music_progress.set(position)
-            
-            # Atualizar label do tempo
-            minutes = position // 60
-            seconds = position % 60
-            self.time_current_label.config(text=f"{minutes:02d}:{seconds:02d}")
-            
-            # Mostrar aviso sobre limitação
-            if position != self.music_position:
-                messagebox.showinfo("Aviso", 
-                    "Função de pular para posição específica tem limitações com pygame.\n"
-                    "Para melhor controle, considere usar um player mais avançado.")
+            if not self.player.seek(position):
+                messagebox.showinfo("Aviso", "Este formato de arquivo não permite pular para outra posição.")
+            self.music_position = self.player.position
+            self.show_position(self.music_position)
 
     def remove_from_set(self):
         """Remove música selecionada do set."""
-        selected_items = self.set_tree.selection()
+        selected_items = set(self.set_tree.selection())
         if selected_items:
-            for item in selected_items:
-                # Obter índice da música selecionada
-                values = self.set_tree.item(item, 'values')
-                if values:
-                    ordem = int(values[0]) - 1  # Converter para índice 0-based
-                    # Remover da lista interna
-                    if 0 <= ordem < len(self.set_list):
-                        del self.set_list[ordem]
+            # Remover da lista interna
+            self.set_list = [music for music in self.set_list if music.id not in selected_items]
+            self.set_tree.delete(*selected_items)
+            for track_id in selected_items:
+                self.registry.unmark_in_set(track_id)
+                # Música que já saiu da pasta só continuava registrada por estar no set
+                if track_id not in self.search_index:
+                    self.registry.remove(track_id)
             
-            # Atualizar lista do set
-            self.update_set_list()
+            # Atualizar botões
             self.update_buttons()
             self.update_transfer_buttons()
 
@@ -890,29 +1698,28 @@ class DJSetOrganizer:
         # Botão de limpar set
         self.clear_set_btn.config(state=tk.NORMAL if has_set_items else tk.DISABLED)
         
-        # Botão de exportar set
-        self.organize_btn.config(state=tk.NORMAL if has_set_items else tk.DISABLED)
+        # Botão de exportar set (uma exportação por vez)
+        self.organize_btn.config(state=tk.NORMAL if has_set_items and not self.exporter else tk.DISABLED)
+        
+        # Ordenação automática (precisa de pelo menos duas músicas; uma por vez)
+        self.auto_order_btn.config(state=tk.NORMAL if len(self.set_list) > 1 and not self.ordering
+                                   else tk.DISABLED)
+        
+        # Transição: a música selecionada precisa ter uma próxima no set
+        has_next = (has_selection and self.set_tree.exists(selected_items[0]) and
+                    self.set_tree.index(selected_items[0]) + 1 < len(self.set_list))
+        self.play_transition_btn.config(state=tk.NORMAL if has_next else tk.DISABLED)
     
     def add_selected_to_set(self):
         """Adiciona música selecionada da lista de músicas para o set."""
         selected_items = self.music_tree.selection()
         if selected_items:
             for item in selected_items:
-                values = self.music_tree.item(item, 'values')
-                if values:
-                    music_name = values[0]
-                    
-                    # Encontrar a música completa
-                    for music in self.music_files:
-                        if music['name'] == music_name:
-                            # Verificar se já está no set
-                            already_in_set = any(set_music['name'] == music_name for set_music in self.set_list)
-                            if not already_in_set:
-                                self.set_list.append(music.copy())
-                            break
+                music = self.registry.get(item)
+                if music:
+                    # add_to_set ignora músicas que já estão no set
+                    self.add_to_set(music)
             
-            # Atualizar lista do set
-            self.update_set_list()
             self.update_buttons()
             
             # Limpar seleção da lista de músicas
@@ -948,79 +1755,19 @@ class DJSetOrganizer:
             self.update_transfer_buttons()
             # Destacar músicas compatíveis
             self.root.after(100, self.highlight_compatible_tracks)
+            self.update_transition_view()
     
     def get_camelot_code(self, key):
         """Converte uma nota musical para código Camelot"""
-        if key in self.camelot_wheel:
-            return self.camelot_wheel[key]
-        return "N/A"
+        return core.get_camelot_code(key)
     
     def get_compatible_keys(self, camelot_code):
         """Retorna as chaves compatíveis para mixagem harmônica"""
-        if camelot_code == "N/A":
-            return []
-        
-        try:
-            # Extrair número e letra
-            number = int(camelot_code[:-1])
-            letter = camelot_code[-1]
-            
-            compatible = []
-            
-            # Regras do Camelot Wheel:
-            # 1. Mesma chave (perfeita)
-            compatible.append(camelot_code)
-            
-            # 2. +1/-1 no círculo (mesmo modo)
-            next_num = (number % 12) + 1
-            prev_num = ((number - 2) % 12) + 1
-            compatible.append(f"{next_num}{letter}")
-            compatible.append(f"{prev_num}{letter}")
-            
-            # 3. Modo relativo (mesmo número, letra oposta)
-            opposite_letter = 'B' if letter == 'A' else 'A'
-            compatible.append(f"{number}{opposite_letter}")
-            
-            # 4. +1/-1 do modo relativo
-            compatible.append(f"{next_num}{opposite_letter}")
-            compatible.append(f"{prev_num}{opposite_letter}")
-            
-            return compatible
-            
-        except:
-            return []
+        return core.get_compatible_keys(camelot_code)
     
     def calculate_mixing_compatibility(self, key1, key2):
         """Calcula compatibilidade entre duas chaves (0-100%)"""
-        camelot1 = self.get_camelot_code(key1)
-        camelot2 = self.get_camelot_code(key2)
-        
-        if camelot1 == "N/A" or camelot2 == "N/A":
-            return 0
-        
-        if camelot1 == camelot2:
-            return 100  # Perfeita
-        
-        compatible_keys = self.get_compatible_keys(camelot1)
-        
-        if camelot2 in compatible_keys:
-            # Determinar tipo de compatibilidade
-            try:
-                num1 = int(camelot1[:-1])
-                letter1 = camelot1[-1]
-                num2 = int(camelot2[:-1])
-                letter2 = camelot2[-1]
-                
-                if letter1 == letter2:  # Mesmo modo
-                    return 90
-                elif num1 == num2:  # Modo relativo
-                    return 85
-                else:  # +1/-1 do relativo
-                    return 75
-            except:
-                return 50
-        
-        return 25  # Compatibilidade baixa
+        return core.calculate_mixing_compatibility(key1, key2)
 
     def show_harmonic_suggestions(self):
         """Mostra sugestões harmônicas baseadas na música selecionada no set"""
@@ -1030,19 +1777,7 @@ class DJSetOrganizer:
             return
         
         # Obter música selecionada
-        item = selection[0]
-        values = self.set_tree.item(item, 'values')
-        if not values:
-            return
-        
-        selected_music_name = values[1]  # Nome está na segunda coluna
-        selected_music = None
-        
-        for music in self.set_list:
-            if music['name'] == selected_music_name:
-                selected_music = music
-                break
-        
+        selected_music = self.registry.get(selection[0])
         if not selected_music:
             return
         
@@ -1051,61 +1786,37 @@ class DJSetOrganizer:
         
         if not suggestions:
             messagebox.showinfo("Sugestões Harmônicas", 
-                              f"Nenhuma sugestão harmônica encontrada para:\n{selected_music['name']}")
+                              f"Nenhuma sugestão harmônica encontrada para:\n{selected_music.name}")
             return
         
         # Criar janela de sugestões
         self.create_suggestions_window(selected_music, suggestions)
     
     def find_harmonic_matches(self, reference_music):
-        """Encontra músicas compatíveis harmonicamente"""
-        suggestions = []
-        reference_camelot = reference_music['camelot']
-        reference_bpm = reference_music['bpm']
-        
-        if reference_camelot == "N/A":
-            return suggestions
-        
-        compatible_keys = self.get_compatible_keys(reference_camelot)
-        
-        for music in self.music_files:
-            # Não sugerir a própria música ou músicas já no set
-            if music['name'] == reference_music['name']:
-                continue
-            
-            already_in_set = any(set_music['name'] == music['name'] for set_music in self.set_list)
-            if already_in_set:
-                continue
-            
-            # Calcular compatibilidade
-            harmonic_score = self.calculate_mixing_compatibility(reference_music['key'], music['key'])
-            
-            # Calcular compatibilidade de BPM (diferença máxima de 6 BPM é considerada boa)
-            bpm_diff = abs(reference_bpm - music['bpm'])
-            if bpm_diff <= 3:
-                bpm_score = 100
-            elif bpm_diff <= 6:
-                bpm_score = 80
-            elif bpm_diff <= 10:
-                bpm_score = 60
-            else:
-                bpm_score = max(0, 60 - (bpm_diff - 10) * 2)
-            
-            # Score total (70% harmônico, 30% BPM)
-            total_score = (harmonic_score * 0.7) + (bpm_score * 0.3)
-            
-            if total_score >= 50:  # Só mostrar sugestões com score razoável
-                suggestions.append({
-                    'music': music,
-                    'harmonic_score': harmonic_score,
-                    'bpm_score': bpm_score,
-                    'total_score': total_score,
-                    'bpm_diff': bpm_diff
-                })
-        
-        # Ordenar por score total
-        suggestions.sort(key=lambda x: x['total_score'], reverse=True)
-        return suggestions[:10]  # Limitar a 10 sugestões
+        """Encontra músicas compatíveis harmonicamente (tom, BPM e som)"""
+        return core.find_harmonic_matches(reference_music, self.get_library_columns(),
+                                          exclude_paths=self.suggestion_exclusions())
+    
+    def find_similar_tracks(self, reference_music):
+        """Encontra as músicas de som mais parecido (só timbre)"""
+        return core.find_similar_tracks(reference_music, self.get_library_columns(),
+                                        exclude_paths=self.suggestion_exclusions())
+    
+    def suggestion_exclusions(self):
+        # Não sugerir a própria música ou músicas já no set
+        set_paths = {music.path for music in self.set_list}
+        # Nem cópias de músicas que já estão no set
+        set_paths.update(path for music in self.set_list
+                         for path in getattr(self.duplicate_of.get(music.path), 'paths', ()))
+        return set_paths
+    
+    def get_library_columns(self):
+        """Colunas NumPy da biblioteca para pontuação vetorizada (refeitas só quando a lista muda)"""
+        if self.library_columns is None:
+            # Importado aqui: NumPy só é necessário quando há músicas para pontuar
+            from scoring import LibraryColumns
+            self.library_columns = LibraryColumns(self.music_files)
+        return self.library_columns
     
     def create_suggestions_window(self, reference_music, suggestions):
         """Cria janela com sugestões harmônicas"""
@@ -1119,15 +1830,16 @@ class DJSetOrganizer:
         header_frame = ttk.Frame(window)
         header_frame.pack(fill=tk.X, padx=10, pady=5)
         
-        ttk.Label(header_frame, text="Sugestões harmônicas para:", font=("Arial", 12, "bold")).pack(anchor=tk.W)
-        ttk.Label(header_frame, text=f"{reference_music['name']} - {reference_music['key']} ({reference_music['camelot']}) - {reference_music['bpm']} BPM", 
+        title_label = ttk.Label(header_frame, text="Sugestões harmônicas para:", font=("Arial", 12, "bold"))
+        title_label.pack(anchor=tk.W)
+        ttk.Label(header_frame, text=f"{reference_music.name} - {reference_music.key_label} ({reference_music.camelot}) - {format_bpm(reference_music.bpm)} BPM", 
                  font=("Arial", 10)).pack(anchor=tk.W)
         
         # Lista de sugestões
         suggestions_frame = ttk.Frame(window)
         suggestions_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
         
-        columns = ('Nome', 'Nota', 'Camelot', 'BPM', 'Δ BPM', 'Score Harmônico', 'Score Total')
+        columns = ('Nome', 'Nota', 'Camelot', 'BPM', 'Δ BPM', 'Score Harmônico', 'Som', 'Score Total')
         suggestions_tree = ttk.Treeview(suggestions_frame, columns=columns, show='tree headings', height=15)
         
         # Configurar colunas
@@ -1153,17 +1865,23 @@ class DJSetOrganizer:
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         
         # Adicionar sugestões
-        for suggestion in suggestions:
-            music = suggestion['music']
-            suggestions_tree.insert('', 'end', values=(
-                music['name'],
-                music['key'],
-                music['camelot'],
-                music['bpm'],
-                f"+{suggestion['bpm_diff']}" if suggestion['bpm_diff'] >= 0 else str(suggestion['bpm_diff']),
-                f"{suggestion['harmonic_score']:.0f}%",
-                f"{suggestion['total_score']:.0f}%"
-            ))
+        def fill(suggestions):
+            suggestions_tree.delete(*suggestions_tree.get_children())
+            for suggestion in suggestions:
+                music = suggestion['music']
+                sound = suggestion['sound_score']
+                suggestions_tree.insert('', 'end', iid=music.id, values=(
+                    music.name,
+                    music.key_label,
+                    music.camelot,
+                    format_bpm(music.bpm),
+                    f"+{suggestion['bpm_diff']}" if suggestion['bpm_diff'] >= 0 else str(suggestion['bpm_diff']),
+                    f"{suggestion['harmonic_score']:.0f}%",
+                    "N/A" if sound is None else f"{sound:.0f}%",
+                    f"{suggestion['total_score']:.0f}%"
+                ))
+        
+        fill(suggestions)
         
         # Botões
         button_frame = ttk.Frame(window)
@@ -1172,77 +1890,103 @@ class DJSetOrganizer:
         def add_suggestion():
             selected = suggestions_tree.selection()
             if selected:
-                item = selected[0]
-                values = suggestions_tree.item(item, 'values')
-                music_name = values[0]
-                
                 # Encontrar música e adicionar ao set
-                for suggestion in suggestions:
-                    if suggestion['music']['name'] == music_name:
-                        self.set_list.append(suggestion['music'].copy())
-                        self.update_set_list()
-                        self.update_buttons()
-                        window.destroy()
-                        break
+                music = self.registry.get(selected[0])
+                if music:
+                    self.add_to_set(music)
+                    self.update_buttons()
+                    window.destroy()
+        
+        def preview_selected():
+            selected = suggestions_tree.selection()
+            music = self.registry.get(selected[0]) if selected else None
+            if music:
+                self.preview_music(music)
+        
+        def prefetch_next(first_row):
+            # Preparar as próximas linhas, que costumam ser as próximas a ouvir
+            preview = self.get_preview()
+            rows = suggestions_tree.get_children()[first_row:first_row + PREFETCH_AHEAD + 1]
+            if preview:
+                preview.prefetch([m for m in map(self.registry.get, rows) if m])
+        
+        def on_select(event):
+            selected = suggestions_tree.selection()
+            if not selected:
+                return
+            if auto_preview_var.get():
+                preview_selected()
+            prefetch_next(suggestions_tree.index(selected[0]) + 1)
+        
+        def close():
+            if self.preview:
+                self.preview.stop()
+            window.destroy()
+        
+        def toggle_sound_only():
+            # "Mais músicas como esta": só o timbre, sem tom e BPM
+            if sound_only_var.get():
+                title_label.config(text="Músicas de som parecido com:")
+                fill(self.find_similar_tracks(reference_music))
+            else:
+                title_label.config(text="Sugestões harmônicas para:")
+                fill(self.find_harmonic_matches(reference_music))
+            prefetch_next(0)
         
+        auto_preview_var = tk.BooleanVar(value=False)
+        sound_only_var = tk.BooleanVar(value=False)
         ttk.Button(button_frame, text="Adicionar ao Set", command=add_suggestion).pack(side=tk.LEFT, padx=(0, 10))
-        ttk.Button(button_frame, text="Fechar", command=window.destroy).pack(side=tk.RIGHT)
+        ttk.Button(button_frame, text="Pré-escuta", command=preview_selected).pack(side=tk.LEFT, padx=(0, 10))
+        ttk.Checkbutton(button_frame, text="Pré-escuta ao selecionar",
+                        variable=auto_preview_var).pack(side=tk.LEFT)
+        ttk.Checkbutton(button_frame, text="Só pelo som", variable=sound_only_var,
+                        command=toggle_sound_only,
+                        state=tk.NORMAL if reference_music.timbre else tk.DISABLED).pack(side=tk.LEFT, padx=(10, 0))
+        ttk.Button(button_frame, text="Fechar", command=close).pack(side=tk.RIGHT)
+        window.protocol("WM_DELETE_WINDOW", close)
         
         # Bind duplo clique
         suggestions_tree.bind('<Double-1>', lambda e: add_suggestion())
+        # Espaço ouve o trecho da sugestão selecionada
+        suggestions_tree.bind('<space>', lambda e: preview_selected())
+        suggestions_tree.bind('<<TreeviewSelect>>', on_select)
+        prefetch_next(0)
     
     def highlight_compatible_tracks(self):
         """Destaca músicas compatíveis com a seleção atual do set"""
-        # Limpar destaque anterior
-        for item in self.music_tree.get_children():
-            self.music_tree.set(item, 'tags', '')
-        
-        selection = self.set_tree.selection()
-        if not selection:
-            return
-        
-        # Obter música selecionada no set
-        item = selection[0]
-        values = self.set_tree.item(item, 'values')
-        if not values:
-            return
-        
-        selected_music_name = values[1]
-        selected_music = None
-        
-        for music in self.set_list:
-            if music['name'] == selected_music_name:
-                selected_music = music
-                break
-        
-        if not selected_music or selected_music['camelot'] == "N/A":
-            return
-        
         # Configurar tags de cores
         self.music_tree.tag_configure('perfect', background='#90EE90')  # Verde claro
         self.music_tree.tag_configure('good', background='#FFFFE0')     # Amarelo claro  
         self.music_tree.tag_configure('ok', background='#FFE4E1')       # Rosa claro
         
-        # Destacar músicas compatíveis
-        for music_item in self.music_tree.get_children():
-            music_values = self.music_tree.item(music_item, 'values')
-            music_name = music_values[0]
+        new_tags = {}
+        selection = self.set_tree.selection()
+        selected_music = self.registry.get(selection[0]) if selection else None
+        
+        if selected_music and selected_music.key_index != NO_KEY and self.music_files:
+            import numpy as np
+            from scoring import harmonic_scores
             
-            # Encontrar música completa
-            for music in self.music_files:
-                if music['name'] == music_name:
-                    compatibility = self.calculate_mixing_compatibility(selected_music['key'], music['key'])
-                    
-                    if compatibility >= 90:
-                        self.music_tree.item(music_item, tags='perfect')
-                    elif compatibility >= 75:
-                        self.music_tree.item(music_item, tags='good')
-                    elif compatibility >= 50:
-                        self.music_tree.item(music_item, tags='ok')
-                    
-                    break
+            # Compatibilidade com toda a biblioteca de uma vez
+            columns = self.get_library_columns()
+            compatibility = harmonic_scores(selected_music.key_index, columns.key_index)
+            levels = np.select([compatibility >= 90, compatibility >= 75, compatibility >= 50],
+                               ['perfect', 'good', 'ok'], '')
+            for i in np.flatnonzero(levels != ''):
+                new_tags[columns.tracks[i].id] = str(levels[i])
+        
+        # Alterar apenas as linhas cujo destaque mudou
+        for item in self.music_tags.keys() - new_tags.keys():
+            # Também nas linhas escondidas pela busca (as tags ficam no modelo da lista)
+            self.music_tree.set_tags(item, ())
+        for item, tag in new_tags.items():
+            if self.music_tags.get(item) != tag:
+                self.music_tree.set_tags(item, tag)
+        self.music_tags = new_tags
 
 def main():
+    # Necessário para o pool de análise no executável do PyInstaller (Windows)
+    multiprocessing.freeze_support()
     root = tk.Tk()
     app = DJSetOrganizer(root)
     root.mainloop()
@@ -0,0 +1,121 @@
+"""
+Reprodução das músicas com posição real e seek.
+
+O pygame.mixer.music.get_pos() conta as amostras já entregues à placa de som
+desde o último play() (não avança com a música pausada), então a posição é
+o ponto de partida do último play() mais get_pos(). O seek reinicia a música
+com play(start=posição), o que também zera o contador.
+"""
+from audio_probe import probe_duration
+
+# pygame é importado sob demanda em Player.init() para a janela abrir mais rápido
+pygame = None
+
+
+def format_time(seconds):
+    """Segundos no formato MM:SS"""
+    seconds = int(seconds)
+    return f"{seconds // 60:02d}:{seconds % 60:02d}"
+
+
+def track_length(music):
+    """Duração real da música em segundos (cabeçalho do arquivo, libsndfile ou a da análise)"""
+    length = probe_duration(music.path)
+    if length:
+        return length
+    try:
+        import soundfile as sf
+        return sf.info(music.path).duration
+    except Exception:
+        return music.duration or 0.0
+
+
+class Player:
+    """Player de uma música por vez sobre o pygame.mixer.music"""
+
+    def __init__(self):
+        self.initialized = False
+        self.path = None
+        self.length = 0.0
+        self.paused = False
+        self._start = 0.0  # posição (s) do último play()
+
+    def init(self):
+        """Importa o pygame e inicializa o mixer (uma única vez)"""
+        global pygame
+        if self.initialized:
+            return True
+        try:
+            import pygame
+            pygame.mixer.init()
+            self.initialized = True
+        except Exception:
+            pass
+        return self.initialized
+
+    def load(self, music):
+        """Carrega e começa a tocar a música do início"""
+        pygame.mixer.music.load(music.path)
+        self.path = music.path
+        self.length = track_length(music)
+        self.paused = False
+        self._start = 0.0
+        pygame.mixer.music.play()
+
+    @property
+    def position(self):
+        """Posição atual em segundos"""
+        if not self.path:
+            return 0.0
+        if self.finished:
+            return self.length
+        position = self._start + max(pygame.mixer.music.get_pos(), 0) / 1000
+        return min(position, self.length) if self.length else position
+
+    @property
+    def playing(self):
+        return bool(self.path) and not self.paused and pygame.mixer.music.get_busy()
+
+    @property
+    def finished(self):
+        """A música chegou ao fim sozinha (não foi parada nem pausada)"""
+        return bool(self.path) and not self.paused and not pygame.mixer.music.get_busy()
+
+    def seek(self, position):
+        """
+        Vai para a posição (s), mantendo a pausa.
+
+        Retorna False se o formato não permite seek no SDL_mixer (a música volta ao início).
+        """
+        if not self.path:
+            return False
+        position = max(0.0, min(position, self.length)) if self.length else max(0.0, position)
+        try:
+            pygame.mixer.music.play(start=position)
+            self._start = position
+            supported = True
+        except pygame.error:
+            pygame.mixer.music.play()
+            self._start = 0.0
+            supported = False
+        if self.paused:
+            pygame.mixer.music.pause()
+        return supported
+
+    def pause(self):
+        if self.playing:
+            pygame.mixer.music.pause()
+            self.paused = True
+
+    def resume(self):
+        if self.path and self.paused:
+            pygame.mixer.music.unpause()
+            self.paused = False
+
+    def stop(self):
+        if self.initialized:
+            pygame.mixer.music.stop()
+        self.path = None
+        self.length = 0.0
+        self.paused = False
+        self._start = 0.0
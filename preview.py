@@ -0,0 +1,267 @@
+"""
+Pré-escuta: toca na hora um trecho curto e representativo de cada música.
+
+O trecho começa no ponto mais forte da música (pelos picos da forma de onda,
+gerados durante a análise), alinhado ao compasso da grade de batidas. Só esse
+trecho é decodificado, já no formato do mixer, e fica num cache LRU de PCM
+com limite de memória; uma thread em segundo plano prepara as próximas
+músicas prováveis (ex.: as linhas seguintes da lista de sugestões).
+"""
+import sys
+import threading
+from collections import OrderedDict
+
+import waveform
+from player import track_length
+
+PREVIEW_SECONDS = 15
+PREVIEW_CACHE_BYTES = 96 * 1024 * 1024  # ~36 trechos estéreo de 15 s a 44,1 kHz
+FADE_SECONDS = 0.05                     # rampa nas bordas do trecho (evita estalos)
+BEATS_PER_BAR = 4
+
+
+def preview_start(music, seconds=PREVIEW_SECONDS):
+    """Início (s) do trecho de pré-escuta, no começo de um compasso quando há grade de batidas"""
+    peaks = waveform.load_peaks(music.path)
+    if peaks is not None:
+        start = peaks.loudest_start(seconds)
+    else:
+        # Sem picos: um terço da música costuma já ter passado da introdução
+        start = track_length(music) / 3
+
+    if music.beat_grid and music.beat_grid[1] > 0:
+        first, period = music.beat_grid
+        bar = period * BEATS_PER_BAR
+        start = first + max(0, round((start - first) / bar)) * bar
+    return max(0.0, start)
+
+
+def _read_native(file_path, start, seconds):
+    """(amostras (n, canais) float32, taxa) do trecho, decodificando só o necessário"""
+    try:
+        import soundfile as sf
+        with sf.SoundFile(file_path) as f:
+            f.seek(min(int(start * f.samplerate), max(f.frames - 1, 0)))
+            return f.read(int(seconds * f.samplerate), dtype='float32', always_2d=True), f.samplerate
+    except Exception:
+        # Formatos que o libsndfile não lê
+        import librosa
+        y, sr = librosa.load(file_path, sr=None, mono=False, offset=start, duration=seconds)
+        return (y.reshape(1, -1) if y.ndim == 1 else y).T, sr
+
+
+def read_clip(file_path, start, seconds, sample_rate, channels):
+    """Trecho da música em float32 (n, canais), na taxa e nos canais do mixer"""
+    import numpy as np
+    import soxr
+
+    data, native_sr = _read_native(file_path, start, seconds)
+    if data.shape[1] > channels > 1:
+        data = data[:, :channels]  # multicanal: só os canais da frente
+    elif data.shape[1] != channels:
+        data = np.repeat(data.mean(axis=1, keepdims=True), channels, axis=1)
+    if native_sr != sample_rate and len(data):
+        data = soxr.resample(data, native_sr, sample_rate, quality='HQ')
+    return np.ascontiguousarray(data, dtype=np.float32)
+
+
+def to_pcm16(data, sample_rate):
+    """float32 (n, canais) -> PCM int16, o formato padrão do pygame.mixer, com rampa nas bordas"""
+    import numpy as np
+
+    fade = min(int(FADE_SECONDS * sample_rate), len(data) // 2)
+    if fade:
+        ramp = np.linspace(0, 1, fade, dtype=np.float32)[:, None]
+        data[:fade] *= ramp
+        data[-fade:] *= ramp[::-1]
+    return np.ascontiguousarray(np.clip(data, -1, 1) * 32767, dtype=np.int16)
+
+
+def decode_clip(file_path, start, seconds, sample_rate, channels):
+    """Trecho da música em PCM int16 (n, canais), pronto para pygame.mixer.Sound"""
+    return to_pcm16(read_clip(file_path, start, seconds, sample_rate, channels), sample_rate)
+
+
+class ClipCache:
+    """Cache LRU de trechos decodificados (chave -> PCM), limitado pelo total de bytes"""
+
+    def __init__(self, max_bytes=PREVIEW_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._clips = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._clips
+
+    def get(self, key):
+        with self._lock:
+            clip = self._clips.get(key)
+            if clip is not None:
+                self._clips.move_to_end(key)
+            return clip
+
+    def put(self, key, clip):
+        with self._lock:
+            old = self._clips.pop(key, None)
+            if old is not None:
+                self.size -= old.nbytes
+            self._clips[key] = clip
+            self.size += clip.nbytes
+            # Descartar os menos usados (o recém-inserido sempre fica)
+            while self.size > self.max_bytes and len(self._clips) > 1:
+                _, evicted = self._clips.popitem(last=False)
+                self.size -= evicted.nbytes
+
+    def clear(self):
+        with self._lock:
+            self._clips.clear()
+            self.size = 0
+
+
+class ClipPlayer:
+    """
+    Toca trechos renderizados em segundo plano num canal reservado do mixer
+    (o pygame.mixer precisa estar inicializado), sem mexer no
+    pygame.mixer.music do player.
+
+    As subclasses definem key(item), a chave do trecho no cache, e
+    render(item), que devolve o PCM int16 (n, canais) do trecho.
+
+    Todos os players usam o mesmo canal: o que toca por último passa a ser o
+    dono do canal e para os outros (que também esquecem o trecho pendente).
+    """
+
+    # Dono atual do canal reservado, compartilhado entre pré-escuta e transições
+    _channel_lock = threading.Lock()
+    _channel_owner = None
+
+    def __init__(self, max_bytes=PREVIEW_CACHE_BYTES):
+        import pygame
+
+        self.pygame = pygame
+        self.cache = ClipCache(max_bytes)
+        self.sample_rate, self.format, self.channels = pygame.mixer.get_init()
+        pygame.mixer.set_reserved(1)
+        self.channel = pygame.mixer.Channel(0)
+        self.current = None       # chave do trecho tocando
+        self._wanted = None       # chave a tocar assim que o trecho estiver pronto
+        self._queue = []          # itens a renderizar, do mais urgente para o menos
+        self._condition = threading.Condition()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def key(self, item):
+        raise NotImplementedError
+
+    def render(self, item):
+        raise NotImplementedError
+
+    def play(self, item):
+        """Toca o trecho do item (na hora se já estiver no cache)"""
+        self._claim_channel()
+        key = self.key(item)
+        clip = self.cache.get(key)
+        with self._condition:
+            if clip is None:
+                self._wanted = key
+                self._queue = [item] + [i for i in self._queue if self.key(i) != key]
+                self._condition.notify()
+                return
+            self._wanted = None
+        self._start(key, clip)
+
+    def prefetch(self, items):
+        """Prepara em segundo plano os trechos dos próximos itens prováveis (substitui a fila anterior)"""
+        with self._condition:
+            urgent = [i for i in self._queue if self.key(i) == self._wanted]
+            seen = {self.key(i) for i in urgent}
+            self._queue = urgent
+            for item in items:
+                key = self.key(item)
+                if key not in seen and key not in self.cache:
+                    seen.add(key)
+                    self._queue.append(item)
+            self._condition.notify()
+
+    def stop(self):
+        with self._condition:
+            self._wanted = None
+        self.channel.stop()
+        self.current = None
+
+    @property
+    def playing(self):
+        return self.current is not None and self.channel.get_busy()
+
+    def close(self):
+        """Para a reprodução e encerra a thread de renderização"""
+        self.stop()
+        with ClipPlayer._channel_lock:
+            if ClipPlayer._channel_owner is self:
+                ClipPlayer._channel_owner = None
+        with self._condition:
+            self._closed = True
+            self._queue = []
+            self._condition.notify()
+
+    def _claim_channel(self):
+        with ClipPlayer._channel_lock:
+            owner = ClipPlayer._channel_owner
+            if owner is not None and owner is not self:
+                owner.stop()
+            ClipPlayer._channel_owner = self
+
+    def _start(self, key, clip):
+        with ClipPlayer._channel_lock:
+            # Outro player pediu o canal enquanto o trecho era preparado
+            if ClipPlayer._channel_owner is not self:
+                return
+            self.channel.play(self.pygame.mixer.Sound(buffer=clip))
+            self.current = key
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._queue and not self._closed:
+                    self._condition.wait()
+                if self._closed:
+                    return
+                item = self._queue.pop(0)
+
+            key = self.key(item)
+            clip = self.cache.get(key)
+            if clip is None:
+                try:
+                    clip = self.render(item)
+                except Exception as e:
+                    print(f"Erro ao preparar trecho {key}: {e}", file=sys.stderr)
+                    with self._condition:
+                        if self._wanted == key:
+                            self._wanted = None
+                    continue
+                self.cache.put(key, clip)
+
+            with self._condition:
+                wanted = self._wanted == key
+                if wanted:
+                    self._wanted = None
+            if wanted:
+                self._start(key, clip)
+
+
+class PreviewPlayer(ClipPlayer):
+    """Pré-escuta das músicas (itens são as músicas; a chave é o caminho)"""
+
+    def __init__(self, seconds=PREVIEW_SECONDS, max_bytes=PREVIEW_CACHE_BYTES):
+        self.seconds = seconds
+        super().__init__(max_bytes)
+
+    def key(self, music):
+        return music.path
+
+    def render(self, music):
+        start = preview_start(music, self.seconds)
+        return decode_clip(music.path, start, self.seconds, self.sample_rate, self.channels)
@@ -0,0 +1,160 @@
+"""
+Pontuação vetorizada de compatibilidade (harmônica + BPM + som) sobre toda a biblioteca.
+
+A biblioteca é mantida em colunas NumPy e a compatibilidade entre tons vem de
+uma matriz 24x24 pré-calculada, então comparar uma música de referência com
+dezenas de milhares de outras é uma única operação vetorizada. A semelhança
+de som vem do índice de timbres (similarity.TimbreIndex) e entra no score
+total quando as duas músicas têm timbre.
+"""
+import numpy as np
+
+import core
+from similarity import TimbreIndex
+from track_store import CAMELOT_CODES, NO_KEY
+
+# Pesos do score total (mesmos de core.find_harmonic_matches)
+HARMONIC_WEIGHT = 0.7
+BPM_WEIGHT = 0.3
+# Parte do score total dada à semelhança de som (o restante é harmônico + BPM)
+SOUND_WEIGHT = 0.3
+
+
+def _build_key_compatibility():
+    # Derivada das mesmas regras escalares do core, para que os resultados sejam idênticos
+    key_for_code = {code: key for key, code in core.CAMELOT_WHEEL.items()}
+    matrix = np.zeros((len(CAMELOT_CODES), len(CAMELOT_CODES)), dtype=np.float32)
+    for i, code1 in enumerate(CAMELOT_CODES):
+        for j, code2 in enumerate(CAMELOT_CODES):
+            matrix[i, j] = core.calculate_mixing_compatibility(key_for_code[code1], key_for_code[code2])
+    return matrix
+
+
+KEY_COMPATIBILITY = _build_key_compatibility()
+
+
+def harmonic_scores(reference_index, key_index):
+    """Compatibilidade harmônica (0-100) da referência com cada música; 0 para tons desconhecidos"""
+    if reference_index == NO_KEY:
+        return np.zeros(len(key_index))
+    scores = KEY_COMPATIBILITY[reference_index, np.maximum(key_index, 0)]
+    return np.where(key_index == NO_KEY, 0, scores).astype(np.float64)
+
+
+def bpm_scores(bpm_diff):
+    """Versão vetorizada de core.bpm_compatibility"""
+    return np.select(
+        [bpm_diff <= 3, bpm_diff <= 6, bpm_diff <= 10],
+        [100, 80, 60],
+        np.maximum(0, 60 - (bpm_diff - 10) * 2),
+    ).astype(np.float64)
+
+
+def sound_scores(similarity):
+    """Semelhança de som (0-100) a partir do cosseno entre timbres; cossenos negativos valem 0"""
+    return np.clip(similarity, 0, 1).astype(np.float64) * 100
+
+
+def _python_number(value):
+    value = value.item()
+    if value != value:  # NaN: sem valor
+        return None
+    return int(value) if float(value).is_integer() else value
+
+
+class LibraryColumns:
+    """Colunas NumPy da biblioteca: índice do tom, número Camelot, modo, BPM, energia (loudness em dB) e timbre"""
+
+    def __init__(self, tracks):
+        self.tracks = list(tracks)
+        self.key_index = np.fromiter((t.key_index for t in self.tracks),
+                                     dtype=np.int16, count=len(self.tracks))
+        self.camelot_number = np.where(self.key_index == NO_KEY, 0, self.key_index // 2 + 1).astype(np.int8)
+        self.mode = np.where(self.key_index == NO_KEY, NO_KEY, self.key_index % 2).astype(np.int8)
+        self.bpm = np.fromiter((t.bpm for t in self.tracks), dtype=np.float32, count=len(self.tracks))
+        self.energy = np.fromiter((np.nan if t.loudness_db is None else t.loudness_db for t in self.tracks),
+                                  dtype=np.float32, count=len(self.tracks))
+        self.position = {t.path: i for i, t in enumerate(self.tracks)}
+        self._timbre = None
+
+    def __len__(self):
+        return len(self.tracks)
+
+    @property
+    def timbre(self):
+        """similarity.TimbreIndex da biblioteca (montado na primeira consulta que usa o som)"""
+        if self._timbre is None:
+            self._timbre = TimbreIndex(self.tracks)
+        return self._timbre
+
+    def scores(self, reference_music):
+        """(harmônico, BPM, som, total, diferença de BPM) da referência contra toda a biblioteca"""
+        harmonic = harmonic_scores(reference_music.key_index, self.key_index)
+        bpm_diff = np.abs(np.float32(reference_music.bpm) - self.bpm)
+        bpm = bpm_scores(bpm_diff)
+        total = harmonic * HARMONIC_WEIGHT + bpm * BPM_WEIGHT
+        # Som: NaN para músicas sem timbre, que ficam só com harmônico + BPM
+        similarity = self.timbre.similarities(reference_music.timbre)
+        if similarity is None:
+            sound = np.full(len(self.tracks), np.nan)
+        else:
+            sound = sound_scores(similarity)
+            known = ~np.isnan(sound)
+            total[known] = total[known] * (1 - SOUND_WEIGHT) + sound[known] * SOUND_WEIGHT
+        return harmonic, bpm, sound, total, bpm_diff
+
+    def top_matches(self, reference_music, exclude_paths=(), limit=10, min_score=core.MIN_SUGGESTION_SCORE):
+        """Melhores sugestões para a referência, no mesmo formato de core.find_harmonic_matches"""
+        if reference_music.key_index == NO_KEY or not self.tracks or limit <= 0:
+            return []
+
+        harmonic, bpm, sound, total, bpm_diff = self.scores(reference_music)
+
+        # Não sugerir a própria música nem as excluídas (ex.: já no set)
+        eligible = total >= min_score
+        for path in set(exclude_paths) | {reference_music.path}:
+            position = self.position.get(path)
+            if position is not None:
+                eligible[position] = False
+
+        candidates = np.flatnonzero(eligible)
+        if len(candidates) > limit:
+            # Top-k com argpartition; empates no limite ficam com as primeiras da biblioteca
+            candidate_scores = total[candidates]
+            threshold = candidate_scores[np.argpartition(-candidate_scores, limit - 1)[limit - 1]]
+            above = candidates[candidate_scores > threshold]
+            tied = candidates[candidate_scores == threshold][:limit - len(above)]
+            candidates = np.concatenate([above, tied])
+
+        # Ordenar por score total (decrescente), mantendo a ordem da biblioteca nos empates
+        order = candidates[np.lexsort((candidates, -total[candidates]))]
+        return self._suggestions(order, harmonic, bpm, sound, total, bpm_diff)
+
+    def similar_tracks(self, reference_music, exclude_paths=(), limit=10):
+        """
+        Músicas de som mais parecido com a referência ("mais músicas como esta"),
+        da mais parecida, no formato de top_matches (o score total é o do som).
+        """
+        if not self.tracks or limit <= 0:
+            return []
+        exclude = [self.position[path] for path in set(exclude_paths) | {reference_music.path}
+                   if path in self.position]
+        positions, similarity = self.timbre.nearest(reference_music.timbre, limit, exclude)
+        if not len(positions):
+            return []
+        sound = sound_scores(similarity)
+        harmonic = harmonic_scores(reference_music.key_index, self.key_index[positions])
+        bpm_diff = np.abs(np.float32(reference_music.bpm) - self.bpm[positions])
+        return self._suggestions(range(len(positions)), harmonic, bpm_scores(bpm_diff), sound, sound, bpm_diff,
+                                 tracks=[self.tracks[i] for i in positions])
+
+    def _suggestions(self, rows, harmonic, bpm, sound, total, bpm_diff, tracks=None):
+        tracks = self.tracks if tracks is None else tracks
+        return [{
+            'music': tracks[i],
+            'harmonic_score': _python_number(harmonic[i]),
+            'bpm_score': _python_number(bpm[i]),
+            'sound_score': _python_number(np.round(sound[i])),
+            'total_score': _python_number(np.round(total[i], 1)),
+            'bpm_diff': _python_number(bpm_diff[i])
+        } for i in rows]
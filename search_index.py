@@ -0,0 +1,250 @@
+"""
+Busca e filtros da lista de músicas.
+
+Os índices acompanham a biblioteca (add/remove a cada música):
+- BPM e energia: valores ordenados, para consultas por faixa com bisect;
+- tom: conjunto de IDs por código Camelot;
+- texto: tokens do nome do arquivo e da pasta (tags), com busca por prefixo
+  numa lista ordenada de tokens.
+
+A consulta digitada é interpretada por parse_query, por exemplo
+"8A/9A 122-126 energia>70 house": Camelot 8A ou 9A, BPM entre 122 e 126,
+energia (o volume exibido) acima de 70% e "house" no nome ou na pasta.
+"""
+import re
+import unicodedata
+from bisect import bisect_left, bisect_right
+
+from core import CAMELOT_WHEEL
+
+# Acima desta fração da biblioteca, o resultado é ordenado percorrendo a
+# biblioteca em vez de ordenar os IDs
+SCAN_FRACTION = 0.125
+
+_CAMELOT = re.compile(r"(1[0-2]|[1-9])[ab]")
+_NUMBER = r"(\d+(?:[.,]\d+)?)%?"
+_RANGE = re.compile(_NUMBER + r"[-–]" + _NUMBER)
+_COMPARISON = re.compile(r"([a-zç]+)(>=|<=|>|<|=|:)" + _NUMBER)
+_FIELD = re.compile(r"([a-zç]+):(.+)")
+_KEY_NAMES = {key.lower(): code for key, code in CAMELOT_WHEEL.items()}
+
+FIELD_ALIASES = {
+    'bpm': 'bpm',
+    'energia': 'energy', 'energy': 'energy', 'vol': 'energy', 'volume': 'energy',
+}
+KEY_FIELDS = ('nota', 'key', 'tom', 'camelot')
+
+
+def tokenize(text):
+    """Palavras em minúsculas e sem acentos"""
+    text = unicodedata.normalize('NFKD', text.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return re.findall(r"[a-z0-9]+", text)
+
+
+def track_tokens(track):
+    """Tokens buscáveis da música: nome do arquivo (sem extensão) e pasta onde está"""
+    stem, _, _ = track.name.rpartition('.')
+    folder = track.path.replace('\\', '/').rsplit('/', 2)
+    tags = folder[-2] if len(folder) > 1 else ""
+    return set(tokenize(stem or track.name)) | set(tokenize(tags))
+
+
+def _number(text):
+    return float(text.replace(',', '.'))
+
+
+class SearchQuery:
+    """Consulta interpretada: termos de texto (prefixos), códigos Camelot e faixas numéricas"""
+
+    def __init__(self, terms=(), camelot=(), ranges=()):
+        self.terms = list(terms)      # todos precisam casar (prefixo de algum token)
+        self.camelot = set(camelot)   # qualquer um dos códigos
+        self.ranges = list(ranges)    # (campo, mínimo, máximo, inclui mínimo, inclui máximo)
+
+    @property
+    def empty(self):
+        return not (self.terms or self.camelot or self.ranges)
+
+
+def parse_query(text):
+    """Interpreta a busca digitada (ver o docstring do módulo)"""
+    # "bpm > 120" e "8A / 9A" viram um único termo
+    text = re.sub(r"\s*([<>=:/–]|-(?=\s*\d))\s*", r"\1", text.strip().lower())
+    query = SearchQuery()
+    for word in text.split():
+        codes = word.split('/')
+        if all(_CAMELOT.fullmatch(code) for code in codes):
+            query.camelot.update(code.upper() for code in codes)
+            continue
+        match = _RANGE.fullmatch(word)
+        if match:
+            low, high = sorted((_number(match.group(1)), _number(match.group(2))))
+            query.ranges.append(('bpm', low, high, True, True))
+            continue
+        match = _COMPARISON.fullmatch(word)
+        if match and match.group(1) in FIELD_ALIASES:
+            field, operator, value = FIELD_ALIASES[match.group(1)], match.group(2), _number(match.group(3))
+            if operator in ('>', '>='):
+                query.ranges.append((field, value, None, operator == '>=', True))
+            elif operator in ('<', '<='):
+                query.ranges.append((field, None, value, True, operator == '<='))
+            else:
+                query.ranges.append((field, value, value, True, True))
+            continue
+        match = _FIELD.fullmatch(word)
+        if match and match.group(1) in KEY_FIELDS:
+            codes = match.group(2).split('/')
+            for code in codes:
+                code = _KEY_NAMES.get(code, code.upper())
+                if _CAMELOT.fullmatch(code.lower()):
+                    query.camelot.add(code)
+            continue
+        query.terms.extend(tokenize(word))
+    return query
+
+
+class SearchIndex:
+    """Índices da biblioteca para a busca (IDs do TrackRegistry, na ordem da biblioteca)"""
+
+    def __init__(self):
+        self._tracks = {}     # id -> música (ordem de inserção = ordem da lista)
+        self._tokens = {}     # id -> tokens da música
+        self._postings = {}   # token -> IDs
+        self._by_camelot = {}  # código Camelot -> IDs
+        # Refeitos sob demanda após alterações
+        self._sorted_tokens = None
+        self._ranges = {}       # campo -> (valores ordenados, IDs na mesma ordem)
+        self._positions = None  # id -> posição na biblioteca
+
+    def __contains__(self, track_id):
+        return track_id in self._tracks
+
+    def __len__(self):
+        return len(self._tracks)
+
+    def add(self, track):
+        """Indexa a música (ou reindexa, mantendo a posição, se o ID já existir)"""
+        if track.id in self._tracks:
+            self._unindex(track.id)
+        self._tracks[track.id] = track
+        tokens = track_tokens(track)
+        self._tokens[track.id] = tokens
+        for token in tokens:
+            postings = self._postings.get(token)
+            if postings is None:
+                self._postings[token] = {track.id}
+                self._sorted_tokens = None
+            else:
+                postings.add(track.id)
+        self._by_camelot.setdefault(track.camelot, set()).add(track.id)
+        self._ranges.clear()
+        self._positions = None
+
+    def remove(self, track_id):
+        if track_id in self._tracks:
+            self._unindex(track_id)
+            del self._tracks[track_id]
+            self._ranges.clear()
+            self._positions = None
+
+    def clear(self):
+        self.__init__()
+
+    def _unindex(self, track_id):
+        for token in self._tokens.pop(track_id, ()):
+            postings = self._postings[token]
+            postings.discard(track_id)
+            if not postings:
+                del self._postings[token]
+                self._sorted_tokens = None
+        self._by_camelot.get(self._tracks[track_id].camelot, set()).discard(track_id)
+
+    def prepare(self):
+        """Monta os índices ordenados (após o carregamento, para a primeira tecla já ser rápida)"""
+        if self._sorted_tokens is None:
+            self._sorted_tokens = sorted(self._postings)
+        for field in ('bpm', 'energy'):
+            self._sorted_values(field)
+        if self._positions is None:
+            self._positions = {track_id: i for i, track_id in enumerate(self._tracks)}
+
+    # Consultas
+
+    def search(self, query):
+        """IDs que atendem a consulta, na ordem da biblioteca"""
+        if query.empty:
+            return list(self._tracks)
+        candidates = [self._camelot_ids(query.camelot)] if query.camelot else []
+        candidates += [self._range_ids(*r) for r in query.ranges]
+        candidates += [self._prefix_ids(term) for term in query.terms]
+
+        # Interseção a partir do menor conjunto
+        candidates.sort(key=len)
+        result = set(candidates[0])
+        for ids in candidates[1:]:
+            if not result:
+                break
+            result.intersection_update(ids)
+
+        if len(result) > len(self._tracks) * SCAN_FRACTION:
+            return [track_id for track_id in self._tracks if track_id in result]
+        if self._positions is None:
+            self._positions = {track_id: i for i, track_id in enumerate(self._tracks)}
+        return sorted(result, key=self._positions.__getitem__)
+
+    def matches(self, query, track_id):
+        """Se a música atende a consulta (para músicas que chegam com a busca ativa)"""
+        track = self._tracks.get(track_id)
+        if track is None:
+            return False
+        if query.camelot and track.camelot not in query.camelot:
+            return False
+        for field, low, high, low_inclusive, high_inclusive in query.ranges:
+            value = self._value(field, track)
+            if value is None:
+                return False
+            if low is not None and (value < low or (value == low and not low_inclusive)):
+                return False
+            if high is not None and (value > high or (value == high and not high_inclusive)):
+                return False
+        tokens = self._tokens[track_id]
+        return all(any(token.startswith(term) for token in tokens) for term in query.terms)
+
+    def _camelot_ids(self, codes):
+        sets = [self._by_camelot.get(code, ()) for code in codes]
+        return sets[0] if len(sets) == 1 else set().union(*sets)
+
+    def _prefix_ids(self, term):
+        if self._sorted_tokens is None:
+            self._sorted_tokens = sorted(self._postings)
+        tokens = self._sorted_tokens
+        start = bisect_left(tokens, term)
+        end = bisect_left(tokens, term + "\uffff", start)
+        if end - start == 1:
+            return self._postings[tokens[start]]
+        return set().union(*(self._postings[token] for token in tokens[start:end]))
+
+    def _range_ids(self, field, low, high, low_inclusive, high_inclusive):
+        values, ids = self._sorted_values(field)
+        start = 0 if low is None else (bisect_left if low_inclusive else bisect_right)(values, low)
+        end = len(values) if high is None else (bisect_right if high_inclusive else bisect_left)(values, high)
+        return ids[start:end]
+
+    @staticmethod
+    def _value(field, track):
+        return track.bpm if field == 'bpm' else track.volume
+
+    def _sorted_values(self, field):
+        index = self._ranges.get(field)
+        if index is None:
+            ids, values = [], []
+            for track_id, track in self._tracks.items():
+                value = self._value(field, track)
+                if value is not None:
+                    ids.append(track_id)
+                    values.append(value)
+            order = sorted(range(len(ids)), key=values.__getitem__)
+            index = ([values[i] for i in order], [ids[i] for i in order])
+            self._ranges[field] = index
+        return index
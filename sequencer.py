@@ -0,0 +1,321 @@
+"""
+Ordenação automática do set.
+
+Procura a sequência de músicas com a maior soma de scores de transição
+(harmônico + BPM, a mesma pontuação das sugestões) — um problema de caminho
+do tipo caixeiro-viajante. A solução é heurística: construção gulosa a partir
+de algumas músicas iniciais, seguida de busca local (2-opt, Or-opt e troca
+por músicas não usadas do conjunto de candidatas), toda vetorizada em NumPy.
+
+Restrições suportadas: primeira e/ou última música fixas e uma curva de
+energia alvo (a loudness de cada música, normalizada dentro do conjunto).
+"""
+import time
+
+import numpy as np
+
+from scoring import (BPM_WEIGHT, HARMONIC_WEIGHT, KEY_COMPATIBILITY, NO_KEY,
+                     LibraryColumns, bpm_scores)
+
+# Curvas de energia alvo: posição relativa no set (0 a 1) -> energia relativa (0 a 1)
+ENERGY_CURVES = {
+    'rising': lambda x: x,
+    'falling': lambda x: 1 - x,
+    'peak': lambda x: np.sin(np.pi * x),
+}
+
+# Pontos de transição perdidos por unidade de distância da curva de energia
+ENERGY_WEIGHT = 30.0
+
+# Tamanhos de bloco testados pelo Or-opt
+OR_OPT_SEGMENTS = (1, 2, 3)
+
+# Tempo máximo padrão (s) da ordenação, contando a preparação das matrizes
+TIME_LIMIT = 0.8
+
+
+def transition_scores(columns):
+    """Matriz n x n com o score (0-100) da transição de cada música para cada outra"""
+    key = np.maximum(columns.key_index, 0)
+    harmonic = KEY_COMPATIBILITY[np.ix_(key, key)].astype(np.float64)
+    unknown = columns.key_index == NO_KEY
+    harmonic[unknown, :] = 0
+    harmonic[:, unknown] = 0
+    bpm = bpm_scores(np.abs(columns.bpm[:, None] - columns.bpm[None, :]))
+    return harmonic * HARMONIC_WEIGHT + bpm * BPM_WEIGHT
+
+
+def sequence_score(tracks):
+    """Score médio das transições entre músicas consecutivas (0-100)"""
+    if len(tracks) < 2:
+        return 0.0
+    scores = transition_scores(LibraryColumns(tracks))
+    return float(np.mean(np.diagonal(scores, offset=1)))
+
+
+def energy_targets(curve, length):
+    """Energia alvo (0-1) de cada posição; curve é um nome de ENERGY_CURVES, função ou lista de valores"""
+    positions = np.linspace(0, 1, length) if length > 1 else np.zeros(length)
+    if callable(curve):
+        return np.asarray(curve(positions), dtype=np.float64)
+    if isinstance(curve, str):
+        if curve not in ENERGY_CURVES:
+            raise ValueError(f"Curva de energia desconhecida: {curve}")
+        return np.asarray(ENERGY_CURVES[curve](positions), dtype=np.float64)
+    points = np.asarray(curve, dtype=np.float64)
+    return np.interp(positions, np.linspace(0, 1, len(points)), points)
+
+
+def order_set(tracks, length=None, opener=None, closer=None, energy_curve=None,
+              energy_weight=ENERGY_WEIGHT, starts=16, time_limit=TIME_LIMIT):
+    """
+    Retorna as músicas em uma ordem com boas transições.
+
+    tracks        - músicas candidatas (o set atual ou um conjunto maior)
+    length        - tamanho do set a montar (padrão: todas as candidatas)
+    opener/closer - índice em `tracks` da música que deve abrir/fechar o set
+    energy_curve  - curva de energia alvo (ver energy_targets), ou None
+    time_limit    - tempo máximo (s) da ordenação inteira (preparação, construção e busca local)
+    """
+    deadline = time.monotonic() + time_limit
+    n = len(tracks)
+    length = n if length is None else max(0, min(length, n))
+    if opener is not None and opener == closer:
+        raise ValueError("A mesma música não pode abrir e fechar o set")
+    if length < 2 or n < 2:
+        fixed = [tracks[i] for i in (opener, closer) if i is not None]
+        return (fixed or list(tracks))[:length]
+
+    columns = LibraryColumns(tracks)
+    # Custo = pontos perdidos na transição; o nó extra (índice n) representa as pontas do set
+    cost = np.zeros((n + 1, n + 1))
+    cost[:n, :n] = 100 - transition_scores(columns)
+
+    position_cost = np.zeros((n, length))
+    if energy_curve is not None and energy_weight:
+        position_cost = _energy_costs(columns.energy, energy_targets(energy_curve, length), energy_weight)
+
+    search = _PathSearch(cost, position_cost, length, opener, closer)
+
+    # A construção gulosa é barata: a busca local parte das melhores, enquanto houver tempo
+    tours = []
+    for start in search.start_candidates(starts):
+        if tours and time.monotonic() >= deadline:
+            break
+        tours.append(search.greedy(start))
+    tours.sort(key=search.tour_cost)
+    best_tour, best_cost = tours[0], search.tour_cost(tours[0])
+    for tour in tours:
+        tour = search.improve(tour, deadline)
+        if tour is None:
+            break  # Sem tempo para melhorar mais uma construção
+        tour_cost = search.tour_cost(tour)
+        if tour_cost < best_cost - 1e-9:
+            best_tour, best_cost = tour, tour_cost
+    return [tracks[i] for i in best_tour]
+
+
+def _energy_costs(energy, targets, weight):
+    """Custo de cada música (linhas) em cada posição (colunas) pela distância da curva alvo"""
+    known = ~np.isnan(energy)
+    if known.sum() < 2 or np.nanmax(energy) == np.nanmin(energy):
+        return np.zeros((len(energy), len(targets)))
+    low, high = np.nanmin(energy), np.nanmax(energy)
+    relative = (energy.astype(np.float64) - low) / (high - low)
+    costs = weight * np.abs(relative[:, None] - targets[None, :])
+    # Músicas sem energia conhecida não são penalizadas
+    costs[~known] = 0
+    return costs
+
+
+class _PathSearch:
+    """Construção e busca local de um caminho de `length` músicas sobre a matriz de custos"""
+
+    def __init__(self, cost, position_cost, length, opener, closer):
+        self.cost = cost                    # (n+1) x (n+1), nó n = ponta do set
+        self.position_cost = position_cost  # n x length
+        self.has_energy = bool(position_cost.any())
+        self.n = len(cost) - 1
+        self.length = length
+        self.opener = opener
+        self.closer = closer
+        # Primeira/última posição que a busca local pode alterar
+        self.low = 1 if opener is not None else 0
+        self.high = length - 2 if closer is not None else length - 1
+        # Duração do passo de busca local mais lento, para não começar um que estoure o prazo
+        self.step_time = 0.0
+
+    def tour_cost(self, tour):
+        padded = np.concatenate(([self.n], tour, [self.n]))
+        return (self.cost[padded[:-1], padded[1:]].sum() +
+                self.position_cost[tour, np.arange(len(tour))].sum())
+
+    def start_candidates(self, starts):
+        if self.opener is not None:
+            return [self.opener]
+        # Músicas com as melhores transições disponíveis e próximas da energia de abertura
+        cost = self.cost[:self.n, :self.n].copy()
+        np.fill_diagonal(cost, np.inf)
+        nearest = np.sort(cost, axis=1)[:, :min(3, self.n - 1)].mean(axis=1)
+        rank = nearest + self.position_cost[:, 0]
+        if self.closer is not None:
+            rank[self.closer] = np.inf
+        order = np.argsort(rank, kind='stable')
+        return list(order[np.isfinite(rank[order])][:max(1, starts)])
+
+    def greedy(self, start):
+        """Sempre avança para a candidata de menor custo de transição + posição"""
+        available = np.ones(self.n, dtype=bool)
+        available[start] = False
+        last_position = self.length
+        if self.closer is not None:
+            available[self.closer] = False
+            last_position -= 1
+        tour = [start]
+        for position in range(1, last_position):
+            step = self.cost[tour[-1], :self.n] + self.position_cost[:, position]
+            step[~available] = np.inf
+            nxt = int(np.argmin(step))
+            tour.append(nxt)
+            available[nxt] = False
+        if self.closer is not None:
+            tour.append(self.closer)
+        return np.array(tour)
+
+    def improve(self, tour, deadline):
+        """
+        Aplica o melhor movimento (2-opt, Or-opt ou troca) até não haver melhora.
+
+        Um passo só começa se o passo mais lento até aqui ainda couber antes
+        de `deadline`; retorna None se não houver tempo nem para o primeiro.
+        """
+        unused = np.setdiff1d(np.arange(self.n), tour)
+        started = time.monotonic()
+        if started + self.step_time >= deadline:
+            return None
+        while started + self.step_time < deadline:
+            moves = [self._best_two_opt(tour), self._best_swap(tour, unused)]
+            moves.extend(self._best_or_opt(tour, segment) for segment in OR_OPT_SEGMENTS)
+            delta, apply = min((m for m in moves if m), key=lambda m: m[0], default=(0, None))
+            if delta > -1e-9:
+                break
+            tour, unused = apply(tour, unused)
+            now = time.monotonic()
+            self.step_time, started = max(self.step_time, now - started), now
+        return tour
+
+    def _padded(self, tour):
+        return np.concatenate(([self.n], tour, [self.n]))
+
+    def _best_two_opt(self, tour):
+        """Inverter o trecho i..j (custos simétricos: só mudam as duas arestas das pontas)"""
+        if self.high - self.low < 1:
+            return None
+        padded = self._padded(tour)
+        prev, cur, nxt = padded[:-2], padded[1:-1], padded[2:]
+        cost = self.cost
+        delta = (cost[prev[:, None], cur[None, :]] + cost[cur[:, None], nxt[None, :]]
+                 - cost[prev, cur][:, None] - cost[cur, nxt][None, :])
+
+        size = len(tour)
+        i, j = np.arange(size)[:, None], np.arange(size)[None, :]
+        if self.has_energy:
+            # Energia: com o trecho invertido, a música da posição i+j-p vai para a posição p.
+            # Somas acumuladas ao longo das antidiagonais dão o custo de qualquer inversão em O(1)
+            positional = self.position_cost[tour, :size].T   # [posição, música na posição q]
+            p = np.arange(size)[:, None]
+            q = np.arange(2 * size - 1)[None, :] - p
+            antidiagonal = np.where((q >= 0) & (q < size), positional[p, np.clip(q, 0, size - 1)], 0)
+            antidiagonal = np.vstack((np.zeros((1, 2 * size - 1)), np.cumsum(antidiagonal, axis=0)))
+            diagonal = np.concatenate(([0], np.cumsum(np.diagonal(positional))))
+            reversed_cost = antidiagonal[j + 1, i + j] - antidiagonal[i, i + j]
+            delta += reversed_cost - (diagonal[j + 1] - diagonal[i])
+
+        valid = (i < j) & (i >= self.low) & (j <= self.high)
+        delta = np.where(valid, delta, np.inf)
+        best = np.unravel_index(np.argmin(delta), delta.shape)
+        if not np.isfinite(delta[best]):
+            return None
+
+        def apply(tour, unused, i=int(best[0]), j=int(best[1])):
+            tour = tour.copy()
+            tour[i:j + 1] = tour[i:j + 1][::-1]
+            return tour, unused
+        return float(delta[best]), apply
+
+    def _best_or_opt(self, tour, segment):
+        """Mover um bloco de `segment` músicas para outro ponto do set, mantendo sua ordem"""
+        size = len(tour)
+        if self.high - self.low + 1 <= segment:
+            return None
+        padded = self._padded(tour)
+        cost = self.cost
+        i = np.arange(size - segment + 1)[:, None]   # início do bloco
+        k = np.arange(-1, size)[None, :]             # inserir após a posição k (-1 = no início)
+
+        before, first = padded[i], padded[i + 1]
+        last, after = padded[i + segment], padded[i + segment + 1]
+        removal = cost[before, after] - cost[before, first] - cost[last, after]
+        left, right = padded[k + 1], padded[np.minimum(k + 2, size + 1)]
+        insertion = cost[left, first] + cost[last, right] - cost[left, right]
+        delta = removal + insertion
+
+        moving_right = k >= i + segment
+        if self.has_energy:
+            # Energia: o bloco muda de posição e as músicas entre a origem e o destino andam `segment` casas
+            positional = self.position_cost[tour, :size].T
+            own = np.diagonal(positional)
+            steps = np.arange(size)
+
+            def shifted(offset):
+                target = steps + offset
+                inside = (target >= 0) & (target < size)
+                gain = np.where(inside, positional[np.clip(target, 0, size - 1), steps], 0) - own
+                return np.concatenate(([0], np.cumsum(gain)))
+
+            to_left, to_right = shifted(-segment), shifted(segment)
+            shift = np.where(moving_right,
+                             to_left[np.clip(k + 1, 0, size)] - to_left[np.clip(i + segment, 0, size)],
+                             to_right[i] - to_right[np.clip(k + 1, 0, size)])
+            new_start = np.where(moving_right, k - segment + 1, k + 1)
+            block = sum(positional[np.clip(new_start + t, 0, size - 1), i + t] - own[i + t]
+                        for t in range(segment))
+            delta = delta + shift + block
+
+        valid = ((k <= i - 2) | moving_right) & (i >= self.low) & (i + segment - 1 <= self.high)
+        if self.opener is not None:
+            valid &= k >= 0
+        if self.closer is not None:
+            valid &= k <= size - 2
+        delta = np.where(valid, delta, np.inf)
+        best = np.unravel_index(np.argmin(delta), delta.shape)
+        if not np.isfinite(delta[best]):
+            return None
+
+        def apply(tour, unused, i=int(best[0]), k=int(best[1]) - 1):
+            block = tour[i:i + segment]
+            rest = np.concatenate((tour[:i], tour[i + segment:]))
+            at = k + 1 if k < i else k - segment + 1
+            return np.concatenate((rest[:at], block, rest[at:])), unused
+        return float(delta[best]), apply
+
+    def _best_swap(self, tour, unused):
+        """Trocar uma música do set por uma candidata que ficou de fora"""
+        if not len(unused) or self.high < self.low:
+            return None
+        padded = self._padded(tour)
+        positions = np.arange(self.low, self.high + 1)
+        before, current, after = padded[positions][:, None], tour[positions][:, None], padded[positions + 2][:, None]
+        candidates = unused[None, :]
+        cost = self.cost
+        delta = (cost[before, candidates] + cost[candidates, after]
+                 - cost[before, current] - cost[current, after]
+                 + self.position_cost[candidates, positions[:, None]]
+                 - self.position_cost[current, positions[:, None]])
+        best = np.unravel_index(np.argmin(delta), delta.shape)
+
+        def apply(tour, unused, position=int(positions[best[0]]), index=int(best[1])):
+            tour, unused = tour.copy(), unused.copy()
+            tour[position], unused[index] = unused[index], tour[position]
+            return tour, unused
+        return float(delta[best]), apply
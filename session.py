@@ -0,0 +1,237 @@
+"""
+Sessões salvas: a biblioteca analisada, a ordem do set e a pasta, para reabrir
+sem reanalisar nada.
+
+O mesmo conteúdo em dois formatos, escolhidos pela extensão:
+- .json: JSON versionado e legível, portável entre máquinas e versões;
+- .djset: colunas NumPy num .npz sem compressão (carregamento rápido), com
+  um cabeçalho JSON para o que não é coluna (pasta, erros, segmentos).
+
+A leitura não consulta os arquivos de música: a sessão guarda tamanho e
+mtime de cada um e a interface compara com a pasta em segundo plano, depois
+que as listas já estão na tela.
+"""
+import os
+import json
+import time
+from array import array
+from pathlib import Path
+
+from similarity import TIMBRE_SIZE
+from track_store import KEY_NAMES, NO_KEY, Track
+
+SESSION_FORMAT = "djset-session"
+SESSION_VERSION = 1
+BINARY_EXTENSION = ".djset"
+JSON_EXTENSION = ".json"
+
+# Sessão salva ao fechar o programa e reaberta na próxima execução
+AUTOSAVE_PATH = Path.home() / ".djset_cache" / f"last_session{BINARY_EXTENSION}"
+
+
+class SessionError(Exception):
+    pass
+
+
+class Session:
+    """Pasta, músicas da biblioteca, set e snapshot {caminho: (tamanho, mtime_ns)}"""
+
+    def __init__(self, folder=None, library=(), set_list=(), snapshot=None, analysis_mode='window',
+                 saved=None):
+        self.folder = folder
+        self.library = list(library)
+        self.set_list = list(set_list)   # as mesmas instâncias da biblioteca, mais as de outras pastas
+        self.snapshot = dict(snapshot or {})
+        self.analysis_mode = analysis_mode
+        self.saved = saved
+
+    def _tracks(self):
+        """(músicas a gravar, índice de cada música do set nessa lista)"""
+        tracks = list(self.library)
+        index = {track.path: i for i, track in enumerate(tracks)}
+        set_indices = []
+        for track in self.set_list:
+            if track.path not in index:
+                index[track.path] = len(tracks)
+                tracks.append(track)
+            set_indices.append(index[track.path])
+        return tracks, set_indices
+
+    def _header(self):
+        return {
+            'format': SESSION_FORMAT,
+            'version': SESSION_VERSION,
+            'saved': time.strftime("%Y-%m-%d %H:%M:%S"),
+            'folder': self.folder,
+            'analysis_mode': self.analysis_mode,
+            'library_size': len(self.library),
+        }
+
+
+def save_session(path, session):
+    """Grava a sessão (binária em .djset, JSON nas demais extensões), substituindo o arquivo de uma vez"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp = path.with_name(path.name + ".tmp")
+    with open(temp, 'wb') as f:
+        if path.suffix.lower() == BINARY_EXTENSION:
+            _write_binary(f, session)
+        else:
+            _write_json(f, session)
+    os.replace(temp, path)
+
+
+def load_session(path):
+    """Lê uma sessão gravada por save_session (o formato é detectado pelo conteúdo)"""
+    try:
+        with open(path, 'rb') as f:
+            binary = f.read(2) == b"PK"  # .npz é um zip
+        return _read_binary(path) if binary else _read_json(path)
+    except SessionError:
+        raise
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        raise SessionError(f"Não foi possível ler a sessão {path}: {e}") from e
+
+
+def session_from_json(data):
+    """Sessão a partir do JSON já decodificado (ex.: a CLI, que aceita vários tipos de JSON)"""
+    _check_header(data)
+    tracks, snapshot = [], {}
+    for info in data['tracks']:
+        tracks.append(Track.from_analysis(info))
+        if info.get('size') is not None:
+            snapshot[info['path']] = (info['size'], info['mtime_ns'])
+    library_size = data['library_size']
+    return Session(data.get('folder'), tracks[:library_size], [tracks[i] for i in data['set']],
+                   snapshot, data.get('analysis_mode', 'window'), data.get('saved'))
+
+
+def is_session(data):
+    return isinstance(data, dict) and data.get('format') == SESSION_FORMAT
+
+
+def _check_header(header):
+    if not is_session(header):
+        raise SessionError("O arquivo não é uma sessão do Organizador de Set DJ")
+    if header['version'] > SESSION_VERSION:
+        raise SessionError(f"Sessão gravada por uma versão mais nova (formato {header['version']})")
+
+
+# JSON
+
+def _write_json(f, session):
+    tracks, set_indices = session._tracks()
+    data = session._header()
+    data['set'] = set_indices
+    data['tracks'] = []
+    for track in tracks:
+        info = track.to_dict()
+        size, mtime_ns = session.snapshot.get(track.path, (None, None))
+        info.update(size=size, mtime_ns=mtime_ns)
+        data['tracks'].append(info)
+    f.write(json.dumps(data, ensure_ascii=False, indent=1).encode('utf-8'))
+
+
+def _read_json(path):
+    with open(path, encoding='utf-8') as f:
+        return session_from_json(json.load(f))
+
+
+# Binário (.npz): uma coluna por campo numérico; caminhos num único bloco UTF-8
+
+def _write_binary(f, session):
+    import numpy as np
+
+    tracks, set_indices = session._tracks()
+    count = len(tracks)
+
+    def column(values, dtype):
+        return np.fromiter(values, dtype=dtype, count=count)
+
+    def optional(value):
+        return np.nan if value is None else value
+
+    header = session._header()
+    header['errors'] = {str(i): t.error for i, t in enumerate(tracks) if t.error}
+    header['segments'] = {str(i): t.segments for i, t in enumerate(tracks) if t.segments}
+    states = [session.snapshot.get(t.path, (-1, -1)) for t in tracks]
+    grids = [t.beat_grid or (np.nan, np.nan) for t in tracks]
+    # Timbres numa matriz (músicas x TIMBRE_SIZE); linhas NaN para músicas sem timbre
+    timbres = np.full((count, TIMBRE_SIZE), np.nan, dtype=np.float32)
+    for i, track in enumerate(tracks):
+        if track.timbre is not None and len(track.timbre) == TIMBRE_SIZE:
+            timbres[i] = track.timbre
+
+    # Caminhos não podem conter "\0"
+    paths = "\0".join(t.path for t in tracks).encode('utf-8')
+    np.savez(
+        f,
+        header=np.frombuffer(json.dumps(header, ensure_ascii=False).encode('utf-8'), dtype=np.uint8),
+        paths=np.frombuffer(paths, dtype=np.uint8),
+        bpm=column((t.bpm for t in tracks), np.float64),
+        key_index=column((t.key_index for t in tracks), np.int8),
+        key_confidence=column((optional(t.key_confidence) for t in tracks), np.float32),
+        loudness_db=column((optional(t.loudness_db) for t in tracks), np.float64),
+        duration=column((optional(t.duration) for t in tracks), np.float64),
+        grid_first=column((grid[0] for grid in grids), np.float64),
+        grid_period=column((grid[1] for grid in grids), np.float64),
+        full_analysis=column((t.full_analysis for t in tracks), np.bool_),
+        timbre=timbres,
+        size=column((state[0] for state in states), np.int64),
+        mtime_ns=column((state[1] for state in states), np.int64),
+        set=np.asarray(set_indices, dtype=np.int32),
+    )
+
+
+def _read_binary(path):
+    import numpy as np
+
+    with np.load(path, allow_pickle=False) as data:
+        header = json.loads(data['header'].tobytes().decode('utf-8'))
+        _check_header(header)
+        blob = data['paths'].tobytes().decode('utf-8')
+        columns = {name: data[name].tolist() for name in (
+            'bpm', 'key_index', 'loudness_db', 'duration', 'grid_first', 'grid_period',
+            'full_analysis', 'size', 'mtime_ns', 'set')}
+        # Coluna ausente em sessões gravadas antes da confiança da nota
+        confidences = (data['key_confidence'].tolist() if 'key_confidence' in data.files
+                       else [np.nan] * len(columns['bpm']))
+        # Idem para o timbre (semelhança de som)
+        timbres = data['timbre'] if 'timbre' in data.files else None
+
+    paths = blob.split("\0") if blob else []
+    errors = header.get('errors', {})
+    segments = header.get('segments', {})
+    basename = os.path.basename
+    tracks, snapshot = [], {}
+    rows = zip(paths, columns['bpm'], columns['key_index'], columns['loudness_db'], columns['duration'],
+               columns['grid_first'], columns['grid_period'], columns['full_analysis'],
+               columns['size'], columns['mtime_ns'], confidences)
+    for i, (path, bpm, key_index, loudness_db, duration, first, period, full, size, mtime_ns,
+            confidence) in enumerate(rows):
+        # NaN != NaN: valores ausentes voltam a ser None
+        tracks.append(Track(
+            path, basename(path), bpm,
+            KEY_NAMES.get(key_index) if key_index != NO_KEY else None,
+            loudness_db if loudness_db == loudness_db else None,
+            duration if duration == duration else None,
+            (first, period) if period == period else None,
+            segments.get(str(i)), full, errors.get(str(i)),
+            round(confidence, 3) if confidence == confidence else None,
+            _timbre(timbres, i),
+        ))
+        if size >= 0:
+            snapshot[path] = (size, mtime_ns)
+
+    library_size = header['library_size']
+    return Session(header.get('folder'), tracks[:library_size], [tracks[i] for i in columns['set']],
+                   snapshot, header.get('analysis_mode', 'window'), header.get('saved'))
+
+
+def _timbre(timbres, row):
+    """Timbre da linha da matriz gravada (None se ausente)"""
+    if timbres is None or timbres.shape[1:] != (TIMBRE_SIZE,) or timbres[row, 0] != timbres[row, 0]:
+        return None
+    timbre = array('f')
+    timbre.frombytes(timbres[row].astype('float32').tobytes())
+    return timbre
@@ -0,0 +1,197 @@
+"""
+Exportação do set para uma pasta, fora da thread da interface.
+
+Os arquivos são primeiro gravados numa pasta temporária dentro do destino
+(.djset_export) e só são movidos para o nome final quando todas as cópias
+terminam; uma exportação interrompida pode ser retomada e reaproveita o que
+já foi copiado. Quando origem e destino estão no mesmo sistema de arquivos,
+usa hardlink ou reflink (FICLONE / copy_file_range) em vez de copiar os dados.
+"""
+import os
+import sys
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+STAGING_DIRNAME = ".djset_export"
+PART_SUFFIX = ".part"
+CHUNK_SIZE = 8 * 1024 * 1024
+
+# FAT/exFAT (pendrives) gravam mtime com resolução de 2 segundos
+MTIME_TOLERANCE = 2.0
+
+# ioctl do Linux para clonar um arquivo inteiro (btrfs, xfs, ...)
+FICLONE = 0x40049409
+
+
+def default_workers():
+    """Cópias simultâneas: poucas, já que o gargalo costuma ser o disco de destino"""
+    return 2
+
+
+def same_file_state(src_stat, dest_path):
+    """Destino já existe com o mesmo tamanho e mtime da origem"""
+    try:
+        dest_stat = os.stat(dest_path)
+    except OSError:
+        return False
+    return (dest_stat.st_size == src_stat.st_size and
+            abs(dest_stat.st_mtime - src_stat.st_mtime) <= MTIME_TOLERANCE)
+
+
+def _clone(src, dest):
+    """Reflink do arquivo inteiro (só Linux, em sistemas de arquivos com suporte)"""
+    import fcntl
+    fcntl.ioctl(dest.fileno(), FICLONE, src.fileno())
+
+
+def _copy_chunks(src, dest, on_bytes, cancelled):
+    while not cancelled():
+        chunk = src.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        dest.write(chunk)
+        on_bytes(len(chunk))
+
+
+class SetExporter:
+    """Copia as músicas do set em paralelo, com progresso, cancelamento e retomada"""
+
+    def __init__(self, workers=None, use_links=True):
+        self.workers = default_workers() if workers is None else max(1, workers)
+        self.use_links = use_links  # hardlink quando origem e destino estão no mesmo disco
+        self._cancel = threading.Event()
+        self._lock = threading.Lock()
+
+    def cancel(self):
+        """Interrompe a exportação; o que já foi copiado fica guardado para a próxima tentativa"""
+        self._cancel.set()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def run(self, set_list, dest_folder, on_progress=None):
+        """
+        Exporta as músicas na ordem do set e retorna os caminhos finais.
+
+        on_progress(bytes_feitos, bytes_total) é chamado a partir das threads de cópia.
+        Se a exportação for cancelada, retorna [] e nenhum arquivo final é criado.
+        """
+        # Importado aqui para evitar import circular (core usa este módulo)
+        from core import export_file_name
+
+        self._cancel.clear()
+        plan = []
+        for position, music in enumerate(set_list, 1):
+            name = export_file_name(position, music)
+            plan.append((music.path, os.stat(music.path), name))
+
+        staging = os.path.join(dest_folder, STAGING_DIRNAME)
+        os.makedirs(staging, exist_ok=True)
+
+        total = sum(src_stat.st_size for _, src_stat, _ in plan)
+        state = {'done': 0}
+
+        def on_bytes(count):
+            with self._lock:
+                state['done'] += count
+                done = state['done']
+            if on_progress:
+                on_progress(done, total)
+
+        if on_progress:
+            on_progress(0, total)
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = [pool.submit(self._export_one, src, src_stat, dest_folder, staging, name, on_bytes)
+                       for src, src_stat, name in plan]
+            # Propaga o primeiro erro (as cópias concluídas continuam na pasta temporária)
+            for future in futures:
+                try:
+                    future.result()
+                except Exception:
+                    self._cancel.set()
+                    raise
+
+        if self.cancelled:
+            return []
+
+        # Todas as cópias prontas: mover para os nomes finais
+        exported = []
+        for _, _, name in plan:
+            staged = os.path.join(staging, name)
+            final = os.path.join(dest_folder, name)
+            if os.path.exists(staged):
+                os.replace(staged, final)
+            exported.append(final)
+        shutil.rmtree(staging, ignore_errors=True)
+        return exported
+
+    def _export_one(self, src, src_stat, dest_folder, staging, name, on_bytes):
+        if self.cancelled:
+            return
+        final = os.path.join(dest_folder, name)
+        staged = os.path.join(staging, name)
+
+        # Já exportado (nesta ou numa tentativa anterior)
+        if same_file_state(src_stat, final) or same_file_state(src_stat, staged):
+            on_bytes(src_stat.st_size)
+            return
+
+        if self.use_links and self._link(src, src_stat, dest_folder, staged):
+            on_bytes(src_stat.st_size)
+            return
+
+        part = staged + PART_SUFFIX
+        try:
+            self._copy(src, part, src_stat.st_size, on_bytes)
+            if self.cancelled:
+                os.remove(part)
+                return
+            shutil.copystat(src, part)
+            os.replace(part, staged)
+        except BaseException:
+            try:
+                os.remove(part)
+            except OSError:
+                pass
+            raise
+
+    def _link(self, src, src_stat, dest_folder, staged):
+        """Hardlink quando origem e destino estão no mesmo sistema de arquivos"""
+        try:
+            if os.stat(dest_folder).st_dev != src_stat.st_dev:
+                return False
+            if os.path.exists(staged):
+                os.remove(staged)
+            os.link(src, staged)
+            return True
+        except OSError:
+            return False  # Sistema de arquivos sem suporte (ex.: FAT)
+
+    def _copy(self, src_path, part, size, on_bytes):
+        with open(src_path, 'rb') as src, open(part, 'wb') as dest:
+            if sys.platform.startswith('linux'):
+                try:
+                    _clone(src, dest)
+                    on_bytes(size)
+                    return
+                except (OSError, ImportError):
+                    pass
+            copied = 0
+            if hasattr(os, 'copy_file_range'):
+                # Cópia dentro do kernel, sem passar os dados pelo Python
+                try:
+                    while copied < size and not self.cancelled:
+                        count = os.copy_file_range(src.fileno(), dest.fileno(),
+                                                   min(CHUNK_SIZE, size - copied), copied, copied)
+                        if count == 0:
+                            break
+                        copied += count
+                        on_bytes(count)
+                except OSError:
+                    pass  # Sem suporte entre esses sistemas de arquivos: continuar pela cópia comum
+            src.seek(copied)
+            dest.seek(copied)
+            _copy_chunks(src, dest, on_bytes, lambda: self.cancelled)
@@ -0,0 +1,166 @@
+"""
+Semelhança de som entre músicas ("mais músicas como esta").
+
+Cada música recebe na análise um timbre compacto: média e desvio dos 13
+MFCC e média do contraste espectral em 5 bandas (+ o vale), calculados a
+partir do mesmo mel em dB e do mesmo STFT já usados para o BPM, ou seja,
+TIMBRE_SIZE floats guardados no resultado (e no cache).
+
+O índice padroniza os timbres da biblioteca (média 0 e desvio 1 por
+dimensão, para que o MFCC 0 não domine) e normaliza cada linha, então a
+semelhança é o cosseno e a consulta é uma multiplicação matriz x vetor.
+Bibliotecas muito grandes (IVF_MIN_TRACKS ou mais) também ganham um índice
+IVF: as linhas são agrupadas por k-means e a consulta só compara as listas
+dos IVF_PROBES centróides mais próximos.
+"""
+
+# Timbre: MFCC (média e desvio) + contraste espectral (média)
+TIMBRE_MFCC = 13
+CONTRAST_FMIN = 100      # Hz; 5 bandas de oitava vão até 3,2 kHz (Nyquist da análise: 5,5 kHz)
+CONTRAST_BANDS = 5
+TIMBRE_SIZE = 2 * TIMBRE_MFCC + CONTRAST_BANDS + 1
+
+# Índice IVF (só acima deste tamanho; abaixo a busca exata já leva ~1 ms)
+IVF_MIN_TRACKS = 100_000
+IVF_PROBES = 8
+IVF_KMEANS_ITERATIONS = 10
+IVF_SAMPLE_PER_LIST = 40
+
+
+def timbre_frames(mel_db, S, sr, n_fft):
+    """MFCC e contraste espectral de cada quadro (TIMBRE_MFCC + CONTRAST_BANDS + 1, quadros)"""
+    import librosa
+    import numpy as np
+
+    mfcc = librosa.feature.mfcc(S=mel_db, n_mfcc=TIMBRE_MFCC)
+    contrast = librosa.feature.spectral_contrast(S=S, sr=sr, n_fft=n_fft, fmin=CONTRAST_FMIN,
+                                                 n_bands=CONTRAST_BANDS)
+    return np.vstack((mfcc, contrast))
+
+
+def timbre_embedding(total, squares, count):
+    """Timbre guardado no resultado a partir das somas dos quadros (e dos quadrados), ou None"""
+    import numpy as np
+
+    if not count:
+        return None
+    mean = np.asarray(total, dtype=np.float64) / count
+    variance = np.asarray(squares, dtype=np.float64)[:TIMBRE_MFCC] / count - mean[:TIMBRE_MFCC] ** 2
+    values = np.concatenate((mean[:TIMBRE_MFCC], np.sqrt(np.maximum(variance, 0)), mean[TIMBRE_MFCC:]))
+    if not np.isfinite(values).all():
+        return None
+    return [round(float(v), 3) for v in values]
+
+
+def summarize_timbre(frames):
+    """Timbre de um trecho a partir de timbre_frames"""
+    frames = frames.astype('float64')
+    return timbre_embedding(frames.sum(axis=1), (frames ** 2).sum(axis=1), frames.shape[1])
+
+
+class TimbreIndex:
+    """Vizinhos mais próximos (cosseno) entre os timbres padronizados da biblioteca"""
+
+    def __init__(self, tracks):
+        import numpy as np
+
+        timbres = [t.timbre for t in tracks]
+        self.size = len(timbres)
+        self.has_timbre = np.fromiter((t is not None and len(t) == TIMBRE_SIZE for t in timbres),
+                                      dtype=np.bool_, count=self.size)
+        self.rows = np.flatnonzero(self.has_timbre)   # posição na biblioteca de cada linha
+        matrix = np.frombuffer(b"".join(timbres[i].tobytes() for i in self.rows),
+                               dtype=np.float32).reshape(len(self.rows), TIMBRE_SIZE)
+        if len(matrix):
+            self.mean = matrix.mean(axis=0)
+            self.scale = matrix.std(axis=0)
+            self.scale[self.scale < 1e-6] = 1
+        else:
+            self.mean = np.zeros(TIMBRE_SIZE, dtype=np.float32)
+            self.scale = np.ones(TIMBRE_SIZE, dtype=np.float32)
+        self.vectors = self._normalize(matrix)
+        self.ivf = _IVF(self.vectors) if len(self.vectors) >= IVF_MIN_TRACKS else None
+
+    def __len__(self):
+        return len(self.vectors)
+
+    def _normalize(self, matrix):
+        import numpy as np
+
+        vectors = (matrix - self.mean) / self.scale
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return np.ascontiguousarray(vectors / np.maximum(norms, 1e-9), dtype=np.float32)
+
+    def embed(self, timbre):
+        """Vetor de consulta de um timbre (também de músicas fora da biblioteca), ou None"""
+        import numpy as np
+
+        if timbre is None or len(timbre) != TIMBRE_SIZE or not len(self.vectors):
+            return None
+        return self._normalize(np.asarray(timbre, dtype=np.float32))
+
+    def similarities(self, timbre):
+        """Cosseno (-1 a 1) do timbre com cada música da biblioteca; NaN sem timbre (None se a consulta não tiver)"""
+        import numpy as np
+
+        query = self.embed(timbre)
+        if query is None:
+            return None
+        result = np.full(self.size, np.nan, dtype=np.float32)
+        result[self.rows] = self.vectors @ query
+        return result
+
+    def nearest(self, timbre, limit=10, exclude=()):
+        """(posições na biblioteca, cossenos) das `limit` músicas de som mais parecido, da mais parecida"""
+        import numpy as np
+
+        query = self.embed(timbre)
+        if query is None or limit <= 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        excluded = np.zeros(self.size, dtype=np.bool_)
+        excluded[list(exclude)] = True
+
+        candidates = self.ivf.candidates(query) if self.ivf else None
+        if candidates is None or len(candidates) < limit + len(exclude):
+            candidates = np.arange(len(self.vectors))
+        candidates = candidates[~excluded[self.rows[candidates]]]
+        scores = self.vectors[candidates] @ query
+        if len(candidates) > limit:
+            top = np.argpartition(-scores, limit - 1)[:limit]
+            candidates, scores = candidates[top], scores[top]
+        order = np.lexsort((candidates, -scores))
+        return self.rows[candidates[order]], scores[order]
+
+
+class _IVF:
+    """Listas invertidas: cada linha fica na lista do centróide (k-means esférico) mais próximo"""
+
+    def __init__(self, vectors):
+        import numpy as np
+
+        count = len(vectors)
+        lists = max(1, int(np.sqrt(count)))
+        rng = np.random.default_rng(0)
+        sample = vectors[rng.choice(count, min(count, lists * IVF_SAMPLE_PER_LIST), replace=False)]
+        centroids = sample[rng.choice(len(sample), lists, replace=False)]
+        for _ in range(IVF_KMEANS_ITERATIONS):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            # Centróides sem nenhuma linha ficam onde estavam
+            centroids = np.where(norms > 0, sums / np.maximum(norms, 1e-9), centroids)
+        self.centroids = np.ascontiguousarray(centroids, dtype=np.float32)
+
+        assignment = np.empty(count, dtype=np.int64)
+        for start in range(0, count, 65536):
+            assignment[start:start + 65536] = np.argmax(vectors[start:start + 65536] @ self.centroids.T, axis=1)
+        self.order = np.argsort(assignment, kind='stable')
+        self.offsets = np.searchsorted(assignment[self.order], np.arange(lists + 1))
+
+    def candidates(self, query):
+        """Linhas das listas mais próximas da consulta"""
+        import numpy as np
+
+        probes = np.argsort(-(self.centroids @ query))[:IVF_PROBES]
+        return np.concatenate([self.order[self.offsets[c]:self.offsets[c + 1]] for c in probes])
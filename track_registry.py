@@ -0,0 +1,74 @@
+class TrackRegistry:
+    """
+    Índice das músicas carregadas.
+
+    Cada música recebe um ID estável (também usado como iid nas Treeviews),
+    com acesso O(1) por ID e por caminho, e o registro de quais estão no set.
+    """
+
+    def __init__(self):
+        self._tracks = {}    # id -> música
+        self._by_path = {}   # caminho -> id
+        self._set_ids = set()
+        self._next_id = 1
+
+    def add(self, music):
+        """Registra (ou atualiza) uma música e retorna seu ID; o mesmo caminho mantém o mesmo ID"""
+        track_id = self._by_path.get(music.path)
+        if track_id is None:
+            track_id = f"t{self._next_id}"
+            self._next_id += 1
+            self._by_path[music.path] = track_id
+        music.id = track_id
+        self._tracks[track_id] = music
+        return track_id
+
+    def remove(self, track_id):
+        music = self._tracks.pop(track_id, None)
+        if music is not None:
+            self._by_path.pop(music.path, None)
+            self._set_ids.discard(track_id)
+        return music
+
+    def clear(self):
+        """Remove todas as músicas (os IDs continuam crescendo para não reaproveitar iids)"""
+        self._tracks.clear()
+        self._by_path.clear()
+        self._set_ids.clear()
+
+    def get(self, track_id):
+        return self._tracks.get(track_id)
+
+    def id_for_path(self, path):
+        return self._by_path.get(path)
+
+    def by_path(self, path):
+        track_id = self._by_path.get(path)
+        return self._tracks.get(track_id) if track_id else None
+
+    def __contains__(self, track_id):
+        return track_id in self._tracks
+
+    def __len__(self):
+        return len(self._tracks)
+
+    def __iter__(self):
+        return iter(self._tracks.values())
+
+    # Pertencimento ao set
+
+    def in_set(self, track_id):
+        return track_id in self._set_ids
+
+    def mark_in_set(self, track_id):
+        self._set_ids.add(track_id)
+
+    def unmark_in_set(self, track_id):
+        self._set_ids.discard(track_id)
+
+    def clear_set(self):
+        self._set_ids.clear()
+
+    @property
+    def set_ids(self):
+        return frozenset(self._set_ids)
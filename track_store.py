@@ -0,0 +1,151 @@
+"""
+Registro compacto das músicas da biblioteca.
+
+Cada música é um Track com __slots__ e campos numéricos (BPM, índice do tom
+na Camelot Wheel, loudness em dB, duração em segundos, timbre num array de
+float32); textos como "73%" e
+"04:12" só são gerados na hora de exibir ou exportar. O resultado da análise
+(dict, o mesmo guardado no cache) é convertido uma única vez em Track.
+
+Este módulo não importa NumPy (é usado na abertura da interface).
+"""
+from array import array
+from pathlib import Path
+
+from core import CAMELOT_WHEEL
+
+# Índice do tom: (número Camelot - 1) * 2 + modo (A = 0, B = 1)
+NO_KEY = -1
+CAMELOT_CODES = [f"{number}{letter}" for number in range(1, 13) for letter in "AB"]
+CAMELOT_INDEX = {code: i for i, code in enumerate(CAMELOT_CODES)}
+KEY_INDEX = {key: CAMELOT_INDEX[code] for key, code in CAMELOT_WHEEL.items()}
+KEY_NAMES = {index: key for key, index in KEY_INDEX.items()}
+
+DEFAULT_BPM = 120
+
+# Escala do volume exibido: -60 dB = 0%, 0 dB = 100%
+VOLUME_FLOOR_DB = -60
+
+
+def volume_percent(loudness_db):
+    """Volume exibido (0-100) a partir da loudness em dB (None se desconhecida)"""
+    if loudness_db is None:
+        return None
+    return max(0, min(100, int((loudness_db - VOLUME_FLOOR_DB) * 100 / -VOLUME_FLOOR_DB)))
+
+
+def format_volume(loudness_db):
+    percent = volume_percent(loudness_db)
+    return "N/A" if percent is None else f"{percent}%"
+
+
+def format_duration(seconds):
+    if seconds is None:
+        return "N/A"
+    seconds = int(seconds)
+    return f"{seconds // 60:02d}:{seconds % 60:02d}"
+
+
+def format_bpm(bpm):
+    return f"{bpm:g}"
+
+
+def _parse_volume(volume):
+    # Formato antigo ("73%"): volta para o meio do degrau em dB
+    try:
+        percent = float(str(volume).rstrip('%'))
+    except ValueError:
+        return None
+    return VOLUME_FLOOR_DB + (percent + 0.5) * -VOLUME_FLOOR_DB / 100
+
+
+def _parse_duration(duration):
+    # Formato antigo ("04:12")
+    try:
+        minutes, seconds = str(duration).split(':')
+        return int(minutes) * 60 + int(seconds)
+    except ValueError:
+        return None
+
+
+class Track:
+    """Uma música da biblioteca (campos numéricos; formatação só na exibição)"""
+
+    __slots__ = ('id', 'path', 'name', 'bpm', 'key', 'key_index', 'loudness_db', 'duration',
+                 'beat_grid', 'segments', 'full_analysis', 'error', 'key_confidence', 'timbre')
+
+    def __init__(self, path, name=None, bpm=DEFAULT_BPM, key=None, loudness_db=None, duration=None,
+                 beat_grid=None, segments=None, full_analysis=False, error=None, key_confidence=None,
+                 timbre=None):
+        self.id = None                  # atribuído pelo TrackRegistry (também é o iid nas listas)
+        self.path = path
+        self.name = name or Path(path).name
+        self.bpm = float(bpm)
+        self.key = key if key in KEY_INDEX else None
+        self.key_index = KEY_INDEX.get(key, NO_KEY)
+        self.loudness_db = None if loudness_db is None else float(loudness_db)
+        self.duration = None if duration is None else float(duration)  # segundos
+        self.beat_grid = tuple(beat_grid) if beat_grid else None        # (primeira batida, período)
+        self.segments = segments        # BPM/nota por segmento (análise completa)
+        self.full_analysis = full_analysis
+        self.error = error
+        self.key_confidence = key_confidence  # correlação com o perfil da nota (Pearson, -1 a 1; None se desconhecida)
+        # Timbre (similarity.TIMBRE_SIZE floats) para a semelhança de som; None sem análise
+        self.timbre = timbre if timbre is None or isinstance(timbre, array) else array('f', timbre)
+
+    def __repr__(self):
+        return f"Track({self.path!r}, bpm={self.bpm:g}, key={self.key!r})"
+
+    @property
+    def camelot(self):
+        return CAMELOT_CODES[self.key_index] if self.key_index != NO_KEY else "N/A"
+
+    @property
+    def key_label(self):
+        return self.key or "N/A"
+
+    @property
+    def volume(self):
+        """Volume (0-100) usado na exibição e como energia (None se desconhecido)"""
+        return volume_percent(self.loudness_db)
+
+    @classmethod
+    def from_analysis(cls, info):
+        """Converte o resultado da análise (ou uma linha exportada pela CLI) em Track"""
+        loudness_db = info.get('loudness_db')
+        if loudness_db is None and info.get('volume') not in (None, "N/A"):
+            loudness_db = _parse_volume(info['volume'])
+        duration = info.get('duration_seconds')
+        if duration is None and info.get('duration') not in (None, "N/A"):
+            duration = _parse_duration(info['duration'])
+        segments = info.get('segments')
+        if segments:
+            # O chroma dos segmentos só serve para recalcular a nota, e fica no cache
+            segments = [{k: v for k, v in segment.items() if k != 'chroma'} for segment in segments]
+        return cls(info['path'], info.get('name'), info.get('bpm', DEFAULT_BPM), info.get('key'),
+                   loudness_db, duration, info.get('beat_grid'), segments,
+                   info.get('analysis_mode') == 'full', info.get('error'), info.get('key_confidence'),
+                   info.get('timbre'))
+
+    def to_dict(self):
+        """Dict para exportação (JSON/CSV): valores numéricos e os mesmos textos exibidos na interface"""
+        info = {
+            'path': self.path,
+            'name': self.name,
+            'bpm': int(self.bpm) if self.bpm.is_integer() else self.bpm,
+            'key': self.key_label,
+            'camelot': self.camelot,
+            'key_confidence': self.key_confidence,
+            'volume': format_volume(self.loudness_db),
+            'duration': format_duration(self.duration),
+            'loudness_db': self.loudness_db,
+            'duration_seconds': self.duration,
+            'beat_grid': list(self.beat_grid) if self.beat_grid else None,
+            'timbre': [round(v, 3) for v in self.timbre] if self.timbre else None,
+        }
+        if self.full_analysis:
+            info['analysis_mode'] = 'full'
+            info['segments'] = self.segments
+        if self.error:
+            info['error'] = self.error
+        return info
@@ -0,0 +1,99 @@
+"""
+Prévia da transição entre duas músicas do set, como se fossem dois decks.
+
+Só os trechos usados são decodificados: o final da música que sai e o começo
+da que entra. A que entra é esticada no tempo (phase vocoder do librosa) até
+o BPM da que sai, as duas são alinhadas pela grade de batidas, compasso com
+compasso, e mixadas com crossfade de potência constante.
+"""
+import math
+
+from player import track_length
+from preview import BEATS_PER_BAR, ClipPlayer, read_clip, to_pcm16
+
+MIX_BEATS = 32        # duração do crossfade (8 compassos)
+LEAD_SECONDS = 8      # da música que sai, antes do crossfade
+TAIL_SECONDS = 8      # da música que entra, depois do crossfade
+MAX_STRETCH = 0.12    # diferenças de andamento maiores não são corrigidas
+TRANSITION_CACHE_BYTES = 128 * 1024 * 1024  # ~24 transições estéreo a 44,1 kHz
+
+
+def beat_grid(music):
+    """(primeira batida, período) da música: grade da análise ou, na falta dela, só o BPM"""
+    if music.beat_grid and music.beat_grid[1] > 0:
+        return music.beat_grid
+    return 0.0, 60 / (music.bpm or 120)
+
+
+def stretch_rate(period_out, period_in):
+    """
+    Fator de time-stretch da música que entra (>1 acelera, 1 = sem alteração).
+
+    Meio tempo e tempo dobrado contam como o mesmo andamento; diferenças acima
+    de MAX_STRETCH não são corrigidas (o resultado soaria artificial).
+    """
+    rate = period_in / period_out
+    rate = min((rate, rate / 2, rate * 2), key=lambda r: abs(r - 1))
+    return rate if abs(rate - 1) <= MAX_STRETCH else 1.0
+
+
+def mix_out_point(music, mix_seconds):
+    """Início (s) do crossfade: o último compasso em que a mixagem ainda cabe antes do fim"""
+    first, period = beat_grid(music)
+    bar = period * BEATS_PER_BAR
+    bars = math.floor((track_length(music) - first - mix_seconds) / bar)
+    return first + max(0, bars) * bar
+
+
+def render_transition(outgoing, incoming, sample_rate, channels):
+    """PCM int16 (n, canais) da transição: LEAD_SECONDS, crossfade de MIX_BEATS e TAIL_SECONDS"""
+    import numpy as np
+    import librosa
+
+    first_out, period_out = beat_grid(outgoing)
+    first_in, period_in = beat_grid(incoming)
+    rate = stretch_rate(period_out, period_in)
+    mix_seconds = MIX_BEATS * period_out
+
+    mix_start = mix_out_point(outgoing, mix_seconds)
+    lead = min(LEAD_SECONDS, mix_start)
+    lead_frames = int(round(lead * sample_rate))
+    mix_frames = int(round(mix_seconds * sample_rate))
+    tail_frames = int(round(TAIL_SECONDS * sample_rate))
+
+    # Deck A: termina junto com o crossfade
+    deck_a = read_clip(outgoing.path, mix_start - lead, lead + mix_seconds, sample_rate, channels)
+
+    # Deck B: entra na primeira batida, já no andamento de A
+    deck_b = read_clip(incoming.path, first_in, (mix_seconds + TAIL_SECONDS) * rate,
+                       sample_rate, channels)
+    if rate != 1.0 and len(deck_b):
+        deck_b = np.ascontiguousarray(librosa.effects.time_stretch(deck_b.T, rate=rate).T)
+
+    mix = np.zeros((lead_frames + mix_frames + tail_frames, channels), dtype=np.float32)
+    t = np.linspace(0, np.pi / 2, mix_frames, dtype=np.float32)[:, None]
+    gain_a = np.concatenate((np.ones((lead_frames, 1), dtype=np.float32), np.cos(t)))
+    gain_b = np.concatenate((np.sin(t), np.ones((tail_frames, 1), dtype=np.float32)))
+
+    count_a = min(len(deck_a), lead_frames + mix_frames)
+    mix[:count_a] += deck_a[:count_a] * gain_a[:count_a]
+    count_b = min(len(deck_b), mix_frames + tail_frames)
+    mix[lead_frames:lead_frames + count_b] += deck_b[:count_b] * gain_b[:count_b]
+    return to_pcm16(mix, sample_rate)
+
+
+class TransitionPlayer(ClipPlayer):
+    """Prévia das transições do set (itens são pares (sai, entra)), com cache por par"""
+
+    def __init__(self, max_bytes=TRANSITION_CACHE_BYTES):
+        super().__init__(max_bytes)
+
+    def key(self, pair):
+        # O BPM e a grade entram na chave: reanalisar a música invalida a transição
+        outgoing, incoming = pair
+        return (outgoing.path, incoming.path,
+                beat_grid(outgoing), beat_grid(incoming))
+
+    def render(self, pair):
+        outgoing, incoming = pair
+        return render_transition(outgoing, incoming, self.sample_rate, self.channels)
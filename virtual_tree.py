@@ -0,0 +1,313 @@
+"""
+Treeview virtualizada para listas muito grandes.
+
+Só as linhas visíveis existem no widget; a lista completa (IDs, seleção,
+foco e tags) fica no modelo em Python. Inserções, remoções e movimentos
+alteram apenas o modelo e a janela visível é redesenhada uma vez por ciclo
+ocioso do Tk, então lotes grandes não travam a interface.
+"""
+import itertools
+from tkinter import ttk
+
+# Linhas roladas por passo da roda do mouse
+WHEEL_STEP = 3
+
+_tag_counter = itertools.count(1)
+
+
+def _flatten(items):
+    """Aceita tanto f(a, b) quanto f((a, b)), como a Treeview"""
+    flat = []
+    for item in items:
+        if isinstance(item, (tuple, list, set, frozenset)):
+            flat.extend(item)
+        else:
+            flat.append(item)
+    return flat
+
+
+class VirtualTreeview:
+    """
+    Treeview que materializa apenas as linhas visíveis.
+
+    row_values(iid, índice) devolve os valores de uma linha no momento em que
+    ela é exibida. O iid das linhas visíveis é o próprio ID do modelo, então
+    identify_row(), bind(), heading(), column(), pack() etc. funcionam como
+    na Treeview (métodos não definidos aqui são repassados ao widget).
+    """
+
+    def __init__(self, parent, row_values, **options):
+        self.tree = ttk.Treeview(parent, **options)
+        self.row_values = row_values
+        self._ids = []            # ordem completa das linhas
+        self._index = {}          # iid -> posição (refeito sob demanda)
+        self._index_valid = True
+        self._tags = {}           # iid -> tags
+        self._selection = {}      # iid -> None (dict para manter a ordem de seleção)
+        self._shown_selection = set()  # seleção aplicada ao widget no último _render
+        self._focus = ''
+        self._first = 0           # primeira linha visível
+        self._rows = int(self.tree.cget('height')) or 20
+        self._header = None       # altura do cabeçalho e de cada linha, medidas no widget
+        self._row_height = None
+        self._render_job = None
+        self._extend_selection = False
+        self._yscrollcommand = None
+
+        # Bindings internos numa bindtag própria, para não conflitar com tree.bind()
+        tag = f"VirtualTreeview{next(_tag_counter)}"
+        tags = list(self.tree.bindtags())
+        tags.insert(1, tag)
+        self.tree.bindtags(tuple(tags))
+        root = self.tree.winfo_toplevel()
+        root.bind_class(tag, '<Configure>', self._on_configure)
+        root.bind_class(tag, '<<TreeviewSelect>>', self._on_tree_select)
+        root.bind_class(tag, '<ButtonPress-1>', self._on_press)
+        root.bind_class(tag, '<MouseWheel>', self._on_wheel)
+        root.bind_class(tag, '<Button-4>', lambda e: self._scroll_rows(-WHEEL_STEP))
+        root.bind_class(tag, '<Button-5>', lambda e: self._scroll_rows(WHEEL_STEP))
+        for key, step in (('<Up>', -1), ('<Down>', 1), ('<Prior>', 'page-'), ('<Next>', 'page+'),
+                          ('<Home>', 'home'), ('<End>', 'end')):
+            root.bind_class(tag, key, lambda e, step=step: self._on_key(step))
+
+    def __getattr__(self, name):
+        return getattr(self.tree, name)
+
+    def __len__(self):
+        return len(self._ids)
+
+    # Modelo
+
+    def set_rows(self, iids):
+        """Substitui todas as linhas (mantém seleção e tags das que continuam)"""
+        self._ids = list(iids)
+        self._index_valid = False
+        present = set(self._ids)
+        self._selection = {iid: None for iid in self._selection if iid in present}
+        self._tags = {iid: tags for iid, tags in self._tags.items() if iid in present}
+        if self._focus not in present:
+            self._focus = ''
+        self._schedule()
+
+    def insert(self, index, iids):
+        """Insere linhas na posição (ou 'end'); usado também para lotes durante a análise"""
+        iids = list(iids)
+        if not iids:
+            return
+        if index == 'end' or index >= len(self._ids):
+            if self._index_valid:
+                start = len(self._ids)
+                self._index.update((iid, start + i) for i, iid in enumerate(iids))
+            self._ids.extend(iids)
+        else:
+            self._ids[index:index] = iids
+            self._index_valid = False
+        self._schedule()
+
+    def delete(self, *iids):
+        removed = set(_flatten(iids))
+        if not removed:
+            return
+        self._ids = [iid for iid in self._ids if iid not in removed]
+        self._index_valid = False
+        for iid in removed:
+            self._selection.pop(iid, None)
+            self._tags.pop(iid, None)
+        if self._focus in removed:
+            self._focus = ''
+        self._schedule()
+
+    def move(self, iid, index):
+        """Move uma linha para a posição indicada"""
+        old = self.index(iid)
+        index = max(0, min(index, len(self._ids) - 1))
+        if old == index:
+            return
+        self._ids.insert(index, self._ids.pop(old))
+        self._index_valid = False
+        self._schedule()
+
+    def refresh(self, *iids):
+        """Redesenha as linhas (todas as visíveis, se nenhuma for indicada) após mudança nos dados"""
+        if not iids or any(self.tree.exists(iid) for iid in _flatten(iids)):
+            self._schedule()
+
+    def set_tags(self, iid, tags):
+        if tags:
+            self._tags[iid] = tags
+        else:
+            self._tags.pop(iid, None)
+        if self.tree.exists(iid):
+            self.tree.item(iid, tags=tags)
+
+    def exists(self, iid):
+        self._ensure_index()
+        return iid in self._index
+
+    def index(self, iid):
+        self._ensure_index()
+        return self._index[iid]
+
+    def get_children(self, item=''):
+        return tuple(self._ids)
+
+    def _ensure_index(self):
+        if not self._index_valid:
+            self._index = {iid: i for i, iid in enumerate(self._ids)}
+            self._index_valid = True
+
+    # Seleção e foco (guardados no modelo, aplicados às linhas visíveis)
+
+    def selection(self):
+        self._ensure_index()
+        return tuple(sorted(self._selection, key=self._index.__getitem__))
+
+    def selection_set(self, *iids):
+        self._selection = {iid: None for iid in _flatten(iids) if self.exists(iid)}
+        self._schedule()
+
+    def selection_add(self, *iids):
+        self._selection.update((iid, None) for iid in _flatten(iids) if self.exists(iid))
+        self._schedule()
+
+    def selection_remove(self, *iids):
+        for iid in _flatten(iids):
+            self._selection.pop(iid, None)
+        self._schedule()
+
+    def focus(self, iid=None):
+        if iid is None:
+            return self._focus
+        if self.exists(iid):
+            self._focus = iid
+            self.see(iid)
+
+    def see(self, iid):
+        """Rola a lista para que a linha fique visível"""
+        index = self.index(iid)
+        if index < self._first:
+            self._set_first(index)
+        elif index >= self._first + self._rows:
+            self._set_first(index - self._rows + 1)
+
+    # Rolagem
+
+    def configure(self, **options):
+        if 'yscrollcommand' in options:
+            self._yscrollcommand = options.pop('yscrollcommand')
+            self._update_scrollbar()
+        if options:
+            self.tree.configure(**options)
+
+    config = configure
+
+    def yview(self, *args):
+        """Mesmo protocolo da Treeview/Scrollbar: moveto FRAÇÃO ou scroll N units|pages"""
+        total = len(self._ids)
+        if not args:
+            if not total:
+                return 0.0, 1.0
+            return self._first / total, min(1.0, (self._first + self._rows) / total)
+        if args[0] == 'moveto':
+            self._set_first(int(round(float(args[1]) * total)))
+        elif args[0] == 'scroll':
+            step = self._rows if args[2].startswith('page') else 1
+            self._scroll_rows(int(args[1]) * step)
+
+    def _scroll_rows(self, rows):
+        self._set_first(self._first + rows)
+        return 'break'
+
+    def _set_first(self, first):
+        first = max(0, min(first, len(self._ids) - self._rows))
+        if first != self._first:
+            self._first = first
+            self._schedule()
+
+    def _update_scrollbar(self):
+        if self._yscrollcommand:
+            self._yscrollcommand(*self.yview())
+
+    # Desenho da janela visível
+
+    def _schedule(self):
+        if self._render_job is None:
+            self._render_job = self.tree.after_idle(self._render)
+
+    def _render(self):
+        self._render_job = None
+        self._first = max(0, min(self._first, len(self._ids) - self._rows))
+        window = self._ids[self._first:self._first + self._rows]
+
+        self.tree.delete(*self.tree.get_children())
+        for i, iid in enumerate(window, self._first):
+            self.tree.insert('', 'end', iid=iid, values=self.row_values(iid, i),
+                             tags=self._tags.get(iid, ()))
+        self._shown_selection = {iid for iid in window if iid in self._selection}
+        self.tree.selection_set(list(self._shown_selection))
+        if self._focus in window:
+            self.tree.focus(self._focus)
+        self._update_scrollbar()
+
+        if window and self._row_height is None:
+            # Medir cabeçalho/linha na primeira vez que há linhas e ajustar a janela
+            bbox = self.tree.bbox(window[0])
+            if bbox:
+                self._header, self._row_height = bbox[1], bbox[3]
+                self._fit_rows(self.tree.winfo_height())
+
+    def _fit_rows(self, height):
+        if self._row_height is None or height <= 1:
+            return
+        rows = max(1, (height - self._header) // self._row_height)
+        if rows != self._rows:
+            self._rows = rows
+            self._schedule()
+
+    # Eventos
+
+    def _on_configure(self, event):
+        self._fit_rows(event.height)
+
+    def _on_press(self, event):
+        # Ctrl/Shift mantêm a seleção fora da janela visível
+        self._extend_selection = bool(event.state & 0x0005)
+
+    def _on_tree_select(self, event):
+        window = self.tree.get_children()
+        selected = self.tree.selection()
+        if set(selected) == self._shown_selection:
+            return  # Evento gerado pela seleção aplicada no _render
+        self._shown_selection = set(selected)
+        if self._extend_selection:
+            for iid in window:
+                self._selection.pop(iid, None)
+            self._selection.update((iid, None) for iid in selected)
+        else:
+            self._selection = {iid: None for iid in selected}
+        focus = self.tree.focus()
+        if focus:
+            self._focus = focus
+
+    def _on_wheel(self, event):
+        return self._scroll_rows(-WHEEL_STEP if event.delta > 0 else WHEEL_STEP)
+
+    def _on_key(self, step):
+        if not self._ids:
+            return 'break'
+        current = self.index(self._focus) if self._focus else self._first
+        if step == 'home':
+            target = 0
+        elif step == 'end':
+            target = len(self._ids) - 1
+        elif step == 'page-':
+            target = current - self._rows
+        elif step == 'page+':
+            target = current + self._rows
+        else:
+            target = current + step
+        target = max(0, min(target, len(self._ids) - 1))
+        iid = self._ids[target]
+        self.selection_set(iid)
+        self.focus(iid)
+        return 'break'
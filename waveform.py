@@ -0,0 +1,211 @@
+"""
+Picos da forma de onda (min/max) em várias resoluções, para desenhar a
+visão geral das músicas sem decodificar o áudio na interface.
+
+O arquivo é lido em blocos (sem carregar a música inteira na memória) e os
+picos do nível mais fino são agregados dois a dois até restar um único bin,
+como um mipmap. Todos os níveis ficam num único .npy por música em
+~/.djset_cache/peaks, aberto com mmap: desenhar qualquer zoom é ler uma fatia.
+"""
+import os
+import sys
+import math
+from pathlib import Path
+
+from analysis import ANALYSIS_SR, RESAMPLE_TYPE
+from analysis_cache import quick_hash
+
+PEAKS_DIR = Path.home() / ".djset_cache" / "peaks"
+
+# Incrementar ao mudar o formato ou a resolução dos picos
+PEAKS_VERSION = 1
+
+# Duração de um bin no nível mais fino (~46 ms)
+BIN_SECONDS = 512 / ANALYSIS_SR
+
+# Bins lidos por bloco na leitura em streaming (~24 s de áudio)
+BLOCK_BINS = 512
+
+# Escala dos picos gravados (int8)
+PEAK_SCALE = 127
+
+# Nível do mipmap usado para achar o trecho mais forte da música (bins de ~0,74 s)
+LOUDNESS_LEVEL = 4
+
+
+def peaks_path(file_path):
+    """Arquivo de picos da música (indexado pelo conteúdo, sobrevive a renomear/mover)"""
+    return PEAKS_DIR / f"{quick_hash(file_path)}-v{PEAKS_VERSION}.npy"
+
+
+def level_sizes(base_bins):
+    """Quantidade de bins de cada nível, do mais fino (0) até o nível com um único bin"""
+    sizes = [base_bins]
+    while sizes[-1] > 1:
+        sizes.append((sizes[-1] + 1) // 2)
+    return sizes
+
+
+def _base_bins_for_rows(rows):
+    # A soma dos níveis cresce estritamente com o nível 0, então a inversão é única
+    low, high = 1, rows
+    while low < high:
+        middle = (low + high) // 2
+        if sum(level_sizes(middle)) < rows:
+            low = middle + 1
+        else:
+            high = middle
+    return low
+
+
+def _stream_base_peaks(file_path):
+    """(mínimos, máximos) por bin do nível 0, lendo o arquivo em blocos"""
+    import numpy as np
+    import soundfile as sf
+
+    mins, maxs = [], []
+    with sf.SoundFile(file_path) as f:
+        samples_per_bin = max(1, round(f.samplerate * BIN_SECONDS))
+        for block in f.blocks(blocksize=samples_per_bin * BLOCK_BINS, dtype='float32', always_2d=True):
+            mono = block.mean(axis=1)
+            padding = -len(mono) % samples_per_bin
+            if padding:
+                mono = np.concatenate((mono, np.full(padding, mono[-1], dtype=mono.dtype)))
+            bins = mono.reshape(-1, samples_per_bin)
+            mins.append(bins.min(axis=1))
+            maxs.append(bins.max(axis=1))
+    if not mins:
+        return np.zeros(1, dtype=np.float32), np.zeros(1, dtype=np.float32)
+    return np.concatenate(mins), np.concatenate(maxs)
+
+
+def _decoded_base_peaks(file_path):
+    """Alternativa para formatos que o libsndfile não lê: decodifica na taxa de análise"""
+    import librosa
+    import numpy as np
+
+    y, _ = librosa.load(file_path, sr=ANALYSIS_SR, mono=True, res_type=RESAMPLE_TYPE)
+    samples_per_bin = round(ANALYSIS_SR * BIN_SECONDS)
+    if not len(y):
+        return np.zeros(1, dtype=np.float32), np.zeros(1, dtype=np.float32)
+    y = np.concatenate((y, np.full(-len(y) % samples_per_bin, y[-1], dtype=y.dtype)))
+    bins = y.reshape(-1, samples_per_bin)
+    return bins.min(axis=1), bins.max(axis=1)
+
+
+def build_mipmap(mins, maxs):
+    """Empilha todos os níveis num array int8 (linhas, 2) com colunas (mínimo, máximo)"""
+    import numpy as np
+
+    level = np.stack((mins, maxs), axis=1)
+    level = np.clip(np.round(level * PEAK_SCALE), -PEAK_SCALE, PEAK_SCALE).astype(np.int8)
+    levels = [level]
+    while len(level) > 1:
+        if len(level) % 2:
+            level = np.vstack((level, level[-1:]))
+        pairs = level.reshape(-1, 2, 2)
+        level = np.stack((pairs[:, :, 0].min(axis=1), pairs[:, :, 1].max(axis=1)), axis=1)
+        levels.append(level)
+    return np.concatenate(levels)
+
+
+def extract_peaks(file_path):
+    """Gera (se ainda não existir) o arquivo de picos da música e retorna seu caminho"""
+    import numpy as np
+
+    path = peaks_path(file_path)
+    if path.exists():
+        return path
+
+    try:
+        mins, maxs = _stream_base_peaks(file_path)
+    except Exception:
+        mins, maxs = _decoded_base_peaks(file_path)
+
+    PEAKS_DIR.mkdir(parents=True, exist_ok=True)
+    # Gravar com outro nome e renomear: um leitor nunca vê um arquivo pela metade
+    tmp_path = path.with_name(f"{path.stem}.{os.getpid()}.tmp.npy")
+    np.save(tmp_path, build_mipmap(mins, maxs))
+    os.replace(tmp_path, path)
+    return path
+
+
+def load_peaks(file_path):
+    """Picos já extraídos da música (Peaks) ou None"""
+    try:
+        path = peaks_path(file_path)
+        if not path.exists():
+            return None
+        return Peaks(path)
+    except (OSError, ValueError) as e:
+        print(f"Picos indisponíveis para {file_path}: {e}", file=sys.stderr)
+        return None
+
+
+def beat_times(music, start, end):
+    """Tempos (s) das batidas entre start e end, pela grade de batidas da análise"""
+    if not music.beat_grid:
+        return []
+    first, period = music.beat_grid
+    if period <= 0:
+        return []
+    k = max(0, math.ceil((start - first) / period))
+    times = []
+    t = first + k * period
+    while t <= end:
+        times.append(t)
+        t += period
+    return times
+
+
+class Peaks:
+    """Mipmap de picos aberto com mmap"""
+
+    def __init__(self, path):
+        import numpy as np
+
+        self.data = np.load(path, mmap_mode='r')
+        sizes = level_sizes(_base_bins_for_rows(len(self.data)))
+        self.levels = []  # (início, quantidade) de cada nível dentro de data
+        start = 0
+        for size in sizes:
+            self.levels.append((start, size))
+            start += size
+
+    @property
+    def duration(self):
+        return self.levels[0][1] * BIN_SECONDS
+
+    def window(self, start, end, width):
+        """
+        Picos entre start e end (s) para desenhar em `width` pixels.
+
+        Retorna (mínimos, máximos, segundos_por_bin, tempo_do_primeiro_bin), com
+        picos em -1..1, usando o nível mais grosso que ainda tem ~1 bin por pixel.
+        """
+        import numpy as np
+
+        seconds_per_pixel = max(end - start, BIN_SECONDS) / max(width, 1)
+        level = int(math.floor(math.log2(max(seconds_per_pixel / BIN_SECONDS, 1))))
+        level = min(level, len(self.levels) - 1)
+        offset, size = self.levels[level]
+        bin_seconds = BIN_SECONDS * 2 ** level
+
+        first = max(0, int(start // bin_seconds))
+        last = min(size, int(math.ceil(end / bin_seconds)))
+        rows = np.asarray(self.data[offset + first:offset + max(first, last)], dtype=np.float32) / PEAK_SCALE
+        return rows[:, 0], rows[:, 1], bin_seconds, first * bin_seconds
+
+    def loudest_start(self, seconds):
+        """Início (s) do trecho de `seconds` com maior amplitude média (em geral o drop)"""
+        import numpy as np
+
+        level = min(LOUDNESS_LEVEL, len(self.levels) - 1)
+        offset, size = self.levels[level]
+        bin_seconds = BIN_SECONDS * 2 ** level
+        width = max(1, int(round(seconds / bin_seconds)))
+        if size <= width:
+            return 0.0
+        rows = np.asarray(self.data[offset:offset + size], dtype=np.float32)
+        sums = np.convolve(rows[:, 1] - rows[:, 0], np.ones(width, dtype=np.float32), 'valid')
+        return float(np.argmax(sums)) * bin_seconds